@@ -1,32 +1,100 @@
+import time
+_IMPORT_STARTED = time.perf_counter()
+
 import os
+import asyncio
+import hashlib
+import json
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 import requests
 from dotenv import load_dotenv
 import numpy as np
-import joblib
-import pandas as pd
 from fastapi import FastAPI, HTTPException, Depends, Header, Request, Form
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field, EmailStr
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import Response
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from starlette.concurrency import run_in_threadpool
+
+from batch_input import BatchInputError, RowError, iter_rows
+from cache import TTLCache
+from fertilizer_encoder import FertilizerFeatureEncoder, decode_labels
+from flat_forest import flat_path_for, load_model_bundle
+from mandi_snapshot import DEFAULT_STATES, MandiSnapshot, fetch_all_pages, match_key, normalize_record
+from indexes import ensure_indexes_async
+from model_loader import LoadedModel, ModelSlot
+from pagination import CursorError, keyset_page
+from prediction_memo import PredictionMemo
+from password_pool import PasswordPoolBusy, PasswordWorkerPool
+from mongo import close_client, get_repositories, pool_stats
+from repository import Repositories, Repository
+from rollups import advance_rollups, read_daily, read_totals, reset_rollups, watermarks
+from user_cache import UserCache
+from user_search import backfill_search_keys, search_keys, search_users
+from write_behind import WriteBehindQueue
+from singleflight import SingleFlight
+from soil_scoring import decode_all, score_records
+from yield_encoder import YieldFeatureEncoder
+from yield_table import CANDIDATE_CROPS, YieldTableStore, table_path_for
+
 # Load environment variables from .env file (search parent directories too)
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), "../../.env"))
 load_dotenv()  # Also try current directory
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 YIELD_MODEL_PATH = os.path.join(BASE_DIR, "../ml_model/yield_model.pkl")
-try:
-    yield_bundle = joblib.load(YIELD_MODEL_PATH)
-    yield_model = yield_bundle["model"]
-    yield_columns = yield_bundle["columns"]
-except Exception as e:
-    yield_model = None
-    yield_columns = None
-    print(f"❌ Failed to load yield model: {e}")
+# "flat" serves the memory-mapped .trees export when present (shared across
+# workers via the page cache); "pickle" always unpickles the .pkl bundle
+MODEL_FORMAT = os.getenv("MODEL_FORMAT", "flat").lower()
+# Loaded on first use or by the warm-up task started after startup (see model_loader)
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "true").lower() in ("1", "true", "yes")
+# Poll the model files and hot-reload on change every N seconds (0 = only via the admin endpoint)
+MODEL_WATCH_SECONDS = float(os.getenv("MODEL_WATCH_SECONDS", "0"))
+
+# Canary inputs every new yield model must predict finite values for before it is served
+YIELD_CANARY = [
+    {"Crop": "Rice", "Season": "Kharif", "State": "Punjab", "Area": 1000.0,
+     "Annual_Rainfall": 1200.0, "Fertilizer": 120000.0, "Pesticide": 300.0},
+    {"Crop": "Wheat", "Season": "Rabi", "State": "Uttar Pradesh", "Area": 5000.0,
+     "Annual_Rainfall": 800.0, "Fertilizer": 500000.0, "Pesticide": 1500.0},
+    {"Crop": "Maize", "Season": "Whole Year", "State": "Karnataka", "Area": 10.0,
+     "Annual_Rainfall": 2500.0, "Fertilizer": 900.0, "Pesticide": 5.0},
+]
+
+
+def _load_model_file(path: str):
+    return load_model_bundle(path, prefer_flat=MODEL_FORMAT != "pickle")
+
+
+def _model_files(path: str) -> tuple:
+    return (path, flat_path_for(path))
+
+
+def _prepare_yield_model(bundle):
+    return bundle["model"], YieldFeatureEncoder(bundle["columns"]), None
+
+
+def _check_yield_model(candidate: LoadedModel) -> None:
+    preds = np.asarray(candidate.predict(candidate.encoder.encode_many(YIELD_CANARY)), dtype=float)
+    if preds.shape != (len(YIELD_CANARY),) or not np.isfinite(preds).all():
+        raise ValueError(f"canary predictions invalid: {preds.tolist()}")
+
+
+yield_slot = ModelSlot("yield", YIELD_MODEL_PATH, _load_model_file, _prepare_yield_model,
+                       validate=_check_yield_model, watch_paths=_model_files(YIELD_MODEL_PATH))
+
+# Memoised predictions for repeated single-request inputs, per model (emptied on version change)
+PREDICTION_MEMO_ENABLED = os.getenv("PREDICTION_MEMO_ENABLED", "true").lower() in ("1", "true", "yes")
+PREDICTION_MEMO_SIZE = int(os.getenv("PREDICTION_MEMO_SIZE", "10000"))
+PREDICTION_MEMO_DECIMALS = int(os.getenv("PREDICTION_MEMO_DECIMALS", "3"))
+yield_memo = PredictionMemo(PREDICTION_MEMO_SIZE, PREDICTION_MEMO_DECIMALS, PREDICTION_MEMO_ENABLED)
+fertilizer_memo = PredictionMemo(PREDICTION_MEMO_SIZE, PREDICTION_MEMO_DECIMALS, PREDICTION_MEMO_ENABLED)
 
 
 # --- FastAPI setup ---
@@ -49,18 +117,6 @@ app.add_middleware(
 )
 
 
-# --- MongoDB yield_predictions collection ---
-try:
-    from pymongo import MongoClient
-    from pymongo.errors import PyMongoError, DuplicateKeyError
-    _mongo = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"))
-    db_name = os.getenv("MONGO_DB", "agriadvisor")
-    col_yield_predictions = _mongo[db_name]["yield_predictions"]
-except Exception:
-    MongoClient = None
-    col_yield_predictions = None
-
-
 # --- Pydantic schema for yield prediction ---
 class YieldRequest(BaseModel):
     Area: float
@@ -73,42 +129,130 @@ class YieldRequest(BaseModel):
 
 
 # --- Helper function to prepare input ---
-def prepare_yield_input(data: dict) -> pd.DataFrame:
-    df = pd.DataFrame([data])
-    cat_df = pd.get_dummies(df[["Crop", "Season", "State"]], drop_first=True)
-    num_df = df[["Area", "Annual_Rainfall", "Fertilizer", "Pesticide"]]
-    X = pd.concat([num_df, cat_df], axis=1)
-    # Add missing columns with 0
-    if yield_columns:
-        for col in yield_columns:
-            if col not in X.columns:
-                X[col] = 0
-        # Align order
-        X = X[yield_columns]
-    return X
+def prepare_yield_input(data: dict, active: LoadedModel) -> np.ndarray:
+    """Encode one yield input into a (1, n_features) row aligned with the model's columns."""
+    return active.encoder.encode(data)
 
 
 # --- Yield Prediction Endpoint ---
 @app.post("/api/yield/predict")
-def predict_yield(req: YieldRequest):
-    if yield_model is None or yield_columns is None:
+async def predict_yield(req: YieldRequest):
+    active = await ensure_model(yield_slot)
+    if active is None:
         raise HTTPException(status_code=500, detail="Yield model not loaded.")
     try:
-        X = prepare_yield_input(req.dict())
-        pred = yield_model.predict(X)[0]
-        response = {"predicted_yield": float(pred), "unit": "tons/hectare"}
+        X = prepare_yield_input(req.dict(), active)
+        pred = (await run_in_threadpool(yield_memo.predict, active.version, X, active.predict))[0]
+        response = {"predicted_yield": float(pred), "unit": "tons/hectare", "model_version": active.version}
         # Optional: log prediction
         try:
-            if col_yield_predictions is not None:
+            if repos is not None:
                 log = req.dict()
                 log["predicted_yield"] = float(pred)
+                log["model_version"] = active.version
                 log["created_at"] = datetime.utcnow()
-                col_yield_predictions.insert_one(log)
+                await write_queue.put(repos.yield_predictions, log)
         except Exception as e:
             print(f"⚠️ Failed to log yield prediction: {e}")
         return response
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid input: {e}")
+
+
+# --- Batch Yield Prediction Endpoint ---
+YIELD_BATCH_CHUNK_SIZE = int(os.getenv("YIELD_BATCH_CHUNK_SIZE", "1000"))
+YIELD_BATCH_MAX_ROWS = int(os.getenv("YIELD_BATCH_MAX_ROWS", "100000"))
+
+
+def _row_error_message(e: Exception) -> str:
+    errors = getattr(e, "errors", None)
+    if callable(errors):
+        first = errors()[0]
+        field = ".".join(str(part) for part in first.get("loc", ())) or "row"
+        return f"{field}: {first.get('msg', 'invalid value')}"
+    return str(e)
+
+
+def predict_yield_chunk(rows: List[Dict[str, Any]], active: LoadedModel) -> List[float]:
+    """Encode a chunk of validated rows as one matrix and predict them in a single call."""
+    X = active.encoder.encode_many(rows)
+    return [float(p) for p in active.predict(X)]
+
+
+@app.post("/api/yield/predict/batch")
+async def predict_yield_batch(request: Request):
+    """
+    Predict yields for many rows in one request.
+    
+    The body is a JSON array of YieldRequest objects, NDJSON
+    (Content-Type: application/x-ndjson) or CSV with a header row
+    (Content-Type: text/csv). NDJSON and CSV are parsed as they upload.
+    Rows are predicted YIELD_BATCH_CHUNK_SIZE at a time and results are
+    streamed back as NDJSON, one line per input row in input order:
+    {"index": 0, "predicted_yield": 2.41, "unit": "tons/hectare"} or
+    {"index": 3, "error": "..."}, followed by a final summary line.
+    The whole batch is served by one model version, reported in the
+    summary line.
+    """
+    active = await ensure_model(yield_slot)
+    if active is None:
+        raise HTTPException(status_code=500, detail="Yield model not loaded.")
+    
+    # Read and validate the whole upload before streaming the response:
+    # the response stream and the request body share the ASGI receive channel
+    items: List[tuple] = []
+    try:
+        async for row in iter_rows(request.stream(), request.headers.get("content-type")):
+            if len(items) >= YIELD_BATCH_MAX_ROWS:
+                raise HTTPException(status_code=413, detail=f"At most {YIELD_BATCH_MAX_ROWS} rows per batch")
+            if isinstance(row, RowError):
+                items.append((None, str(row)))
+                continue
+            try:
+                items.append((YieldRequest(**row).dict(), None))
+            except Exception as e:
+                items.append((None, _row_error_message(e)))
+    except BatchInputError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    async def results():
+        predicted = failed = 0
+        for start in range(0, len(items), YIELD_BATCH_CHUNK_SIZE):
+            chunk = items[start:start + YIELD_BATCH_CHUNK_SIZE]
+            valid = [data for data, _ in chunk if data is not None]
+            try:
+                preds = iter(await run_in_threadpool(predict_yield_chunk, valid, active)) if valid else iter(())
+                chunk_error = None
+            except Exception as e:
+                preds, chunk_error = iter(()), f"Prediction failed: {e}"
+            
+            lines = []
+            logs = []
+            now = datetime.utcnow()
+            for offset, (data, error) in enumerate(chunk):
+                line = {"index": start + offset}
+                if data is not None and chunk_error is None:
+                    value = next(preds)
+                    line.update(predicted_yield=value, unit="tons/hectare")
+                    logs.append(dict(data, predicted_yield=value, created_at=now, model_version=active.version))
+                    predicted += 1
+                else:
+                    line["error"] = error or chunk_error
+                    failed += 1
+                lines.append(json.dumps(line))
+            yield "\n".join(lines) + "\n"
+            
+            # One bulk insert per chunk instead of a write per row
+            if logs and repos is not None:
+                try:
+                    await repos.yield_predictions.insert_many(logs)
+                except Exception as e:
+                    print(f"⚠️ Failed to log batch yield predictions: {e}")
+        
+        yield json.dumps({"done": True, "rows": len(items), "predicted": predicted, "errors": failed,
+                          "model_version": active.version}) + "\n"
+    
+    return StreamingResponse(results(), media_type="application/x-ndjson")
 import os
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
@@ -125,8 +269,6 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import Response
 
 
-import joblib
-import pandas as pd
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.security import OAuth2PasswordBearer
@@ -179,10 +321,17 @@ except Exception:
 
 # Use bcrypt for password hashing
 import bcrypt as _bcrypt
+
+# bcrypt cost factor (log2 rounds); 12 is the bcrypt default
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
 class _PwdHashing:
+    def __init__(self, rounds: int = 12):
+        self.rounds = rounds
+
     def hash(self, password: str) -> str:
         """Hash a password using bcrypt"""
-        return _bcrypt.hashpw(password.encode("utf-8"), _bcrypt.gensalt()).decode("utf-8")
+        return _bcrypt.hashpw(password.encode("utf-8"), _bcrypt.gensalt(rounds=self.rounds)).decode("utf-8")
     
     def verify(self, password: str, hashed: str) -> bool:
         """Verify a password against its bcrypt hash"""
@@ -191,13 +340,43 @@ class _PwdHashing:
         except Exception:
             return False
 
-pwd_ctx = _PwdHashing()
+pwd_ctx = _PwdHashing(rounds=BCRYPT_ROUNDS)
+
+# Hashing and verification run on a small dedicated pool so a login burst
+# cannot block the event loop or use up the shared request threadpool.
+password_pool = PasswordWorkerPool(
+    pwd_ctx.hash,
+    pwd_ctx.verify,
+    max_workers=int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1)))),
+    max_pending=int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64")),
+)
 
 # --- Weather API Configuration ---
 WEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY", "")
 WEATHER_API_URL = "https://api.openweathermap.org/data/2.5/weather"
 
+# Per-city weather cache: short TTL, bounded size, and concurrent misses for
+# the same city share one OpenWeather call.
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL_SECONDS", "600"))
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", "256"))
+weather_cache = TTLCache(maxsize=WEATHER_CACHE_SIZE, ttl=WEATHER_CACHE_TTL)
+
 def get_weather(city: str) -> Optional[Dict[str, Any]]:
+    """
+    Fetch weather data for a city, served from weather_cache when possible.
+    
+    Returns:
+        Dict with temperature, humidity, description, wind_speed and age_seconds
+        (how old the observation is), or None if API fails
+    """
+    entry = weather_cache.get_or_load(city.strip().lower(), lambda: _fetch_weather_uncached(city))
+    if entry.value is None:
+        return None
+    weather = dict(entry.value)
+    weather["age_seconds"] = round(entry.age, 1)
+    return weather
+
+def _fetch_weather_uncached(city: str) -> Optional[Dict[str, Any]]:
     """
     Fetch weather data from OpenWeather API.
     
@@ -244,11 +423,60 @@ MANDI_API_KEY = os.getenv("MANDI_API_KEY", "")
 MANDI_RESOURCE_ID = os.getenv("MANDI_RESOURCE_ID", "9ef84268-d588-465a-a308-a864a43d0070")
 MANDI_API_URL = f"https://api.data.gov.in/resource/{MANDI_RESOURCE_ID}"
 
+# Shared pool for mandi lookups (concurrent crop prices, cache refreshes)
+MANDI_FETCH_WORKERS = int(os.getenv("MANDI_FETCH_WORKERS", "16"))
+_mandi_pool = ThreadPoolExecutor(max_workers=MANDI_FETCH_WORKERS, thread_name_prefix="mandi")
+
+# Mandi prices change at most daily: successful responses are cached per
+# (commodity, state, district, limit) and served stale while a refresh runs.
+MANDI_CACHE_TTL = float(os.getenv("MANDI_CACHE_TTL_SECONDS", "3600"))
+MANDI_CACHE_STALE_TTL = float(os.getenv("MANDI_CACHE_STALE_TTL_SECONDS", "21600"))
+MANDI_CACHE_SIZE = int(os.getenv("MANDI_CACHE_SIZE", "512"))
+mandi_cache = TTLCache(
+    maxsize=MANDI_CACHE_SIZE,
+    ttl=MANDI_CACHE_TTL,
+    stale_ttl=MANDI_CACHE_STALE_TTL,
+    executor=_mandi_pool,
+    should_cache=lambda result: not result.get("error"),
+)
+
+# Local copy of the mandi feed, refreshed in the background (see mandi_snapshot.py).
+# A (commodity, state) pair is answered from it only while its last successful
+# pull is at most this old; otherwise the live API is queried.
+MANDI_SNAPSHOT_MAX_AGE_SECONDS = float(os.getenv("MANDI_SNAPSHOT_MAX_AGE_SECONDS", "7200"))
+mandi_snapshot = MandiSnapshot(max_age_seconds=MANDI_SNAPSHOT_MAX_AGE_SECONDS)
+
 def fetch_mandi_prices(
     commodity: Optional[str] = None,
     state: Optional[str] = None,
     district: Optional[str] = None,
-    limit: int = 100
+    limit: int = 100,
+    offset: int = 0
+) -> Dict[str, Any]:
+    """
+    Fetch market prices, from the local snapshot when it covers the query and
+    otherwise from data.gov.in through mandi_cache.
+    
+    Either way the result carries ``served_from`` and ``data_age_seconds``.
+    Returns a copy of the cached result so callers may annotate it freely.
+    """
+    if offset == 0 and mandi_snapshot.covers(commodity, state):
+        return mandi_snapshot.query(commodity, state, district, limit)
+    key = (commodity, state, district, limit, offset)
+    entry = mandi_cache.get_or_load(
+        key, lambda: _fetch_mandi_prices_uncached(commodity, state, district, limit, offset)
+    )
+    result = dict(entry.value)
+    result["served_from"] = "live"
+    result["data_age_seconds"] = round(entry.age, 1)
+    return result
+
+def _fetch_mandi_prices_uncached(
+    commodity: Optional[str] = None,
+    state: Optional[str] = None,
+    district: Optional[str] = None,
+    limit: int = 100,
+    offset: int = 0
 ) -> Dict[str, Any]:
     """
     Fetch market prices from data.gov.in API.
@@ -258,6 +486,7 @@ def fetch_mandi_prices(
         state: Optional state filter (e.g., "Maharashtra")
         district: Optional district filter
         limit: Maximum number of records to fetch
+        offset: Number of matching records to skip (for paging)
     
     Returns:
         Dict with records, average_price, commodity, state, fallback_used
@@ -270,7 +499,8 @@ def fetch_mandi_prices(
         params = {
             "api-key": MANDI_API_KEY,
             "format": "json",
-            "limit": limit
+            "limit": limit,
+            "offset": offset
         }
         
         # Add optional filters
@@ -423,7 +653,9 @@ def get_best_price_market(commodity: str) -> Dict[str, Any]:
             "arrival_date": best_record.get("arrival_date", "Unknown"),
             "variety": best_record.get("variety", "Unknown")
         },
-        "total_markets_checked": len(records)
+        "total_markets_checked": len(records),
+        "served_from": result.get("served_from"),
+        "data_age_seconds": result.get("data_age_seconds")
     }
 
 def calculate_revenue(predicted_yield_tons: float, modal_price_per_quintal: float) -> Dict[str, Any]:
@@ -451,7 +683,7 @@ def calculate_revenue(predicted_yield_tons: float, modal_price_per_quintal: floa
         "currency": "INR"
     }
 
-def log_market_fetch(
+async def log_market_fetch(
     commodity: str, 
     state: str, 
     average_price: float,
@@ -471,13 +703,13 @@ def log_market_fetch(
         records_count: Number of records returned
     
     Returns:
-        True if logged successfully, False otherwise
+        True if queued (or written) successfully, False otherwise
     """
-    if col_market_logs is None:
+    if repos is None:
         return False
     
     try:
-        col_market_logs.insert_one({
+        return await write_queue.put(repos.market_logs, {
             "user_email": user_email,
             "commodity": commodity,
             "state": state,
@@ -486,7 +718,6 @@ def log_market_fetch(
             "records_count": records_count,
             "fetched_at": datetime.utcnow()
         })
-        return True
     except Exception as e:
         print(f"⚠️ Failed to log market fetch: {e}")
         return False
@@ -494,17 +725,39 @@ def log_market_fetch(
 # --- Model load ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_PATH = os.path.join(BASE_DIR, "../ml_model/fertilizer_model.pkl")
-try:
-    bundle = joblib.load(MODEL_PATH)
+
+
+def _prepare_fertilizer_model(bundle):
     if isinstance(bundle, dict) and "model" in bundle:
-        ml_model = bundle["model"]
-        label_encoder = bundle.get("label_encoder")
+        model, label_encoder = bundle["model"], bundle.get("label_encoder")
     else:
-        ml_model = bundle
-        label_encoder = None
-except Exception:
-    ml_model = None
-    label_encoder = None
+        model, label_encoder = bundle, None
+    # Column order and soil/crop code tables, resolved once per model version
+    return model, FertilizerFeatureEncoder.for_model(model, SOIL_TYPES, CROP_TYPES), label_encoder
+
+
+def _check_fertilizer_model(candidate: LoadedModel) -> None:
+    X = candidate.encoder.encode_many(FERTILIZER_CANARY)
+    names = decode_labels(candidate.predict(X), candidate.label_encoder)
+    if len(names) != len(FERTILIZER_CANARY) or not all(names):
+        raise ValueError(f"canary predictions invalid: {names}")
+
+
+fertilizer_slot = ModelSlot("fertilizer", MODEL_PATH, _load_model_file, _prepare_fertilizer_model,
+                            validate=_check_fertilizer_model, watch_paths=_model_files(MODEL_PATH))
+MODEL_SLOTS = (yield_slot, fertilizer_slot)
+
+
+def load_models() -> bool:
+    """Load every model that has not been tried yet (blocking). True if all are loaded."""
+    return all([slot.ensure() is not None for slot in MODEL_SLOTS])
+
+
+async def ensure_model(slot: ModelSlot) -> Optional[LoadedModel]:
+    """Return the model ``slot`` serves now, loading it off the event loop on first use."""
+    if slot.settled:
+        return slot.current
+    return await run_in_threadpool(slot.ensure)
 
 # --- FastAPI setup ---
 # app = FastAPI()
@@ -620,84 +873,188 @@ class DynamicCORSEchoMiddleware(BaseHTTPMiddleware):
 app.add_middleware(DynamicCORSEchoMiddleware, allowed=allowed_origins)
 
 # --- MongoDB setup ---
-# MONGO_URI = os.environ.get("MONGO_URI", "mongodb://127.0.0.1:27017")
-# MONGO_DB = os.environ.get("MONGO_DB", "fertilizer_project")
-# Use local MongoDB for development
-MONGO_URI = os.environ.get(
-    "MONGO_URI",
-    "mongodb://localhost:27017"
+# One pooled client per worker, created lazily from config.py (see mongo.py).
+# Pool size, idle timeout and server selection are tuned with the MONGO_* env vars.
+from config import MONGO_DB
+
+repos: Optional[Repositories] = None
+
+# Analytics/log inserts are queued and written in insert_many batches so the
+# request path does not wait for MongoDB (see write_behind.py)
+write_queue = WriteBehindQueue(
+    max_batch=int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "200")),
+    flush_interval=float(os.getenv("WRITE_BEHIND_FLUSH_SECONDS", "1.0")),
+    max_queue=int(os.getenv("WRITE_BEHIND_MAX_QUEUE", "10000")),
+    put_timeout=float(os.getenv("WRITE_BEHIND_PUT_TIMEOUT_MS", "50")) / 1000,
 )
-MONGO_DB = os.environ.get("MONGO_DB", "fertilizer_project")
 
 
+# Results of the last startup index pass (reported by /health/ready)
+index_failures: List[Dict[str, Any]] = []
+
+
+async def _create_indexes(r: Repositories):
+    """
+    Create the indexes registered in indexes.py.
+    
+    An existing index is fine; any other failure (e.g. duplicate emails
+    blocking the unique users.email index that registration relies on) is
+    logged and kept in ``index_failures``.
+    """
+    global index_failures
+    results = await ensure_indexes_async(r)
+    index_failures = [res for res in results if res["status"] in ("failed", "conflict")]
+    for res in index_failures:
+        mark = "❌" if res["status"] == "failed" else "⚠️"
+        print(f"{mark} [INDEX] {res['collection']} {res['keys']} {res['status']}: {res['error']}")
+
+
+# Background startup work; the startup hook only schedules it so the
+# server starts accepting (liveness) requests immediately
+_data_layer_task: Optional[asyncio.Task] = None
+_warmup_task: Optional[asyncio.Task] = None
+_model_watch_task: Optional[asyncio.Task] = None
+_mandi_snapshot_task: Optional[asyncio.Task] = None
+_admin_counts_task: Optional[asyncio.Task] = None
+_chart_rollup_task: Optional[asyncio.Task] = None
+_user_search_backfill_task: Optional[asyncio.Task] = None
+_database_connecting = False
+_warming_up = False
+# Milliseconds since backend.py started importing
+startup_timings: Dict[str, Optional[float]] = {
+    "import_ms": None,
+    "startup_hook_ms": None,
+    "database_ms": None,
+    "models_ms": None,
+    "ready_ms": None,
+}
+
+
+def _ms_since_import() -> float:
+    return round((time.perf_counter() - _IMPORT_STARTED) * 1000, 2)
+
 
-if MongoClient is not None:
+@app.on_event("startup")
+async def init_data_layer():
+    global _data_layer_task, _warmup_task, _model_watch_task, _mandi_snapshot_task, _admin_counts_task
+    global _chart_rollup_task, _user_search_backfill_task
+    global _database_connecting, _warming_up
+    if repos is None:
+        _database_connecting = True
+        _data_layer_task = asyncio.create_task(_connect_data_layer())
+    else:
+        # Already provided (e.g. a mongomock-backed layer in tests)
+        write_queue.start()
+    if MODEL_WARMUP:
+        _warming_up = True
+        _warmup_task = asyncio.create_task(_warm_up_models())
+    if MODEL_WATCH_SECONDS > 0:
+        _model_watch_task = asyncio.create_task(_watch_models())
+    if MANDI_SNAPSHOT_SECONDS > 0:
+        _mandi_snapshot_task = asyncio.create_task(_mandi_snapshot_loop())
+    if ADMIN_COUNTS_RECONCILE_SECONDS > 0:
+        _admin_counts_task = asyncio.create_task(_admin_counts_loop())
+    if CHART_ROLLUP_SECONDS > 0:
+        _chart_rollup_task = asyncio.create_task(_chart_rollup_loop())
+    if USER_SEARCH_BACKFILL:
+        _user_search_backfill_task = asyncio.create_task(_backfill_user_search())
+    startup_timings["startup_hook_ms"] = _ms_since_import()
+    _record_ready()
+
+
+async def _connect_data_layer():
+    global repos, _database_connecting
+    print("[CONN] Attempting MongoDB connection...")
     try:
-        print("[CONN] Attempting MongoDB connection...")
-        _mongo = MongoClient(
-            MONGO_URI,
-            serverSelectionTimeoutMS=5000,
-            connectTimeoutMS=5000,
-            socketTimeoutMS=5000,
-            retryWrites=True,
-            retryReads=True,
-            w='majority'
-        )
-        
-        # Test connection
-        print("[TEST] Testing MongoDB connection...")
-        _mongo.admin.command('ping')
-        
-        # Initialize database and collections
-        print("[INIT] Initializing database and collections...")
-        db = _mongo[MONGO_DB]
-        col_users = db["users"]
-        col_recs = db["recommendations"]
-        col_articles = db["articles"]
-        col_techniques = db["techniques"]
-        col_prices = db["prices"]
-        col_contacts = db["contacts"]
-        col_soil_analysis = db["soil_analysis"]
-        col_market_logs = db["market_logs"]
-        col_crop_recommendations = db["crop_recommendations"]
-        
-        # Create indexes for better performance (ignore if already exists)
+        candidate = get_repositories()
+        if candidate is None:
+            print("⚠️ PyMongo not available.")
+            return
+        await candidate.ping()
         print("[INDEX] Creating database indexes...")
-        try:
-            col_users.create_index([("email", 1)], unique=True)
-        except Exception:
-            pass  # Index already exists
-        try:
-            col_articles.create_index([("publishedAt", -1)])
-        except Exception:
-            pass
-        try:
-            col_techniques.create_index([("category", 1)])
-        except Exception:
-            pass
-        try:
-            col_soil_analysis.create_index([("user_email", 1), ("created_at", -1)])
-        except Exception:
-            pass
-        try:
-            col_market_logs.create_index([("commodity", 1), ("fetched_at", -1)])
-        except Exception:
-            pass
-        
+        await _create_indexes(candidate)
+        repos = candidate
+        write_queue.start()
         print("[SUCCESS] MongoDB connected and initialized successfully!")
     except Exception as e:
         print(f"[ERROR] MongoDB connection failed: {str(e)}")
         print("[WARN] MongoDB connection details:")
         print(f"  - Database: {MONGO_DB}")
         print(f"  - Error type: {type(e).__name__}")
-        _mongo = None
-        db = None
-        col_users = col_recs = col_articles = col_techniques = col_prices = col_contacts = col_soil_analysis = col_market_logs = col_crop_recommendations = None
-else:
-    print("⚠️ PyMongo not available.")
-    _mongo = None
-    db = None
-    col_users = col_recs = col_articles = col_techniques = col_prices = col_contacts = col_soil_analysis = col_market_logs = col_crop_recommendations = None
+    finally:
+        _database_connecting = False
+        startup_timings["database_ms"] = _ms_since_import()
+        _record_ready()
+
+
+async def _warm_up_models():
+    """Load every model (and prebuilt yield tables) in a worker thread so the first requests don't pay for it."""
+    global _warming_up
+    try:
+        await run_in_threadpool(load_models)
+        if yield_slot.current is not None:
+            await run_in_threadpool(load_yield_tables, yield_slot.current)
+    finally:
+        _warming_up = False
+        startup_timings["models_ms"] = _ms_since_import()
+        _record_ready()
+
+
+async def reload_models(names: Optional[List[str]] = None, force: bool = False) -> List[Dict[str, Any]]:
+    """Reload the named models (default: all) in a worker thread; see ModelSlot.reload."""
+    results = []
+    for slot in MODEL_SLOTS:
+        if names is None or slot.name in names:
+            result = await run_in_threadpool(slot.reload, force)
+            results.append(result)
+            if slot is yield_slot and result["status"] == "reloaded":
+                # Tables from the old version are dropped on next use; pick up a matching prebuilt file
+                await run_in_threadpool(load_yield_tables, slot.current)
+    return results
+
+
+async def _watch_models():
+    """Hot-reload a model when its .pkl or .trees file changes (each worker polls on its own)."""
+    while True:
+        await asyncio.sleep(MODEL_WATCH_SECONDS)
+        changed = [slot.name for slot in MODEL_SLOTS if slot.changed()]
+        if changed:
+            try:
+                await reload_models(changed)
+            except Exception as e:
+                print(f"⚠️ Model watch reload failed: {e}")
+
+
+def readiness() -> Dict[str, Any]:
+    """Snapshot of startup progress: models, database connection and timings."""
+    database_settled = not _database_connecting
+    models_settled = not _warming_up and (not MODEL_WARMUP or all(slot.settled for slot in MODEL_SLOTS))
+    return {
+        "ready": database_settled and models_settled,
+        "models": {slot.name: slot.status() for slot in MODEL_SLOTS},
+        "database": {"connected": repos is not None, "connecting": not database_settled,
+                     "index_failures": [f"{res['collection']} {res['keys']}: {res['status']}" for res in index_failures]},
+        "startup": dict(startup_timings),
+    }
+
+
+def _record_ready() -> None:
+    if startup_timings["ready_ms"] is None and startup_timings["startup_hook_ms"] is not None and readiness()["ready"]:
+        startup_timings["ready_ms"] = _ms_since_import()
+        print(f"⏱️ Ready {startup_timings['ready_ms']:.0f} ms after import "
+              f"(import {startup_timings['import_ms']:.0f} ms)")
+
+
+@app.on_event("shutdown")
+async def close_data_layer():
+    for task in (_data_layer_task, _warmup_task, _model_watch_task, _mandi_snapshot_task, _admin_counts_task,
+                 _chart_rollup_task, _user_search_backfill_task):
+        if task is not None and not task.done():
+            task.cancel()
+    # Drain queued log writes before the client goes away
+    await write_queue.close()
+    await close_client()
+
 
 # --- Auth helpers ---
 JWT_SECRET = os.environ.get("JWT_SECRET", "dev-secret")
@@ -739,41 +1096,55 @@ def create_access_token(sub: str) -> str:
 #         raise HTTPException(status_code=401, detail="Invalid token")
 
 
+# --- Auth caches ---
+# Verified token claims keyed by SHA-256 of the token. Cached claims are
+# re-checked against their own exp on every hit.
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL_SECONDS", "300"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
+
+# Bounded user cache (replaces the old unbounded USERS dict). Entries are
+# re-read from MongoDB after USER_CACHE_TTL_SECONDS so workers stay in sync.
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL_SECONDS", "300"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "5000"))
+
+
+async def _find_user_doc(email: str) -> Optional[Dict[str, Any]]:
+    if repos is None:
+        raise RuntimeError("Database not available")
+    return await repos.users.find_one({"email": email})
+
+
+user_cache = UserCache(_find_user_doc, maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+
+def decode_token(token: str) -> Dict[str, Any]:
+    """Verify a JWT, reusing the claims already verified for the same token."""
+    key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    claims = token_cache.get_or_load(key, lambda: jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALG])).value
+    exp = claims.get("exp")
+    if exp is not None and float(exp) <= time.time():
+        token_cache.invalidate(key)
+        raise HTTPException(status_code=401, detail="Token expired")
+    return claims
+
+
 # def get_current_user(authorization: Optional[str] = Header(None)) -> Dict[str, Any]:
-def get_current_user(token: str = Depends(oauth2_scheme)):
+async def get_current_user(token: str = Depends(oauth2_scheme)):
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALG])
+        payload = decode_token(token)
         email = payload.get("sub")
         if not email:
             raise HTTPException(status_code=401, detail="Invalid token")
-        user = USERS.get(email)
-        if not user and col_users is not None:
-            doc = col_users.find_one({"email": email})
-            if doc:
-                # Handle backward compatibility for old location format
-                location = doc.get("location")
-                if isinstance(location, str):
-                    # Old format: convert string to object
-                    location = {"state": location, "district": ""}
-                elif not isinstance(location, dict):
-                    location = {"state": "", "district": ""}
-                
-                user = {
-                    "name": doc.get("name"),
-                    "email": doc.get("email"),
-                    "phone": doc.get("phone"),
-                    "location": location,
-                    "role": doc.get("role", "farmer"),  # Default to farmer for backward compatibility
-                }
-                USERS[email] = user
-        if not user:
+        record = await user_cache.get(email)
+        if not record:
             raise HTTPException(status_code=401, detail="User not found")
-        return user
+        return record.profile()
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid token")
 
 
-def require_admin(user: Dict[str, Any] = Depends(get_current_user)):
+async def require_admin(user: Dict[str, Any] = Depends(get_current_user)):
     """Dependency to require admin role for protected routes."""
     if user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
@@ -783,7 +1154,6 @@ def require_admin(user: Dict[str, Any] = Depends(get_current_user)):
 
 
 # --- In-memory fallback stores ---
-USERS: Dict[str, Dict[str, Any]] = {}
 RECS_BY_USER: Dict[str, List[Dict[str, Any]]] = {}
 
 # --- Schemas ---
@@ -823,6 +1193,7 @@ class RecommendReq(BaseModel):
 class RecommendResp(BaseModel):
     fertilizer: str
     details: Dict[str, Any]
+    model_version: Optional[str] = None
 
 class SoilAnalysisReq(BaseModel):
     N: float
@@ -837,6 +1208,15 @@ class SoilAnalysisResp(BaseModel):
     status: Dict[str, str]
     suggestions: List[str]
 
+class SoilSampleRow(BaseModel):
+    """One sample of a bulk lab report; crop/soil type are optional there."""
+    N: float
+    P: float
+    K: float
+    pH: float
+    crop_type: Optional[str] = None
+    soil_type: Optional[str] = None
+
 class ContactReq(BaseModel):
     name: str
     mobile: str
@@ -862,17 +1242,24 @@ class ArticleIn(BaseModel):
 SOIL_TYPES = ["Sandy", "Loamy", "Clay", "Silty", "Peaty"]
 CROP_TYPES = ["Wheat", "Rice", "Maize", "Cotton", "Sugarcane"]
 
+# Canary inputs every new fertilizer model must classify before it is served
+FERTILIZER_CANARY = [
+    {"temperature": 28.0, "moisture": 40.0, "N": 40.0, "P": 30.0, "K": 20.0, "pH": 6.5,
+     "soil_type": soil, "crop_type": crop}
+    for soil, crop in zip(SOIL_TYPES, CROP_TYPES)
+]
+
 # --- Routes ---
 # @app.get("/api/diag")
 @app.get("/api/secure-test", tags=["Auth"])
 def secure_test(token: str = Depends(oauth2_scheme)):
     return {"message": "You are authorized!", "token": token}
 
-def diag():
-    info = {"mongo": bool(_mongo), "db": MONGO_DB}
+async def diag():
+    info = {"mongo": repos is not None, "db": MONGO_DB}
     try:
-        if db is not None:
-            info["collections"] = db.list_collection_names()
+        if repos is not None:
+            info["collections"] = await repos.database.list_collection_names()
     except Exception as e:
         print("❌ list_collection_names failed:", e)
         info["collections"] = []
@@ -884,22 +1271,22 @@ async def home():
         "message": "Fertilizer Recommendation API is running",
         "timestamp": datetime.utcnow().isoformat(),
         "mongo": {
-            "connected": bool(_mongo),
-            "database": MONGO_DB if _mongo else None
+            "connected": repos is not None,
+            "database": MONGO_DB if repos is not None else None
         },
         "collections": {
-            "users": (col_users is not None),
-            "articles": (col_articles is not None),
-            "techniques": (col_techniques is not None),
-            "recommendations": (col_recs is not None),
-            "contacts": (col_contacts is not None)
+            "users": repos is not None,
+            "articles": repos is not None,
+            "techniques": repos is not None,
+            "recommendations": repos is not None,
+            "contacts": repos is not None
         }
     }
     
     # Test MongoDB connection if connected
-    if _mongo:
+    if repos is not None:
         try:
-            _mongo.admin.command('ping')
+            await repos.ping()
             status["mongo"]["ping"] = "success"
         except Exception as e:
             status["mongo"]["ping"] = f"failed: {str(e)}"
@@ -907,6 +1294,45 @@ async def home():
     return status
 
 
+@app.get("/api/health/live")
+async def health_live():
+    """Liveness probe: answers as soon as the process serves requests, without touching models or MongoDB."""
+    return {"status": "alive", "uptime_ms": _ms_since_import()}
+
+
+@app.get("/api/health/ready")
+async def health_ready():
+    """
+    Readiness probe: 200 once the startup MongoDB connection attempt and the
+    model warm-up have finished, 503 before that. Also reports per-model
+    load state/time and startup timings (ms since import).
+    """
+    status = readiness()
+    if not status["ready"]:
+        return JSONResponse(status_code=503, content=status)
+    return status
+
+
+@app.get("/api/health/db")
+async def health_db():
+    """
+    Database health probe: ping round-trip and connection-pool utilisation.
+    Returns 503 when MongoDB is not reachable.
+    """
+    status = {"database": MONGO_DB, "connected": repos is not None, "pool": pool_stats()}
+    if repos is None:
+        return JSONResponse(status_code=503, content=status)
+    try:
+        started = time.perf_counter()
+        await repos.ping()
+        status["ping_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    except Exception as e:
+        status["connected"] = False
+        status["error"] = str(e)
+        return JSONResponse(status_code=503, content=status)
+    return status
+
+
 @app.head("/")
 async def head_home():
     # Provide an explicit HEAD handler to avoid 405 responses from some clients
@@ -922,7 +1348,7 @@ async def register(req: RegisterReq):
         email = req.email.lower()
         
         # Check if email already exists (memory check is instant)
-        if email in USERS:
+        if email in user_cache:
             print(f"❌ Email already exists in memory: {email}")
             raise HTTPException(status_code=400, detail="Email already registered")
         
@@ -932,9 +1358,11 @@ async def register(req: RegisterReq):
             print(f"❌ Password too long ({len(pw_bytes)} bytes) for user: {email}")
             raise HTTPException(status_code=400, detail="Password is too long. Please use a password shorter than 72 bytes")
 
-        # Hash password quickly
+        # Hash password on the bcrypt pool (keeps the event loop free)
         try:
-            hashed_pw = pwd_ctx.hash(req.password)
+            hashed_pw = await password_pool.hash(req.password)
+        except PasswordPoolBusy:
+            raise HTTPException(status_code=503, detail="Server busy, please retry")
         except Exception as e:
             print(f"❌ Password hashing failed: {type(e).__name__}: {e}")
             raise HTTPException(status_code=500, detail="Server error while processing password")
@@ -951,27 +1379,27 @@ async def register(req: RegisterReq):
             },
             "role": req.role if req.role in ["farmer", "admin"] else "farmer",
             "created_at": datetime.utcnow(),
+            "search_keys": search_keys(req.name, email),
         }
         
-        # Store in memory IMMEDIATELY (fast response)
-        USERS[email] = user_doc
-        print(f"✅ User stored in memory: {email}")
+        # The unique email index decides who owns an address, so nothing is
+        # cached or issued until the insert has succeeded
+        if repos is None:
+            raise HTTPException(status_code=503, detail="Database not available, please retry")
+        try:
+            inserted_id = await repos.users.insert_one(user_doc)
+            print(f"✅ User stored in database with ID: {inserted_id}")
+        except Exception as db_e:
+            if DuplicateKeyError is not None and isinstance(db_e, DuplicateKeyError):
+                # Registered earlier (evicted from this worker's cache, or on another worker)
+                raise HTTPException(status_code=400, detail="Email already registered")
+            print(f"❌ DB insert failed for {email}: {db_e}")
+            raise HTTPException(status_code=503, detail="Database not available, please retry")
         
-        # Create access token IMMEDIATELY
+        user_cache.put(user_doc)
         token = create_access_token(email)
         print(f"✅ Registration successful for: {email}")
         
-        # Background: Try to store in MongoDB (non-blocking)
-        if col_users is not None:
-            try:
-                # Non-blocking MongoDB insert in background
-                res = col_users.insert_one(user_doc)
-                if getattr(res, "acknowledged", False):
-                    print(f"✅ User also stored in database with ID: {res.inserted_id}")
-            except Exception as db_e:
-                print(f"⚠️ Background DB insert failed (but user registered): {db_e}")
-                # Continue - user is already in memory
-        
         return {
             "access_token": token,
             "token_type": "bearer",
@@ -1048,43 +1476,29 @@ from fastapi import Form
 # @app.post("/api/auth/login", response_model=TokenResp)
 # def login(username: str = Form(...), password: str = Form(...)):
 @app.post("/api/auth/login", response_model=TokenResp)
-def login(req: LoginReq):
+async def login(req: LoginReq):
     """Fast login using in-memory user store (instant response)"""
     email = req.email.lower()
     
-    # Check memory first (instant)
-    user = USERS.get(email)
-    
-    # If not in memory, load from MongoDB (fallback only)
-    if not user and col_users is not None:
-        try:
-            doc = col_users.find_one({"email": email})
-            if doc:
-                # Handle location backward compatibility
-                location = doc.get("location")
-                if isinstance(location, str):
-                    location = {"state": location, "district": ""}
-                elif not isinstance(location, dict):
-                    location = {"state": "", "district": ""}
-                
-                user = {
-                    "name": doc.get("name"),
-                    "email": doc.get("email"),
-                    "password_hash": doc.get("password_hash"),
-                    "phone": doc.get("phone"),
-                    "location": location,
-                    "role": doc.get("role", "farmer"),  # Default to farmer for backward compatibility
-                }
-                USERS[email] = user  # Cache in memory for next time
-        except Exception as db_e:
-            print(f"⚠️ DB lookup failed, continuing: {db_e}")
+    # Check the user cache first; it falls back to MongoDB on a miss
+    user = None
+    try:
+        record = await user_cache.get(email)
+        if record is not None:
+            user = record.to_doc()
+    except Exception as db_e:
+        print(f"⚠️ DB lookup failed, continuing: {db_e}")
     
     # If still not found, reject
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    # Verify password
-    if not pwd_ctx.verify(req.password, user["password_hash"]):
+    # Verify password on the bcrypt pool
+    try:
+        valid = await password_pool.verify(req.password, user["password_hash"])
+    except PasswordPoolBusy:
+        raise HTTPException(status_code=503, detail="Server busy, please retry")
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     # Generate and return token with role and user info
@@ -1104,7 +1518,7 @@ def login(req: LoginReq):
 
 from fastapi import Depends
 @app.get("/api/me")
-def me(user=Depends(get_current_user)):
+async def me(user=Depends(get_current_user)):
     return {
         "name": user.get("name"),
         "email": user.get("email"),
@@ -1114,7 +1528,7 @@ def me(user=Depends(get_current_user)):
     }
 
 @app.put("/api/me/update")
-def update_profile(req: dict, user=Depends(get_current_user)):
+async def update_profile(req: dict, user=Depends(get_current_user)):
     """Update user profile (name, phone, state, district)"""
     email = user.get("email")
     
@@ -1124,22 +1538,26 @@ def update_profile(req: dict, user=Depends(get_current_user)):
     location = {"state": state, "district": district}
     
     # Update in memory cache
-    if email in USERS:
-        USERS[email].update({
-            "name": req.get("name", USERS[email].get("name")),
-            "phone": req.get("phone", USERS[email].get("phone")),
+    current = user_cache.peek(email)
+    if current is not None:
+        doc = current.to_doc()
+        doc.update({
+            "name": req.get("name", current.name),
+            "phone": req.get("phone", current.phone),
             "location": location,
         })
+        current = user_cache.put(doc)
     
     # Update in MongoDB (best effort, non-blocking)
-    if col_users is not None:
+    if repos is not None:
         try:
-            col_users.update_one(
+            await repos.users.update_one(
                 {"email": email},
                 {"$set": {
                     "name": req.get("name"),
                     "phone": req.get("phone"),
                     "location": location,
+                    "search_keys": search_keys(req.get("name"), email),
                 }},
                 upsert=False
             )
@@ -1147,9 +1565,9 @@ def update_profile(req: dict, user=Depends(get_current_user)):
             print(f"⚠️ DB update failed, proceeding: {db_e}")
     
     return {
-        "name": USERS[email].get("name") if email in USERS else req.get("name"),
+        "name": current.name if current is not None else req.get("name"),
         "email": email,
-        "phone": USERS[email].get("phone") if email in USERS else req.get("phone"),
+        "phone": current.phone if current is not None else req.get("phone"),
         "location": location,
     }
 
@@ -1180,12 +1598,12 @@ async def contact(request: Request):
     if mobile: doc["mobile"] = mobile
 
     try:
-        if col_contacts is not None:
-            print("👉 Attempting DB insert into 'contacts' collection...")
-            res = col_contacts.insert_one(doc)
-            print("✅ Insert result:", res.acknowledged, res.inserted_id)
-            if getattr(res, "acknowledged", False):
-                return {"status": "ok", "stored": "db", "id": str(res.inserted_id)}
+        if repos is not None:
+            # Assign the id up front so it can be returned before the batch is written
+            doc["_id"] = ObjectId()
+            if await write_queue.put(repos.contacts, doc):
+                print("✅ Contact queued for 'contacts' collection:", doc["_id"])
+                return {"status": "ok", "stored": "db", "id": str(doc["_id"])}
     except Exception as e:
         print("❌ DB insert failed:", e)
     return {"status": "ok", "stored": "memory"}
@@ -1208,7 +1626,7 @@ def get_weather_endpoint(city: str):
 
 # --- Mandi Market Price Endpoints ---
 @app.get("/api/market/prices")
-def get_market_prices(
+async def get_market_prices(
     commodity: Optional[str] = None,
     limit: int = 50,
     user: Dict[str, Any] = Depends(get_current_user)
@@ -1245,8 +1663,9 @@ def get_market_prices(
             detail="Location not set. Please update your profile with state and district."
         )
     
-    # Use fallback-enabled fetch
-    result = fetch_mandi_prices_with_fallback(
+    # Use fallback-enabled fetch (blocking HTTP, so off the event loop)
+    result = await run_in_threadpool(
+        fetch_mandi_prices_with_fallback,
         commodity=commodity or "Rice",  # Default to Rice if not specified
         state=state,
         district=district if district else None,
@@ -1257,7 +1676,7 @@ def get_market_prices(
         raise HTTPException(status_code=503, detail=result["error"])
     
     # Log to MongoDB with user info
-    log_market_fetch(
+    await log_market_fetch(
         commodity=commodity or "Rice",
         state=state,
         average_price=result.get("average_price", 0),
@@ -1332,7 +1751,7 @@ def get_market_prices_by_state(
     
     state = state.strip()
     
-    # Try fetching from live API first
+    # Try the mandi snapshot / live API first
     result = fetch_mandi_prices(
         commodity=commodity,
         state=state,
@@ -1394,6 +1813,8 @@ def get_market_prices_by_state(
         "average_price": result.get("average_price", 0),
         "records_found": result.get("records_found", len(prices)),
         "data_source": "data.gov.in",
+        "served_from": result.get("served_from"),
+        "data_age_seconds": result.get("data_age_seconds"),
         "is_static_data": False,
         "message": f"Live market prices for {state}"
     }
@@ -1456,7 +1877,7 @@ def calculate_revenue_endpoint(
     return calculate_revenue(predicted_yield, price)
 
 @app.get("/api/market/logs")
-def get_market_logs(limit: int = 20):
+async def get_market_logs(limit: int = 20):
     """
     Get recent market fetch logs from MongoDB.
     
@@ -1466,11 +1887,11 @@ def get_market_logs(limit: int = 20):
     Returns:
         List of recent market fetch logs
     """
-    if col_market_logs is None:
+    if repos is None:
         return []
     
     try:
-        logs = list(col_market_logs.find({}).sort("fetched_at", -1).limit(limit))
+        logs = await repos.market_logs.find_many({}, sort=[("fetched_at", -1)], limit=limit)
         # Convert ObjectId to string
         for log in logs:
             log["id"] = str(log.pop("_id", ""))
@@ -1481,72 +1902,52 @@ def get_market_logs(limit: int = 20):
         print(f"⚠️ Failed to fetch market logs: {e}")
         return []
 
-@app.post("/api/recommend/", response_model=RecommendResp)
-def recommend(req: RecommendReq = None, user=Depends(get_current_user)):
+def predict_fertilizers(rows: List[Dict[str, Any]], active: Optional[LoadedModel] = None, memo: bool = False) -> List[str]:
+    """
+    Run the fertilizer model for many requests at once (CPU-bound, call off the event loop).
+    
+    Args:
+        rows: RecommendReq dicts
+        active: Model version to use (default: the one currently served)
+        memo: Serve repeated inputs from fertilizer_memo (single-request path)
+    
+    Returns:
+        One fertilizer name per row ("Urea" if no model is loaded)
+    """
+    if active is None:
+        active = fertilizer_slot.ensure()
+    if active is None or not rows:
+        return ["Urea"] * len(rows)
+    X = active.encoder.encode_many(rows)
+    if memo:
+        preds = fertilizer_memo.predict(active.version, X, active.predict)
+    else:
+        preds = active.predict(X)
+    return decode_labels(preds, active.label_encoder)
 
-    # Encode categorical inputs to integers expected by the model
-    def encode(value: str, choices: list[str]) -> int:
-        try:
-            return choices.index(value)
-        except ValueError:
-            return 0
-
-    soil_idx = encode(req.soil_type, SOIL_TYPES) if isinstance(req.soil_type, str) else int(req.soil_type)
-    crop_idx = encode(req.crop_type, CROP_TYPES) if isinstance(req.crop_type, str) else int(req.crop_type)
-
-    # Try to align features with the model's expected columns
-    features_full = {
-        "temperature": req.temperature,
-        "humidity": 0.0,  # not provided by form; default to 0
-        "moisture": req.moisture,
-        "soil_type": soil_idx,
-        "crop_type": crop_idx,
-        "N": req.N,
-        "P": req.P,
-        "K": req.K,
-        "pH": req.pH,
-    }
 
-    X = None
-    if ml_model is not None:
-        try:
-            cols = None
-            # scikit models often expose feature_names_in_ (numpy array)
-            if hasattr(ml_model, "feature_names_in_"):
-                cols = [c if isinstance(c, str) else str(c) for c in getattr(ml_model, "feature_names_in_")]
-            # Build DataFrame with best-effort column alignment
-            if cols:
-                row = {c: features_full.get(c, 0) for c in cols}
-                X = pd.DataFrame([row])
-            else:
-                # Fallback to a sensible order used in training
-                order = ["temperature", "humidity", "moisture", "soil_type", "crop_type", "N", "P", "K", "pH"]
-                row = {k: features_full.get(k, 0) for k in order}
-                X = pd.DataFrame([row])
-        except Exception:
-            X = pd.DataFrame([{k: features_full[k] for k in ["N", "P", "K", "pH", "moisture"]}])
+def predict_fertilizer(req: RecommendReq, active: Optional[LoadedModel] = None) -> str:
+    """Run the fertilizer model for one request (CPU-bound, call off the event loop)."""
+    try:
+        return predict_fertilizers([req.dict()], active, memo=True)[0]
+    except Exception:
+        return "Urea"
+
+
+def _model_version(active: Optional[LoadedModel]) -> Optional[str]:
+    return active.version if active is not None else None
 
-    fertilizer = "Urea"
-    if ml_model is not None and X is not None:
-        try:
-            pred = ml_model.predict(X)[0]
-            fertilizer = pred
-            # If model outputs class indices, map back with label encoder if present
-            if label_encoder is not None:
-                try:
-                    fertilizer = label_encoder.inverse_transform([int(pred)])[0]
-                except Exception:
-                    pass
-            # If prediction is a numpy scalar, coerce to string
-            fertilizer = str(fertilizer)
-        except Exception:
-            fertilizer = "Urea"
+
+@app.post("/api/recommend/", response_model=RecommendResp)
+async def recommend(req: RecommendReq = None, user=Depends(get_current_user)):
+    active = await ensure_model(fertilizer_slot)
+    fertilizer = await run_in_threadpool(predict_fertilizer, req, active)
 
     # Minimal details payload; extend if you have a fertilizer catalog
     details = {"name": fertilizer}
     
     # Fetch weather data (using a default city like Hyderabad if not provided)
-    weather_data = get_weather("Hyderabad")
+    weather_data = await run_in_threadpool(get_weather, "Hyderabad")
     if weather_data:
         details["weather"] = weather_data
         
@@ -1565,16 +1966,59 @@ def recommend(req: RecommendReq = None, user=Depends(get_current_user)):
         "ts": datetime.utcnow(),
         "user_email": user.get("email"),
         "input": req.dict(),
-        "output": details
+        "output": details,
+        "model_version": _model_version(active),
     }
 
     try:
-        if col_recs is not None:
-            col_recs.insert_one(rec)
+        if repos is not None:
+            await write_queue.put(repos.recommendations, rec)
     except Exception:
         pass
 
-    return {"fertilizer": fertilizer, "details": details}
+    return {"fertilizer": fertilizer, "details": details, "model_version": _model_version(active)}
+
+RECOMMEND_BATCH_MAX_ROWS = int(os.getenv("RECOMMEND_BATCH_MAX_ROWS", "10000"))
+
+
+@app.post("/api/recommend/batch")
+async def recommend_batch(reqs: List[RecommendReq], user=Depends(get_current_user)):
+    """
+    Recommend fertilizers for many rows in one call.
+    
+    All rows are encoded into one matrix, predicted with a single
+    model.predict call and decoded with one inverse_transform call. All
+    rows are served by the same model version.
+    Weather details are not included; use /api/recommend/ for those.
+    """
+    if len(reqs) > RECOMMEND_BATCH_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {RECOMMEND_BATCH_MAX_ROWS} rows per batch")
+    rows = [r.dict() for r in reqs]
+    active = await ensure_model(fertilizer_slot)
+    try:
+        fertilizers = await run_in_threadpool(predict_fertilizers, rows, active)
+    except Exception as e:
+        print(f"⚠️ Batch fertilizer prediction failed: {e}")
+        raise HTTPException(status_code=500, detail="Prediction failed")
+    
+    # Persist recommendations (best effort, one bulk insert)
+    if repos is not None and rows:
+        now = datetime.utcnow()
+        docs = [
+            {"ts": now, "user_email": user.get("email"), "input": row, "output": {"name": fertilizer},
+             "model_version": _model_version(active)}
+            for row, fertilizer in zip(rows, fertilizers)
+        ]
+        try:
+            await repos.recommendations.insert_many(docs)
+        except Exception as e:
+            print(f"⚠️ Failed to log batch recommendations: {e}")
+    
+    return {
+        "recommendations": [{"fertilizer": f} for f in fertilizers],
+        "count": len(fertilizers),
+        "model_version": _model_version(active),
+    }
 
 # --- Soil Analysis Helper Functions ---
 def analyze_soil_health(N: float, P: float, K: float, pH: float) -> tuple:
@@ -1651,7 +2095,7 @@ def analyze_soil_health(N: float, P: float, K: float, pH: float) -> tuple:
 
 # --- Soil Analysis Endpoint ---
 @app.post("/api/soil/analyze", response_model=SoilAnalysisResp)
-def analyze_soil(req: SoilAnalysisReq = None, user=Depends(get_current_user)):
+async def analyze_soil(req: SoilAnalysisReq = None, user=Depends(get_current_user)):
     """
     Analyze soil health based on nutrient levels and pH.
     Saves analysis to database and returns score, status, and suggestions.
@@ -1678,9 +2122,9 @@ def analyze_soil(req: SoilAnalysisReq = None, user=Depends(get_current_user)):
     
     # Save to MongoDB (best effort)
     try:
-        if col_soil_analysis is not None:
-            col_soil_analysis.insert_one(doc)
-            print(f"✅ Soil analysis saved for {email}")
+        if repos is not None:
+            if await write_queue.put(repos.soil_analysis, doc):
+                print(f"✅ Soil analysis queued for {email}")
     except Exception as e:
         print(f"⚠️ Failed to save soil analysis: {e}")
     
@@ -1691,18 +2135,80 @@ def analyze_soil(req: SoilAnalysisReq = None, user=Depends(get_current_user)):
         "suggestions": suggestions
     }
 
+# --- Bulk Soil Analysis Endpoint ---
+SOIL_BATCH_MAX_ROWS = int(os.getenv("SOIL_BATCH_MAX_ROWS", "10000"))
+
+
+@app.post("/api/soil/analyze/batch")
+async def analyze_soil_batch(request: Request, user=Depends(get_current_user)):
+    """
+    Analyze a whole lab report in one request.
+    
+    The body is CSV with a header row containing N, P, K and pH (and
+    optionally crop_type, soil_type), sent as Content-Type: text/csv. JSON
+    arrays and NDJSON are accepted too. All samples are scored together by
+    the vectorized scorer and saved with one bulk insert. Each result
+    matches what /api/soil/analyze returns for the same sample.
+    """
+    email = user.get("email")
+    samples: List[Dict[str, Any]] = []
+    results: List[Dict[str, Any]] = []
+    try:
+        async for row in iter_rows(request.stream(), request.headers.get("content-type")):
+            if len(results) >= SOIL_BATCH_MAX_ROWS:
+                raise HTTPException(status_code=413, detail=f"At most {SOIL_BATCH_MAX_ROWS} samples per batch")
+            item = {"index": len(results)}
+            results.append(item)
+            if isinstance(row, RowError):
+                item["error"] = str(row)
+                continue
+            try:
+                samples.append(dict(SoilSampleRow(**row).dict(), index=item["index"]))
+            except Exception as e:
+                item["error"] = _row_error_message(e)
+    except BatchInputError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    now = datetime.utcnow()
+    docs = []
+    for sample, (score, status, suggestions) in zip(samples, decode_all(score_records(samples))):
+        results[sample["index"]].update(score=score, status=status, suggestions=suggestions)
+        docs.append({
+            "user_email": email,
+            "N": sample["N"],
+            "P": sample["P"],
+            "K": sample["K"],
+            "pH": sample["pH"],
+            "crop_type": sample["crop_type"],
+            "soil_type": sample["soil_type"],
+            "score": score,
+            "status": status,
+            "suggestions": suggestions,
+            "created_at": now
+        })
+    
+    # Save to MongoDB (best effort, one bulk insert)
+    if docs and repos is not None:
+        try:
+            await repos.soil_analysis.insert_many(docs)
+            print(f"✅ {len(docs)} soil analyses saved for {email}")
+        except Exception as e:
+            print(f"⚠️ Failed to save soil analyses: {e}")
+    
+    return {"results": results, "count": len(docs), "errors": len(results) - len(docs)}
+
 # --- Soil Analysis History Endpoint ---
 @app.get("/api/soil/history")
-def get_soil_history(user=Depends(get_current_user)):
+async def get_soil_history(user=Depends(get_current_user)):
     """Get user's soil analysis history (sorted by newest first)"""
     email = user.get("email")
-    if col_soil_analysis is None:
+    if repos is None:
         return []
     
     try:
         # Find soil analyses for this user
         query = {"user_email": email} if email else {}
-        history = list(col_soil_analysis.find(query).sort("created_at", -1).limit(20))
+        history = await repos.soil_analysis.find_many(query, sort=[("created_at", -1)], limit=20)
         
         # Convert to JSON-serializable format
         for doc in history:
@@ -1717,16 +2223,16 @@ def get_soil_history(user=Depends(get_current_user)):
 
 # --- Recommendation History endpoint ---
 @app.get("/api/history")
-def get_history(user=Depends(get_current_user)):
+async def get_history(user=Depends(get_current_user)):
     """Get user's recommendation history (sorted by newest first)"""
     email = user.get("email")
-    if col_recs is None:
+    if repos is None:
         return []
     
     try:
         # Find recommendations for this user
         query = {"user_email": email} if email else {}
-        history = list(col_recs.find(query).sort("ts", -1).limit(50))
+        history = await repos.recommendations.find_many(query, sort=[("ts", -1)], limit=50)
         
         # Convert to JSON-serializable format
         for rec in history:
@@ -1754,13 +2260,12 @@ def get_prices():
 
 # --- Articles endpoints ---
 @app.get("/api/articles")
-def list_articles():
-    if col_articles is None:
+async def list_articles():
+    if repos is None:
         return []
     out: list[dict[str, Any]] = []
     try:
-        cursor = col_articles.find({}).sort("_id", -1)
-        for d in cursor:
+        for d in await repos.articles.find_many({}, sort=[("_id", -1)]):
             d = dict(d)
             d["id"] = str(d.pop("_id", ""))
             out.append(d)
@@ -1786,8 +2291,8 @@ def list_articles():
 #     d["id"] = str(d.pop("_id", ""))
 #     return d
 @app.get("/api/articles/{id}")
-def get_article(id: str):
-    if col_articles is None:
+async def get_article(id: str):
+    if repos is None:
         raise HTTPException(status_code=404, detail="Not found")
 
     # Try both ObjectId and string-based _id
@@ -1795,10 +2300,11 @@ def get_article(id: str):
     try:
         # Try ObjectId first
         oid = ObjectId(id)
-        doc = col_articles.find_one({"_id": oid})
     except Exception:
         # Then try string-based _id or id fields
-        doc = col_articles.find_one({"_id": id}) or col_articles.find_one({"id": id})
+        doc = await repos.articles.find_one({"_id": id}) or await repos.articles.find_one({"id": id})
+    else:
+        doc = await repos.articles.find_one({"_id": oid})
 
     if not doc:
         raise HTTPException(status_code=404, detail="Not found")
@@ -1809,8 +2315,8 @@ def get_article(id: str):
 
 # Optional: create an article (useful for testing via POST)
 @app.post("/api/articles")
-def create_article(a: ArticleIn):
-    if col_articles is None:
+async def create_article(a: ArticleIn):
+    if repos is None:
         raise HTTPException(status_code=500, detail="DB not configured")
     doc = a.dict()
     # Normalize: keep both image and image_url if provided; frontend supports either
@@ -1819,8 +2325,7 @@ def create_article(a: ArticleIn):
     if doc.get("description") is None and doc.get("excerpt"):
         doc["description"] = doc["excerpt"]
     try:
-        res = col_articles.insert_one(doc)
-        doc["id"] = str(res.inserted_id)
+        doc["id"] = str(await repos.articles.insert_one(doc))
         doc.pop("_id", None)  # Remove ObjectId which isn't JSON serializable
         return doc
     except Exception as e:
@@ -1829,8 +2334,8 @@ def create_article(a: ArticleIn):
 
 # --- Techniques endpoints ---
 @app.get("/api/techniques")
-def list_techniques(category: Optional[str] = None, tag: Optional[str] = None, limit: int = 0):
-    if 'col_techniques' not in globals() or col_techniques is None:
+async def list_techniques(category: Optional[str] = None, tag: Optional[str] = None, limit: int = 0):
+    if repos is None:
         return []
     out: list[dict[str, Any]] = []
     try:
@@ -1839,10 +2344,8 @@ def list_techniques(category: Optional[str] = None, tag: Optional[str] = None, l
             q["category"] = category
         if tag:
             q["tags"] = {"$in": [tag]}
-        cursor = col_techniques.find(q).sort("_id", -1)
-        if isinstance(limit, int) and limit > 0:
-            cursor = cursor.limit(limit)
-        for d in cursor:
+        n = limit if isinstance(limit, int) and limit > 0 else 0
+        for d in await repos.techniques.find_many(q, sort=[("_id", -1)], limit=n):
             d = dict(d)
             d["id"] = str(d.pop("_id", ""))
             out.append(d)
@@ -1852,15 +2355,15 @@ def list_techniques(category: Optional[str] = None, tag: Optional[str] = None, l
     return out
 
 @app.get("/api/techniques/{id}")
-def get_technique(id: str):
-    if 'col_techniques' not in globals() or col_techniques is None:
+async def get_technique(id: str):
+    if repos is None:
         raise HTTPException(status_code=404, detail="Not found")
     try:
         oid = ObjectId(id)
     except Exception:
-        doc = col_techniques.find_one({"id": id})
+        doc = await repos.techniques.find_one({"id": id})
     else:
-        doc = col_techniques.find_one({"_id": oid})
+        doc = await repos.techniques.find_one({"_id": oid})
     if not doc:
         raise HTTPException(status_code=404, detail="Not found")
     d = dict(doc)
@@ -1868,8 +2371,8 @@ def get_technique(id: str):
     return d
 
 @app.post("/api/techniques")
-def create_technique(a: ArticleIn):
-    if 'col_techniques' not in globals() or col_techniques is None:
+async def create_technique(a: ArticleIn):
+    if repos is None:
         raise HTTPException(status_code=500, detail="DB not configured")
     doc = a.dict()
     if doc.get("image_url") and not doc.get("image"):
@@ -1877,8 +2380,7 @@ def create_technique(a: ArticleIn):
     if doc.get("description") is None and doc.get("excerpt"):
         doc["description"] = doc["excerpt"]
     try:
-        res = col_techniques.insert_one(doc)
-        doc["id"] = str(res.inserted_id)
+        doc["id"] = str(await repos.techniques.insert_one(doc))
         doc.pop("_id", None)  # Remove ObjectId which isn't JSON serializable
         return doc
     except Exception as e:
@@ -1898,7 +2400,54 @@ class CropRecommendationRequest(BaseModel):
     season: str
 
 # Predefined list of crops to test for recommendations
-RECOMMENDATION_CROPS = ["Rice", "Wheat", "Maize", "Cotton", "Sugarcane", "Mango", "Banana", "Apple", "Orange", "Grapes"]
+RECOMMENDATION_CROPS = CANDIDATE_CROPS
+
+# Precomputed (state, season) yield tables for recommend_crop, see yield_table.py
+YIELD_TABLE_ENABLED = os.getenv("YIELD_TABLE_ENABLED", "true").lower() in ("1", "true", "yes")
+YIELD_TABLE_MAX_PAIRS = int(os.getenv("YIELD_TABLE_MAX_PAIRS", "256"))
+YIELD_TABLE_MAX_BUILDS = int(os.getenv("YIELD_TABLE_MAX_BUILDS", "2"))
+# Tables whose p90 relative interpolation error is above this are not served
+YIELD_TABLE_MAX_P90_REL = float(os.getenv("YIELD_TABLE_MAX_P90_REL", "0.1"))
+YIELD_TABLE_PATH = table_path_for(YIELD_MODEL_PATH)
+yield_tables = YieldTableStore(RECOMMENDATION_CROPS, maxsize=YIELD_TABLE_MAX_PAIRS, max_builds=YIELD_TABLE_MAX_BUILDS,
+                               max_p90_rel=YIELD_TABLE_MAX_P90_REL)
+_table_builds: set = set()
+
+
+def load_yield_tables(active: LoadedModel) -> int:
+    """Load tables prebuilt by ``python yield_table.py`` if they match the served model."""
+    if not YIELD_TABLE_ENABLED or not os.path.exists(YIELD_TABLE_PATH):
+        return 0
+    try:
+        loaded = yield_tables.load(YIELD_TABLE_PATH, active.version)
+        rejected = yield_tables.stats()["rejected"]
+        if loaded or rejected:
+            print(f"📊 Loaded {loaded} yield tables for model {active.version}"
+                  f" ({rejected} above the p90 error limit {YIELD_TABLE_MAX_P90_REL} use the model)")
+        else:
+            print(f"⚠️ {YIELD_TABLE_PATH} was built for another model version; tables will be rebuilt on demand")
+        return loaded
+    except Exception as e:
+        print(f"⚠️ Failed to load yield tables: {e}")
+        return 0
+
+
+def _schedule_table_build(active: LoadedModel, state: str, season: str) -> None:
+    """
+    Build the (state, season) table in the background; the current request uses live inference.
+
+    Only pairs the model has columns for get a table, so made-up states or
+    seasons cannot queue builds or evict real tables from the LRU.
+    """
+    if active.encoder.offset("State", state) is None or active.encoder.offset("Season", season) is None:
+        return
+    if not yield_tables.claim_build(active.version, state, season):
+        return
+    task = asyncio.create_task(run_in_threadpool(
+        yield_tables.build, active.version, active.model, active.encoder, state, season
+    ))
+    _table_builds.add(task)  # keep a reference until it finishes
+    task.add_done_callback(_table_builds.discard)
 
 # Static fallback prices for when API is unavailable (per quintal in INR)
 FALLBACK_PRICES = {
@@ -1930,7 +2479,8 @@ def predict_crop_yield(area: float, rainfall: float, fertilizer: float, pesticid
     
     Returns yield in tons/hectare or None if prediction fails.
     """
-    if yield_model is None or yield_columns is None:
+    active = yield_slot.ensure()
+    if active is None:
         return None
     
     try:
@@ -1943,40 +2493,228 @@ def predict_crop_yield(area: float, rainfall: float, fertilizer: float, pesticid
             "Season": season,
             "State": state
         }
-        X = prepare_yield_input(data)
-        pred = yield_model.predict(X)[0]
+        X = prepare_yield_input(data, active)
+        pred = yield_memo.predict(active.version, X, active.predict)[0]
         return float(pred) if pred > 0 else None
     except Exception as e:
         print(f"⚠️ Failed to predict yield for {crop}: {e}")
         return None
 
 
+def predict_crop_yields(area: float, rainfall: float, fertilizer: float, pesticide: float, crops: List[str], season: str, state: str, active: Optional[LoadedModel] = None) -> Dict[str, Optional[float]]:
+    """
+    Predict yields for several candidate crops with one batched model call.
+    
+    All crops share the same field inputs, so they are encoded into a single
+    matrix and scored in one forest traversal.
+    
+    Returns a dict of crop -> yield in tons/hectare (None if not positive).
+    """
+    if active is None:
+        active = yield_slot.ensure()
+    if active is None or not crops:
+        return {crop: None for crop in crops}
+    
+    try:
+        rows = [
+            {
+                "Area": area,
+                "Annual_Rainfall": rainfall,
+                "Fertilizer": fertilizer,
+                "Pesticide": pesticide,
+                "Crop": crop,
+                "Season": season,
+                "State": state
+            }
+            for crop in crops
+        ]
+        preds = yield_memo.predict(active.version, active.encoder.encode_many(rows), active.predict)
+        return {crop: (float(pred) if pred > 0 else None) for crop, pred in zip(crops, preds)}
+    except Exception as e:
+        print(f"⚠️ Failed to predict yields for {len(crops)} crops: {e}")
+        return {crop: None for crop in crops}
+
+
+# Crop recommendation price lookups run concurrently on the shared mandi pool.
+# Identical in-flight lookups (same crop + state) from concurrent requests
+# share one upstream call; anything not back by the deadline uses FALLBACK_PRICES.
+MANDI_PRICE_DEADLINE = float(os.getenv("MANDI_PRICE_DEADLINE_SECONDS", "3"))
+_mandi_flight = SingleFlight()
+
+
+def _price_from_mandi_result(crop: str, result: Dict[str, Any]) -> Optional[float]:
+    """Pick the live average price from a mandi result, or the static fallback."""
+    if not result.get("error") and result.get("average_price", 0) > 0:
+        return result["average_price"]
+    
+    # Use fallback price if API fails
+    return FALLBACK_PRICES.get(crop)
+
+
+def get_crop_market_prices(crops: List[str], state: str, deadline: Optional[float] = None) -> Dict[str, Optional[float]]:
+    """
+    Get market prices for several crops concurrently.
+    
+    Crops the mandi snapshot covers are answered inline. The rest are started
+    at once on the mandi pool and waited on together for at most ``deadline``
+    seconds (MANDI_PRICE_DEADLINE by default). Crops whose lookup has not
+    finished by then, or failed, get their FALLBACK_PRICES entry.
+    
+    Returns a dict of crop -> modal price per quintal (None if unavailable).
+    """
+    if deadline is None:
+        deadline = MANDI_PRICE_DEADLINE
+    
+    prices = {}
+    futures = {}
+    for crop in crops:
+        if mandi_snapshot.covers(crop, state):
+            prices[crop] = _price_from_mandi_result(crop, mandi_snapshot.query(crop, state, limit=20))
+            continue
+        futures[crop] = _mandi_flight.submit(
+            ("crop_price", crop, state), _mandi_pool,
+            fetch_mandi_prices, commodity=crop, state=state, limit=20
+        )
+    
+    if not futures:
+        return prices
+    done, pending = wait(futures.values(), timeout=deadline)
+    if pending:
+        print(f"⚠️ [Mandi] {len(pending)} price lookups missed the {deadline}s deadline, using fallback prices")
+    
+    for crop, fut in futures.items():
+        if fut not in done:
+            prices[crop] = FALLBACK_PRICES.get(crop)
+            continue
+        try:
+            prices[crop] = _price_from_mandi_result(crop, fut.result())
+        except Exception as e:
+            print(f"⚠️ Failed to get market price for {crop}: {e}")
+            prices[crop] = FALLBACK_PRICES.get(crop)
+    return prices
+
+
 def get_crop_market_price(crop: str, state: str) -> Optional[float]:
     """
     Get market price for a crop from mandi API or fallback.
     
     Returns modal price per quintal or None if unavailable.
     """
-    try:
-        # Try fetching from live API
-        result = fetch_mandi_prices(commodity=crop, state=state, limit=20)
-        
-        if not result.get("error") and result.get("average_price", 0) > 0:
-            return result["average_price"]
-        
-        # Use fallback price if API fails
-        if crop in FALLBACK_PRICES:
-            return FALLBACK_PRICES[crop]
-        
-        return None
-    except Exception as e:
-        print(f"⚠️ Failed to get market price for {crop}: {e}")
-        # Return fallback price
-        return FALLBACK_PRICES.get(crop)
+    return get_crop_market_prices([crop], state)[crop]
+
+
+# Mandi snapshot: every commodity x state pair is paged from data.gov.in in the
+# background, stored in mandi_prices and served from memory (0 disables).
+# Workers share the collection and only pull when the stored data is stale.
+MANDI_SNAPSHOT_SECONDS = float(os.getenv("MANDI_SNAPSHOT_REFRESH_SECONDS", "3600"))
+MANDI_SNAPSHOT_PAGE_SIZE = int(os.getenv("MANDI_SNAPSHOT_PAGE_SIZE", "500"))
+MANDI_SNAPSHOT_MAX_PAGES = int(os.getenv("MANDI_SNAPSHOT_MAX_PAGES", "20"))
+MANDI_SNAPSHOT_COMMODITIES = [c.strip() for c in os.getenv("MANDI_SNAPSHOT_COMMODITIES", "").split(",") if c.strip()] \
+    or sorted(set(FALLBACK_PRICES) | set(CANDIDATE_CROPS))
+MANDI_SNAPSHOT_STATES = [s.strip() for s in os.getenv("MANDI_SNAPSHOT_STATES", "").split(",") if s.strip()] \
+    or list(DEFAULT_STATES)
+# The pull has its own small pool so request-path price lookups on _mandi_pool
+# never queue behind hundreds of snapshot pages
+MANDI_SNAPSHOT_WORKERS = int(os.getenv("MANDI_SNAPSHOT_WORKERS", "4"))
+_mandi_snapshot_pool = ThreadPoolExecutor(max_workers=MANDI_SNAPSHOT_WORKERS, thread_name_prefix="mandi-snapshot")
+_mandi_snapshot_lock = asyncio.Lock()
+
+
+async def _pull_mandi_snapshot(fetched_at: datetime) -> Dict[str, Any]:
+    """Page every commodity x state pair from data.gov.in on the snapshot pool."""
+    loop = asyncio.get_running_loop()
+    pairs = [(c, s) for c in MANDI_SNAPSHOT_COMMODITIES for s in MANDI_SNAPSHOT_STATES]
+    results = await asyncio.gather(*(
+        loop.run_in_executor(_mandi_snapshot_pool, fetch_all_pages, _fetch_mandi_prices_uncached,
+                             commodity, state, MANDI_SNAPSHOT_PAGE_SIZE, MANDI_SNAPSHOT_MAX_PAGES)
+        for commodity, state in pairs
+    ))
+    docs: Dict[str, Dict[str, Any]] = {}
+    failed = []
+    for (commodity, state), (records, error) in zip(pairs, results):
+        if error:
+            failed.append((commodity, state))
+        for raw in records:
+            doc = normalize_record(raw, fetched_at)
+            if doc is not None:
+                docs[doc["_id"]] = doc
+    errors = {error for _, error in results if error}
+    return {"docs": list(docs.values()), "pairs": len(pairs), "failed": failed, "errors": sorted(errors)[:5]}
+
+
+async def refresh_mandi_snapshot(force: bool = False) -> Dict[str, Any]:
+    """
+    Bring the mandi snapshot up to date and load it into memory.
+    
+    Pulls from data.gov.in when the stored records are older than
+    MANDI_SNAPSHOT_SECONDS (or ``force``); otherwise just reloads what another
+    worker stored. Records of pairs that were fetched successfully but are no
+    longer upstream are removed; pairs that failed keep their old records.
+    
+    Returns:
+        Summary of the refresh (records, pairs, failed pairs, timings)
+    """
+    async with _mandi_snapshot_lock:
+        started = time.perf_counter()
+        now = datetime.utcnow()
+        now = now.replace(microsecond=now.microsecond // 1000 * 1000)  # BSON dates keep milliseconds
+        stored_at = None
+        if repos is not None:
+            newest = await repos.mandi_prices.find_many({}, sort=[("fetched_at", -1)], limit=1, projection={"fetched_at": 1})
+            stored_at = newest[0]["fetched_at"] if newest else None
+        stale = stored_at is None or (now - stored_at).total_seconds() >= MANDI_SNAPSHOT_SECONDS
+        summary: Dict[str, Any] = {"started_at": now.isoformat(), "pulled": False}
+        
+        docs = None
+        if MANDI_API_KEY and (force or stale):
+            pulled = await _pull_mandi_snapshot(now)
+            ok_pairs = pulled["pairs"] - len(pulled["failed"])
+            summary.update(pulled=True, pairs=pulled["pairs"], failed_pairs=len(pulled["failed"]), errors=pulled["errors"])
+            failed = {(match_key(c), match_key(s)) for c, s in pulled["failed"]}
+            if repos is not None:
+                await repos.mandi_prices.replace_many(pulled["docs"])
+                for commodity in MANDI_SNAPSHOT_COMMODITIES:
+                    states = [match_key(s) for s in MANDI_SNAPSHOT_STATES if (match_key(commodity), match_key(s)) not in failed]
+                    if states:
+                        await repos.mandi_prices.delete_many({
+                            "commodity_key": match_key(commodity),
+                            "state_key": {"$in": states},
+                            "fetched_at": {"$lt": now},
+                        })
+            elif ok_pairs:
+                # No database: keep the old records only for pairs that failed
+                kept = [d for d in mandi_snapshot.records() if (d["commodity_key"], d["state_key"]) in failed]
+                docs = pulled["docs"] + kept
+        
+        if repos is not None:
+            docs = await repos.mandi_prices.find_many({})
+        if docs:
+            refreshed_at = max(d["fetched_at"] for d in docs)
+            summary["records"] = mandi_snapshot.replace(docs, refreshed_at, MANDI_SNAPSHOT_COMMODITIES, MANDI_SNAPSHOT_STATES)
+        else:
+            summary["records"] = 0
+        summary["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        mandi_snapshot.last_refresh = summary
+        return summary
+
+
+async def _mandi_snapshot_loop():
+    """Refresh the mandi snapshot every MANDI_SNAPSHOT_SECONDS, after the database settles."""
+    if _data_layer_task is not None:
+        await asyncio.wait([_data_layer_task])
+    while True:
+        try:
+            summary = await refresh_mandi_snapshot()
+            if summary["pulled"]:
+                print(f"📊 [Mandi] Snapshot refreshed: {summary['records']} records, "
+                      f"{summary['failed_pairs']}/{summary['pairs']} pairs failed in {summary['duration_ms']:.0f} ms")
+        except Exception as e:
+            print(f"⚠️ [Mandi] Snapshot refresh failed: {e}")
+        await asyncio.sleep(MANDI_SNAPSHOT_SECONDS)
 
 
 @app.post("/api/crop/recommend")
-def recommend_crop(
+async def recommend_crop(
     req: CropRecommendationRequest,
     user: Dict[str, Any] = Depends(get_current_user)
 ):
@@ -1984,34 +2722,49 @@ def recommend_crop(
     Recommend the most profitable crop based on predicted yield and market prices.
     
     For each crop in the predefined list:
-    1. Predict yield using the trained model
-    2. Fetch current market price
+    1. Predict yield using the trained model (all crops in one batch)
+    2. Fetch current market price (all crops concurrently, with a deadline)
     3. Calculate estimated profit: yield * price * area
     
     Returns crops sorted by estimated profit (descending).
     """
-    if yield_model is None:
+    active = await ensure_model(yield_slot)
+    if active is None:
         raise HTTPException(status_code=500, detail="Yield prediction model not loaded")
     
     results = []
     
-    for crop in RECOMMENDATION_CROPS:
-        # Predict yield for this crop
-        predicted_yield = predict_crop_yield(
+    # Interpolate yields from the precomputed table for this (state, season);
+    # off-grid inputs, or a table that is not built yet, use the model
+    predicted_yields = None
+    if YIELD_TABLE_ENABLED:
+        predicted_yields = yield_tables.lookup(
+            active.version, req.state, req.season, req.area, req.rainfall, req.fertilizer, req.pesticide
+        )
+        if predicted_yields is None:
+            _schedule_table_build(active, req.state, req.season)
+    yield_source = "table" if predicted_yields is not None else "model"
+    if predicted_yields is None:
+        # Predict yields for all candidate crops in one batched call
+        predicted_yields = await run_in_threadpool(
+            predict_crop_yields,
             area=req.area,
             rainfall=req.rainfall,
             fertilizer=req.fertilizer,
             pesticide=req.pesticide,
-            crop=crop,
+            crops=RECOMMENDATION_CROPS,
             season=req.season,
-            state=req.state
+            state=req.state,
+            active=active
         )
-        
-        if predicted_yield is None or predicted_yield <= 0:
-            continue
-        
-        # Get market price for this crop
-        market_price = get_crop_market_price(crop, req.state)
+    
+    # Fetch market prices only for crops with a usable yield, concurrently
+    priced_crops = [crop for crop in RECOMMENDATION_CROPS if (predicted_yields.get(crop) or 0) > 0]
+    market_prices = await run_in_threadpool(get_crop_market_prices, priced_crops, req.state)
+    
+    for crop in priced_crops:
+        predicted_yield = predicted_yields[crop]
+        market_price = market_prices.get(crop)
         
         if market_price is None or market_price <= 0:
             continue
@@ -2053,12 +2806,15 @@ def recommend_crop(
         "state": req.state,
         "season": req.season,
         "top_crops": results[:5],  # Return top 5 crops
-        "all_crops_analyzed": len(results)
+        "all_crops_analyzed": len(results),
+        "model_version": active.version,
+        "yield_source": yield_source,
+        "market_data_age_seconds": mandi_snapshot.age_seconds() if mandi_snapshot.covers(None, req.state) else None
     }
     
     # Save recommendation to MongoDB
     try:
-        if col_crop_recommendations is not None:
+        if repos is not None:
             log = {
                 "farmer_id": user.get("email"),
                 "state": req.state,
@@ -2074,10 +2830,12 @@ def recommend_crop(
                 "market_price": top_crop["price"],
                 "estimated_profit": top_crop["profit"],
                 "all_recommendations": results[:5],
+                "model_version": active.version,
+                "yield_source": yield_source,
                 "timestamp": datetime.utcnow()
             }
-            col_crop_recommendations.insert_one(log)
-            print(f"✅ [CropRecommend] Saved recommendation for {user.get('email')}: {top_crop['crop']}")
+            await write_queue.put(repos.crop_recommendations, log)
+            print(f"✅ [CropRecommend] Queued recommendation for {user.get('email')}: {top_crop['crop']}")
     except Exception as e:
         print(f"⚠️ Failed to log crop recommendation: {e}")
     
@@ -2085,23 +2843,23 @@ def recommend_crop(
 
 
 @app.get("/api/crop/recommendations/history")
-def get_crop_recommendation_history(
+async def get_crop_recommendation_history(
     limit: int = 10,
     user: Dict[str, Any] = Depends(get_current_user)
 ):
     """
     Get crop recommendation history for the logged-in user.
     """
-    if col_crop_recommendations is None:
+    if repos is None:
         return []
     
     try:
-        cursor = col_crop_recommendations.find(
-            {"farmer_id": user.get("email")}
-        ).sort("timestamp", -1).limit(limit)
+        docs = await repos.crop_recommendations.find_many(
+            {"farmer_id": user.get("email")}, sort=[("timestamp", -1)], limit=limit
+        )
         
         history = []
-        for doc in cursor:
+        for doc in docs:
             doc = dict(doc)
             doc["id"] = str(doc.pop("_id", ""))
             if doc.get("timestamp"):
@@ -2118,64 +2876,182 @@ def get_crop_recommendation_history(
 # ADMIN DASHBOARD ENDPOINTS
 # =====================================================
 
+# Dashboard counts are materialised in the stats collection on every write
+# (see counters.py) and overwritten with exact counts every
+# ADMIN_COUNTS_RECONCILE_SECONDS by whichever worker finds them due (0 disables).
+ADMIN_COUNTS_RECONCILE_SECONDS = float(os.getenv("ADMIN_COUNTS_RECONCILE_SECONDS", "3600"))
+ADMIN_STAT_COLLECTIONS = {
+    "total_farmers": "users",
+    "total_recommendations": "recommendations",
+    "total_soil_analyses": "soil_analysis",
+    "total_yield_predictions": "yield_predictions",
+    "total_articles": "articles",
+    "total_contacts": "contacts",
+}
+
+
+async def reconcile_admin_counts(force: bool = False) -> Optional[Dict[str, int]]:
+    """
+    Recount the dashboard collections exactly if the stored counts are due.
+    
+    Returns:
+        The exact counts, or None when nothing was recounted
+    """
+    if repos is None:
+        return None
+    doc = await repos.counters.read()
+    reconciled_at = (doc or {}).get("reconciled_at")
+    if not force and reconciled_at is not None and \
+            (datetime.utcnow() - reconciled_at).total_seconds() < ADMIN_COUNTS_RECONCILE_SECONDS:
+        return None
+    started = time.perf_counter()
+    counts = await repos.counters.reconcile({name: getattr(repos, name) for name in Repositories.COUNTED})
+    if doc is not None:
+        drift = {name: counts[name] - doc.get("counts", {}).get(name, 0) for name in counts}
+        drift = {name: d for name, d in drift.items() if d}
+        if drift:
+            print(f"📊 [Stats] Reconciled dashboard counts, drift: {drift}")
+    print(f"📊 [Stats] Dashboard counts reconciled in {(time.perf_counter() - started) * 1000:.0f} ms")
+    return counts
+
+
+async def _admin_counts_loop():
+    """Periodically reconcile the materialised dashboard counts, after the database settles."""
+    if _data_layer_task is not None:
+        await asyncio.wait([_data_layer_task])
+    while True:
+        try:
+            await reconcile_admin_counts()
+        except Exception as e:
+            print(f"⚠️ Dashboard count reconcile failed: {e}")
+        await asyncio.sleep(ADMIN_COUNTS_RECONCILE_SECONDS)
+
+
 @app.get("/api/admin/stats")
-def get_admin_stats(admin: Dict[str, Any] = Depends(require_admin)):
+async def get_admin_stats(admin: Dict[str, Any] = Depends(require_admin)):
     """
     Get aggregated statistics for the admin dashboard.
     Returns counts for farmers, recommendations, soil analyses, yield predictions, articles, and contacts.
+    
+    Counts come from the materialised stats document (one read, no scans);
+    ``updated_at`` is the last counted write and ``reconciled_at`` the last
+    exact recount.
     """
-    stats = {
-        "total_farmers": 0,
-        "total_recommendations": 0,
-        "total_soil_analyses": 0,
-        "total_yield_predictions": 0,
-        "total_articles": 0,
-        "total_contacts": 0
-    }
+    stats: Dict[str, Any] = {key: 0 for key in ADMIN_STAT_COLLECTIONS}
+    stats.update(updated_at=None, reconciled_at=None)
+    
+    if repos is None:
+        return stats
     
     try:
-        if col_users is not None:
-            stats["total_farmers"] = col_users.count_documents({})
-        if col_recs is not None:
-            stats["total_recommendations"] = col_recs.count_documents({})
-        if col_soil_analysis is not None:
-            stats["total_soil_analyses"] = col_soil_analysis.count_documents({})
-        if col_yield_predictions is not None:
-            stats["total_yield_predictions"] = col_yield_predictions.count_documents({})
-        if col_articles is not None:
-            stats["total_articles"] = col_articles.count_documents({})
-        if col_contacts is not None:
-            stats["total_contacts"] = col_contacts.count_documents({})
+        doc = await repos.counters.read()
+        if doc is None or doc.get("reconciled_at") is None:
+            # Fresh database (or counts from before this existed): count once
+            await reconcile_admin_counts(force=True)
+            doc = await repos.counters.read() or {}
+        counts = doc.get("counts", {})
+        for key, name in ADMIN_STAT_COLLECTIONS.items():
+            stats[key] = max(0, int(counts.get(name, 0)))
+        for key in ("updated_at", "reconciled_at"):
+            stats[key] = doc[key].isoformat() if doc.get(key) else None
     except Exception as e:
         print(f"⚠️ Error fetching admin stats: {e}")
     
     return stats
 
 
+# Admin listings page on (sort key, _id) with an opaque cursor (see pagination.py);
+# skip is still honoured for old clients. Unfiltered totals come from the
+# materialised counts, filtered ones are counted up to ADMIN_TOTAL_COUNT_LIMIT.
+ADMIN_TOTAL_COUNT_LIMIT = int(os.getenv("ADMIN_TOTAL_COUNT_LIMIT", "10000"))
+
+
+async def _listing_total(repo: Repository, query: Dict[str, Any]) -> Tuple[int, bool]:
+    """Total for an admin listing and whether it is exact."""
+    if not query and repo.counters is not None:
+        doc = await repos.counters.read()
+        if doc is not None and repo.name in doc.get("counts", {}):
+            return max(0, int(doc["counts"][repo.name])), True
+    if not query:
+        return await repo.count(), True
+    total = await repo.count(query, limit=ADMIN_TOTAL_COUNT_LIMIT + 1)
+    return min(total, ADMIN_TOTAL_COUNT_LIMIT), total <= ADMIN_TOTAL_COUNT_LIMIT
+
+
+async def _admin_page(repo: Repository, query: Dict[str, Any], sort_field: str, skip: int, limit: int,
+                      cursor: Optional[str], include_total: bool) -> Dict[str, Any]:
+    """
+    Fetch one admin listing page.
+    
+    Returns:
+        Dict with docs, next_cursor, total (None unless include_total) and total_exact
+    
+    Raises:
+        HTTPException: 400 for a malformed cursor
+    """
+    try:
+        docs, next_cursor = await keyset_page(repo, query, sort_field, -1, limit, cursor, skip)
+    except CursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    page = {"docs": docs, "next_cursor": next_cursor, "total": None, "total_exact": None}
+    if include_total:
+        page["total"], page["total_exact"] = await _listing_total(repo, query)
+    return page
+
+
+# Farmer search reads the search_keys each user document carries (see
+# user_search.py); users written before it existed get them in one background
+# pass after startup. Each search reads at most USER_SEARCH_CANDIDATES
+# documents per index lookup before ranking.
+USER_SEARCH_BACKFILL = os.getenv("USER_SEARCH_BACKFILL", "true").lower() in ("1", "true", "yes")
+USER_SEARCH_CANDIDATES = int(os.getenv("USER_SEARCH_CANDIDATES", "200"))
+
+
+async def _backfill_user_search():
+    """Add search keys to existing users once the database is connected."""
+    if _data_layer_task is not None:
+        await asyncio.wait([_data_layer_task])
+    if repos is None:
+        return
+    try:
+        updated = await backfill_search_keys(repos.users)
+        if updated:
+            print(f"🔎 [Search] Added search keys to {updated} users")
+    except Exception as e:
+        print(f"⚠️ User search backfill failed: {e}")
+
+
 @app.get("/api/admin/farmers")
-def get_admin_farmers(skip: int = 0, limit: int = 50, search: Optional[str] = None, admin: Dict[str, Any] = Depends(require_admin)):
+async def get_admin_farmers(skip: int = 0, limit: int = 50, search: Optional[str] = None, cursor: Optional[str] = None,
+                            include_total: bool = True, admin: Dict[str, Any] = Depends(require_admin)):
     """
     Get list of all registered farmers for admin dashboard.
+    
+    Pass the returned ``next_cursor`` as ``cursor`` to get the next page.
+    With ``search``, farmers come best match first (typos in whole words
+    allowed) and are paged with ``skip``; ``total`` then counts the matches
+    found among the candidates read, and only the best ``max_results``
+    (USER_SEARCH_CANDIDATES) can be paged through.
     """
     farmers = []
     
-    if col_users is None:
+    if repos is None:
         return {"farmers": [], "total": 0}
     
     try:
-        query = {}
-        if search:
-            query = {
-                "$or": [
-                    {"name": {"$regex": search, "$options": "i"}},
-                    {"email": {"$regex": search, "$options": "i"}}
-                ]
-            }
-        
-        total = col_users.count_documents(query)
-        cursor = col_users.find(query).skip(skip).limit(limit).sort("created_at", -1)
+        if search and search.strip():
+            if max(0, skip) + max(1, limit) > USER_SEARCH_CANDIDATES:
+                raise HTTPException(status_code=400,
+                                    detail=f"Search results are limited to the best {USER_SEARCH_CANDIDATES}; "
+                                           f"refine the search instead of paging past them")
+            docs, total, exact = await search_users(repos.users, search, max(0, skip), max(1, limit),
+                                                    USER_SEARCH_CANDIDATES)
+            page = {"docs": docs, "next_cursor": None, "total": total if include_total else None,
+                    "total_exact": exact if include_total else None, "max_results": USER_SEARCH_CANDIDATES}
+        else:
+            page = await _admin_page(repos.users, {}, "created_at", skip, limit, cursor, include_total)
         
-        for doc in cursor:
+        for doc in page["docs"]:
             location = doc.get("location", {})
             if isinstance(location, str):
                 location = {"state": location, "district": ""}
@@ -2189,78 +3065,93 @@ def get_admin_farmers(skip: int = 0, limit: int = 50, search: Optional[str] = No
                 "joined_date": doc.get("created_at", "").isoformat() if doc.get("created_at") else ""
             })
         
-        return {"farmers": farmers, "total": total}
+        return {"farmers": farmers, "total": page["total"], "total_exact": page["total_exact"],
+                "next_cursor": page["next_cursor"], "max_results": page.get("max_results")}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"⚠️ Error fetching farmers: {e}")
         return {"farmers": [], "total": 0}
 
 
 @app.delete("/api/admin/farmers/{farmer_id}")
-def delete_farmer(farmer_id: str, admin: Dict[str, Any] = Depends(require_admin)):
+async def delete_farmer(farmer_id: str, admin: Dict[str, Any] = Depends(require_admin)):
     """
     Delete a farmer by ID.
     """
-    if col_users is None:
+    if repos is None:
         raise HTTPException(status_code=500, detail="Database not available")
     
     try:
-        result = col_users.delete_one({"_id": ObjectId(farmer_id)})
-        if result.deleted_count == 0:
+        doc = await repos.users.find_one_and_delete({"_id": ObjectId(farmer_id)}, projection={"email": 1})
+        if doc is None:
             raise HTTPException(status_code=404, detail="Farmer not found")
+        user_cache.invalidate(doc.get("email"))
         return {"status": "deleted", "id": farmer_id}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"⚠️ Error deleting farmer: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/admin/recommendations")
-def get_admin_recommendations(skip: int = 0, limit: int = 50, admin: Dict[str, Any] = Depends(require_admin)):
+async def get_admin_recommendations(skip: int = 0, limit: int = 50, cursor: Optional[str] = None, include_total: bool = True,
+                                 admin: Dict[str, Any] = Depends(require_admin)):
     """
     Get all fertilizer recommendations for admin dashboard.
+    
+    Pass the returned ``next_cursor`` as ``cursor`` to get the next page.
     """
     recommendations = []
     
-    if col_recs is None:
+    if repos is None:
         return {"recommendations": [], "total": 0}
     
     try:
-        total = col_recs.count_documents({})
-        cursor = col_recs.find({}).skip(skip).limit(limit).sort("created_at", -1)
+        page = await _admin_page(repos.recommendations, {}, "ts", skip, limit, cursor, include_total)
         
-        for doc in cursor:
+        for doc in page["docs"]:
+            # /api/recommend/ stores {ts, user_email, input: RecommendReq, output: {name}}
+            inputs = doc.get("input") or {}
             recommendations.append({
                 "id": str(doc.get("_id", "")),
                 "farmer_email": doc.get("user_email", doc.get("farmer_email", "")),
-                "crop": doc.get("crop_type", doc.get("crop", "")),
-                "soil_type": doc.get("soil_type", ""),
-                "fertilizer": doc.get("fertilizer", doc.get("recommended_fertilizer", "")),
-                "date": doc.get("created_at", doc.get("timestamp", ""))
+                "crop": inputs.get("crop_type", doc.get("crop_type", doc.get("crop", ""))),
+                "soil_type": inputs.get("soil_type", doc.get("soil_type", "")),
+                "fertilizer": (doc.get("output") or {}).get("name", doc.get("fertilizer", doc.get("recommended_fertilizer", ""))),
+                "date": doc.get("ts", doc.get("created_at", doc.get("timestamp", "")))
             })
             # Convert datetime to string
             if recommendations[-1]["date"] and hasattr(recommendations[-1]["date"], "isoformat"):
                 recommendations[-1]["date"] = recommendations[-1]["date"].isoformat()
         
-        return {"recommendations": recommendations, "total": total}
+        return {"recommendations": recommendations, "total": page["total"], "total_exact": page["total_exact"],
+                "next_cursor": page["next_cursor"]}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"⚠️ Error fetching recommendations: {e}")
         return {"recommendations": [], "total": 0}
 
 
 @app.get("/api/admin/soil-health")
-def get_admin_soil_health(skip: int = 0, limit: int = 50, admin: Dict[str, Any] = Depends(require_admin)):
+async def get_admin_soil_health(skip: int = 0, limit: int = 50, cursor: Optional[str] = None, include_total: bool = True,
+                             admin: Dict[str, Any] = Depends(require_admin)):
     """
     Get all soil health reports for admin dashboard.
+    
+    Pass the returned ``next_cursor`` as ``cursor`` to get the next page.
     """
     reports = []
     
-    if col_soil_analysis is None:
+    if repos is None:
         return {"reports": [], "total": 0}
     
     try:
-        total = col_soil_analysis.count_documents({})
-        cursor = col_soil_analysis.find({}).skip(skip).limit(limit).sort("created_at", -1)
+        page = await _admin_page(repos.soil_analysis, {}, "created_at", skip, limit, cursor, include_total)
         
-        for doc in cursor:
+        for doc in page["docs"]:
             reports.append({
                 "id": str(doc.get("_id", "")),
                 "farmer_email": doc.get("user_email", ""),
@@ -2275,27 +3166,32 @@ def get_admin_soil_health(skip: int = 0, limit: int = 50, admin: Dict[str, Any]
             if reports[-1]["date"] and hasattr(reports[-1]["date"], "isoformat"):
                 reports[-1]["date"] = reports[-1]["date"].isoformat()
         
-        return {"reports": reports, "total": total}
+        return {"reports": reports, "total": page["total"], "total_exact": page["total_exact"],
+                "next_cursor": page["next_cursor"]}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"⚠️ Error fetching soil health reports: {e}")
         return {"reports": [], "total": 0}
 
 
 @app.get("/api/admin/yield-predictions")
-def get_admin_yield_predictions(skip: int = 0, limit: int = 50, admin: Dict[str, Any] = Depends(require_admin)):
+async def get_admin_yield_predictions(skip: int = 0, limit: int = 50, cursor: Optional[str] = None, include_total: bool = True,
+                                   admin: Dict[str, Any] = Depends(require_admin)):
     """
     Get all crop yield predictions for admin dashboard.
+    
+    Pass the returned ``next_cursor`` as ``cursor`` to get the next page.
     """
     predictions = []
     
-    if col_yield_predictions is None:
+    if repos is None:
         return {"predictions": [], "total": 0}
     
     try:
-        total = col_yield_predictions.count_documents({})
-        cursor = col_yield_predictions.find({}).skip(skip).limit(limit).sort("created_at", -1)
+        page = await _admin_page(repos.yield_predictions, {}, "created_at", skip, limit, cursor, include_total)
         
-        for doc in cursor:
+        for doc in page["docs"]:
             predictions.append({
                 "id": str(doc.get("_id", "")),
                 "farmer_email": doc.get("user_email", doc.get("farmer_email", "")),
@@ -2309,14 +3205,17 @@ def get_admin_yield_predictions(skip: int = 0, limit: int = 50, admin: Dict[str,
             if predictions[-1]["date"] and hasattr(predictions[-1]["date"], "isoformat"):
                 predictions[-1]["date"] = predictions[-1]["date"].isoformat()
         
-        return {"predictions": predictions, "total": total}
+        return {"predictions": predictions, "total": page["total"], "total_exact": page["total_exact"],
+                "next_cursor": page["next_cursor"]}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"⚠️ Error fetching yield predictions: {e}")
         return {"predictions": [], "total": 0}
 
 
 @app.get("/api/admin/market-prices")
-def get_admin_market_prices(
+async def get_admin_market_prices(
     state: Optional[str] = None,
     commodity: Optional[str] = None,
     limit: int = 50,
@@ -2326,7 +3225,8 @@ def get_admin_market_prices(
     Get market price data for admin dashboard.
     """
     # Use the existing market API function
-    result = fetch_mandi_prices(
+    result = await run_in_threadpool(
+        fetch_mandi_prices,
         commodity=commodity,
         state=state,
         limit=limit
@@ -2348,24 +3248,102 @@ def get_admin_market_prices(
             "arrival_date": record.get("arrival_date", "")
         })
     
-    return {"prices": prices, "total": len(prices), "average_price": result.get("average_price", 0)}
+    return {
+        "prices": prices,
+        "total": len(prices),
+        "average_price": result.get("average_price", 0),
+        "served_from": result.get("served_from"),
+        "data_age_seconds": result.get("data_age_seconds"),
+    }
+
+
+@app.post("/api/admin/market-prices/refresh")
+async def refresh_admin_market_prices(admin: Dict[str, Any] = Depends(require_admin)):
+    """
+    Pull the mandi snapshot from data.gov.in now instead of waiting for the scheduler.
+    """
+    if not MANDI_API_KEY:
+        raise HTTPException(status_code=503, detail="API key not configured")
+    return await refresh_mandi_snapshot(force=True)
+
+
+@app.get("/api/admin/cache/stats")
+def get_admin_cache_stats(admin: Dict[str, Any] = Depends(require_admin)):
+    """
+    Get hit/miss counters for the in-process response caches.
+    """
+    return {
+        "mandi": mandi_cache.stats(),
+        "mandi_snapshot": mandi_snapshot.stats(),
+        "weather": weather_cache.stats(),
+        "tokens": token_cache.stats(),
+        "users": user_cache.stats(),
+        "yield_predictions": yield_memo.stats(),
+        "fertilizer_predictions": fertilizer_memo.stats(),
+        "yield_tables": yield_tables.stats(),
+    }
+
+
+@app.get("/api/admin/metrics")
+def get_admin_metrics(admin: Dict[str, Any] = Depends(require_admin)):
+    """
+    Get runtime metrics for in-process worker pools and queues.
+    """
+    return {
+        "password_pool": password_pool.stats(),
+        "mongo_pool": pool_stats(),
+        "write_behind": write_queue.stats(),
+    }
+
+
+@app.get("/api/admin/models")
+def get_admin_models(admin: Dict[str, Any] = Depends(require_admin)):
+    """
+    Get the version, load state and last reload result of each model in this worker.
+    """
+    return {slot.name: slot.status() for slot in MODEL_SLOTS}
+
+
+@app.post("/api/admin/models/reload")
+async def post_admin_models_reload(model: Optional[str] = None, force: bool = False, admin: Dict[str, Any] = Depends(require_admin)):
+    """
+    Hot-reload model files without restarting the worker.
+    
+    The new file is loaded in the background and canary-checked; the served
+    model is swapped only if it passes, and in-flight requests finish on the
+    version they started with. Only reloads the worker that handles this
+    request; set MODEL_WATCH_SECONDS to have every worker follow file changes.
+    
+    Query params:
+        - model: "yield" or "fertilizer" (default: both)
+        - force: Reload even if the files look unchanged
+    """
+    names = [slot.name for slot in MODEL_SLOTS]
+    if model is not None and model not in names:
+        raise HTTPException(status_code=404, detail=f"Unknown model: {model}")
+    results = await reload_models([model] if model else None, force=force)
+    if any(r["status"] == "failed" for r in results):
+        return JSONResponse(status_code=422, content={"results": results})
+    return {"results": results}
 
 
 @app.get("/api/admin/contacts")
-def get_admin_contacts(skip: int = 0, limit: int = 50, admin: Dict[str, Any] = Depends(require_admin)):
+async def get_admin_contacts(skip: int = 0, limit: int = 50, cursor: Optional[str] = None, include_total: bool = True,
+                          admin: Dict[str, Any] = Depends(require_admin)):
     """
     Get all contact messages for admin dashboard.
+    
+    Pass the returned ``next_cursor`` as ``cursor`` to get the next page.
     """
     contacts = []
     
-    if col_contacts is None:
+    if repos is None:
         return {"contacts": [], "total": 0}
     
     try:
-        total = col_contacts.count_documents({})
-        cursor = col_contacts.find({}).skip(skip).limit(limit).sort("ts", -1)
+        page = await _admin_page(repos.contacts, {}, "ts", skip, limit, cursor, include_total)
         
-        for doc in cursor:
+        for doc in page["docs"]:
             contacts.append({
                 "id": str(doc.get("_id", "")),
                 "name": doc.get("name", ""),
@@ -2377,37 +3355,84 @@ def get_admin_contacts(skip: int = 0, limit: int = 50, admin: Dict[str, Any] = D
             if contacts[-1]["date"] and hasattr(contacts[-1]["date"], "isoformat"):
                 contacts[-1]["date"] = contacts[-1]["date"].isoformat()
         
-        return {"contacts": contacts, "total": total}
+        return {"contacts": contacts, "total": page["total"], "total_exact": page["total_exact"],
+                "next_cursor": page["next_cursor"]}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"⚠️ Error fetching contacts: {e}")
         return {"contacts": [], "total": 0}
 
 
+# Charts read daily rollups (see rollups.py) instead of grouping whole
+# collections. Every CHART_ROLLUP_SECONDS (0 disables) a worker folds in the
+# documents written since the last run, except the newest
+# CHART_ROLLUP_LAG_SECONDS, whose ids may still be arriving out of order.
+CHART_ROLLUP_SECONDS = float(os.getenv("CHART_ROLLUP_SECONDS", "60"))
+CHART_ROLLUP_LAG_SECONDS = float(os.getenv("CHART_ROLLUP_LAG_SECONDS", "120"))
+CHART_ROLLUP_BATCH_SIZE = int(os.getenv("CHART_ROLLUP_BATCH_SIZE", "5000"))
+
+
+async def refresh_chart_rollups(upto: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    Fold new recommendations and yield predictions into the chart rollups.
+    
+    Args:
+        upto: Newest document time to include (default: now minus CHART_ROLLUP_LAG_SECONDS)
+    
+    Returns:
+        Documents processed per collection
+    """
+    if repos is None:
+        return {}
+    if upto is None:
+        upto = datetime.utcnow() - timedelta(seconds=CHART_ROLLUP_LAG_SECONDS)
+    processed = await advance_rollups(repos, upto, batch_size=CHART_ROLLUP_BATCH_SIZE)
+    if any(processed.values()):
+        print(f"📈 [Charts] Rolled up {processed}")
+    return processed
+
+
+async def _chart_rollup_loop():
+    """Periodically advance the chart rollups, after the database settles."""
+    if _data_layer_task is not None:
+        await asyncio.wait([_data_layer_task])
+    while True:
+        try:
+            await refresh_chart_rollups()
+        except Exception as e:
+            print(f"⚠️ Chart rollup failed: {e}")
+        await asyncio.sleep(CHART_ROLLUP_SECONDS)
+
+
+@app.post("/api/admin/charts/rebuild")
+async def rebuild_chart_rollups(admin: Dict[str, Any] = Depends(require_admin)):
+    """
+    Drop the chart rollups and rebuild them from the full collections.
+    
+    Only needed after bulk edits or deletes of logged documents, which the
+    incremental rollup does not see.
+    """
+    if repos is None:
+        raise HTTPException(status_code=503, detail="Database not connected")
+    await reset_rollups(repos)
+    processed = await refresh_chart_rollups()
+    return {"processed": processed, "watermarks": await watermarks(repos)}
+
+
 @app.get("/api/admin/charts/fertilizer-distribution")
-def get_fertilizer_distribution(admin: Dict[str, Any] = Depends(require_admin)):
+async def get_fertilizer_distribution(admin: Dict[str, Any] = Depends(require_admin)):
     """
     Get fertilizer recommendation distribution for pie chart.
     """
-    distribution = {}
-    
-    if col_recs is None:
+    if repos is None:
         return {"labels": [], "data": []}
     
     try:
-        pipeline = [
-            {"$group": {"_id": "$fertilizer", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}},
-            {"$limit": 10}
-        ]
-        results = list(col_recs.aggregate(pipeline))
-        
-        for item in results:
-            if item["_id"]:
-                distribution[item["_id"]] = item["count"]
-        
+        totals = await read_totals(repos, "fertilizer", limit=10)
         return {
-            "labels": list(distribution.keys()),
-            "data": list(distribution.values())
+            "labels": [name for name, _ in totals],
+            "data": [count for _, count in totals]
         }
     except Exception as e:
         print(f"⚠️ Error fetching fertilizer distribution: {e}")
@@ -2415,30 +3440,20 @@ def get_fertilizer_distribution(admin: Dict[str, Any] = Depends(require_admin)):
 
 
 @app.get("/api/admin/charts/yield-trend")
-def get_yield_trend(admin: Dict[str, Any] = Depends(require_admin)):
+async def get_yield_trend(admin: Dict[str, Any] = Depends(require_admin)):
     """
     Get yield prediction trend over time for line chart.
     """
-    if col_yield_predictions is None:
+    if repos is None:
         return {"labels": [], "data": []}
     
     try:
-        # Get last 30 days of predictions
-        from datetime import datetime, timedelta
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+        # Last 30 days of predictions, one rollup row per day
+        since = (datetime.utcnow() - timedelta(days=30)).strftime("%Y-%m-%d")
+        rows = [r for r in await read_daily(repos, "yield", since) if r.get("count")]
         
-        pipeline = [
-            {"$match": {"created_at": {"$gte": thirty_days_ago}}},
-            {"$group": {
-                "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
-                "avg_yield": {"$avg": "$predicted_yield"}
-            }},
-            {"$sort": {"_id": 1}}
-        ]
-        results = list(col_yield_predictions.aggregate(pipeline))
-        
-        labels = [r["_id"] for r in results]
-        data = [round(r["avg_yield"], 2) for r in results]
+        labels = [r["day"] for r in rows]
+        data = [round(r["sum"] / r["count"], 2) for r in rows]
         
         return {"labels": labels, "data": data}
     except Exception as e:
@@ -2447,44 +3462,21 @@ def get_yield_trend(admin: Dict[str, Any] = Depends(require_admin)):
 
 
 @app.get("/api/admin/charts/crop-popularity")
-def get_crop_popularity(admin: Dict[str, Any] = Depends(require_admin)):
+async def get_crop_popularity(admin: Dict[str, Any] = Depends(require_admin)):
     """
     Get most popular crops selected by farmers for bar chart.
+    
+    Yield predictions and fertilizer recommendations roll up into the same
+    per-crop counts.
     """
-    if col_yield_predictions is None and col_recs is None:
+    if repos is None:
         return {"labels": [], "data": []}
     
     try:
-        popularity = {}
-        
-        # From yield predictions
-        if col_yield_predictions is not None:
-            pipeline = [
-                {"$group": {"_id": "$Crop", "count": {"$sum": 1}}},
-                {"$sort": {"count": -1}},
-                {"$limit": 10}
-            ]
-            for item in col_yield_predictions.aggregate(pipeline):
-                if item["_id"]:
-                    popularity[item["_id"]] = popularity.get(item["_id"], 0) + item["count"]
-        
-        # From recommendations
-        if col_recs is not None:
-            pipeline = [
-                {"$group": {"_id": "$crop_type", "count": {"$sum": 1}}},
-                {"$sort": {"count": -1}},
-                {"$limit": 10}
-            ]
-            for item in col_recs.aggregate(pipeline):
-                if item["_id"]:
-                    popularity[item["_id"]] = popularity.get(item["_id"], 0) + item["count"]
-        
-        # Sort by popularity
-        sorted_items = sorted(popularity.items(), key=lambda x: x[1], reverse=True)[:10]
-        
+        totals = await read_totals(repos, "crop", limit=10)
         return {
-            "labels": [item[0] for item in sorted_items],
-            "data": [item[1] for item in sorted_items]
+            "labels": [crop for crop, _ in totals],
+            "data": [count for _, count in totals]
         }
     except Exception as e:
         print(f"⚠️ Error fetching crop popularity: {e}")
@@ -2492,20 +3484,22 @@ def get_crop_popularity(admin: Dict[str, Any] = Depends(require_admin)):
 
 
 @app.get("/api/admin/articles")
-def get_admin_articles(skip: int = 0, limit: int = 50, admin: Dict[str, Any] = Depends(require_admin)):
+async def get_admin_articles(skip: int = 0, limit: int = 50, cursor: Optional[str] = None, include_total: bool = True,
+                          admin: Dict[str, Any] = Depends(require_admin)):
     """
     Get all articles for admin dashboard.
+    
+    Pass the returned ``next_cursor`` as ``cursor`` to get the next page.
     """
     articles = []
     
-    if col_articles is None:
+    if repos is None:
         return {"articles": [], "total": 0}
     
     try:
-        total = col_articles.count_documents({})
-        cursor = col_articles.find({}).skip(skip).limit(limit).sort("publishedAt", -1)
+        page = await _admin_page(repos.articles, {}, "publishedAt", skip, limit, cursor, include_total)
         
-        for doc in cursor:
+        for doc in page["docs"]:
             articles.append({
                 "id": str(doc.get("_id", "")),
                 "title": doc.get("title", ""),
@@ -2516,7 +3510,13 @@ def get_admin_articles(skip: int = 0, limit: int = 50, admin: Dict[str, Any] = D
             if articles[-1]["publishedAt"] and hasattr(articles[-1]["publishedAt"], "isoformat"):
                 articles[-1]["publishedAt"] = articles[-1]["publishedAt"].isoformat()
         
-        return {"articles": articles, "total": total}
+        return {"articles": articles, "total": page["total"], "total_exact": page["total_exact"],
+                "next_cursor": page["next_cursor"]}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"⚠️ Error fetching articles: {e}")
         return {"articles": [], "total": 0}
+
+
+startup_timings["import_ms"] = _ms_since_import()
@@ -0,0 +1,89 @@
+"""
+Incremental parsing of batch uploads.
+
+Batch endpoints accept a JSON array, NDJSON (one object per line) or CSV
+with a header row. NDJSON and CSV bodies are parsed line by line as the
+upload arrives, so the raw body is never held in memory as a whole.
+"""
+
+import csv
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines")
+CSV_TYPES = ("text/csv", "application/csv")
+
+
+class BatchInputError(ValueError):
+    """The upload as a whole cannot be parsed (bad JSON, no CSV header, ...)."""
+
+
+class RowError(ValueError):
+    """A single row could not be parsed; the rest of the upload is still usable."""
+
+
+def input_format(content_type: Optional[str]) -> str:
+    """Map a Content-Type header to "json", "ndjson" or "csv"."""
+    ctype = (content_type or "").split(";")[0].strip().lower()
+    if ctype in NDJSON_TYPES:
+        return "ndjson"
+    if ctype in CSV_TYPES:
+        return "csv"
+    return "json"
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a stream of byte chunks into decoded lines (without line endings)."""
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.rstrip(b"\r").decode("utf-8-sig")
+    if pending:
+        yield pending.rstrip(b"\r").decode("utf-8-sig")
+
+
+async def iter_rows(chunks: AsyncIterator[bytes], content_type: Optional[str]) -> AsyncIterator[Union[Dict[str, Any], RowError]]:
+    """
+    Yield one dict per uploaded row, or a RowError for a row that cannot be parsed.
+
+    Raises BatchInputError when the upload as a whole is malformed.
+    """
+    fmt = input_format(content_type)
+    if fmt == "json":
+        body = b"".join([chunk async for chunk in chunks])
+        try:
+            rows = json.loads(body or b"[]")
+        except ValueError as e:
+            raise BatchInputError(f"Invalid JSON: {e}")
+        if not isinstance(rows, list):
+            raise BatchInputError("Expected a JSON array of rows")
+        for row in rows:
+            yield row if isinstance(row, dict) else RowError("Row is not an object")
+        return
+
+    header: Optional[List[str]] = None
+    async for line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        if fmt == "ndjson":
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield RowError(f"Invalid JSON line: {e}")
+                continue
+            yield row if isinstance(row, dict) else RowError("Row is not an object")
+            continue
+
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [h.strip() for h in values]
+            continue
+        if len(values) != len(header):
+            yield RowError(f"Expected {len(header)} columns, got {len(values)}")
+            continue
+        yield dict(zip(header, values))
+
+    if fmt == "csv" and header is None:
+        raise BatchInputError("CSV upload has no header row")
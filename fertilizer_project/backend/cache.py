@@ -0,0 +1,146 @@
+"""
+In-process TTL + LRU cache for upstream API responses.
+
+Entries are evicted least-recently-used once ``maxsize`` is reached. An entry
+older than ``ttl`` but younger than ``ttl + stale_ttl`` is still served
+(stale-while-revalidate) while a single background refresh replaces it.
+Concurrent misses for the same key share one load.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from singleflight import SingleFlight
+
+
+class CacheEntry:
+    __slots__ = ("value", "stored_at")
+
+    def __init__(self, value: Any, stored_at: float):
+        self.value = value
+        self.stored_at = stored_at
+
+    @property
+    def age(self) -> float:
+        """Seconds since the value was fetched."""
+        return time.monotonic() - self.stored_at
+
+
+class TTLCache:
+    """Thread-safe, size-bounded TTL cache with stale-while-revalidate."""
+
+    def __init__(
+        self,
+        maxsize: int = 256,
+        ttl: float = 300.0,
+        stale_ttl: float = 0.0,
+        executor: Optional[Executor] = None,
+        should_cache: Optional[Callable[[Any], bool]] = None,
+    ):
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = float(ttl)
+        self.stale_ttl = float(stale_ttl)
+        self.executor = executor
+        self.should_cache = should_cache or (lambda value: value is not None)
+        self._data: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loads = SingleFlight()
+        self._refreshes = SingleFlight()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refresh_errors = 0
+
+    def lookup(self, key: Hashable) -> Optional[CacheEntry]:
+        """Return the entry for ``key`` if it is still servable (fresh or stale), without loading."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry.age >= self.ttl + self.stale_ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry
+
+    def put(self, key: Hashable, value: Any) -> CacheEntry:
+        entry = CacheEntry(value, time.monotonic())
+        if not self.should_cache(value):
+            return entry
+        with self._lock:
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def invalidate(self, key: Hashable) -> bool:
+        """Drop ``key`` so the next lookup reloads it. Returns True if it was cached."""
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> CacheEntry:
+        """
+        Return a cached entry for ``key``, calling ``loader()`` on a miss.
+
+        Concurrent misses for the same key wait on a single ``loader()`` call.
+        Stale entries are returned immediately; the refresh runs on
+        ``executor`` (at most one per key) when one is configured.
+        """
+        entry = self.lookup(key)
+        if entry is not None and entry.age < self.ttl:
+            with self._lock:
+                self.hits += 1
+            return entry
+        if entry is not None and self.executor is not None:
+            with self._lock:
+                self.stale_hits += 1
+            self._refreshes.submit(key, self.executor, self._refresh, key, loader)
+            return entry
+        with self._lock:
+            self.misses += 1
+        return self._loads.do(key, self._load, key, loader)
+
+    def _load(self, key: Hashable, loader: Callable[[], Any]) -> CacheEntry:
+        # Another caller may have filled the key between our lookup and now
+        entry = self.lookup(key)
+        if entry is not None and entry.age < self.ttl:
+            return entry
+        return self.put(key, loader())
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any]) -> None:
+        try:
+            self.put(key, loader())
+        except Exception as e:
+            with self._lock:
+                self.refresh_errors += 1
+            print(f"⚠️ Cache refresh failed for {key}: {e}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "stale_ttl_seconds": self.stale_ttl,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "coalesced": self._loads.shared,
+                "evictions": self.evictions,
+                "refresh_errors": self.refresh_errors,
+                "hit_ratio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+            }
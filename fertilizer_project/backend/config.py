@@ -7,10 +7,21 @@ import os
 from dotenv import load_dotenv
 
 # Load environment variables from .env file once on module import
+# (the repository root first, then the current directory)
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), "../../.env"))
 load_dotenv()
 
 # MongoDB Configuration
 MONGO_URI: str = os.getenv("MONGO_URI", "mongodb://localhost:27017/agriadvisor")
+MONGO_DB: str = os.getenv("MONGO_DB", "fertilizer_project")
+
+# MongoDB connection pool (one client per worker process)
+MONGO_MAX_POOL_SIZE: int = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE: int = int(os.getenv("MONGO_MIN_POOL_SIZE", "5"))
+MONGO_MAX_IDLE_TIME_MS: int = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS: int = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS: int = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS: int = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
 
 # External API Keys
 OPENWEATHER_API_KEY: str = os.getenv("OPENWEATHER_API_KEY", "")
@@ -19,10 +30,30 @@ OPENWEATHER_API_KEY: str = os.getenv("OPENWEATHER_API_KEY", "")
 JWT_SECRET: str = os.getenv("JWT_SECRET", "dev-secret-key-change-in-production")
 
 
+def get_mongo_client_options() -> dict:
+    """
+    Keyword arguments for the shared MongoDB client.
+
+    No socket timeout (long admin aggregations and index builds must not be
+    cut off mid-operation) and no write concern, so the server default applies.
+    """
+    return {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "retryWrites": True,
+        "retryReads": True,
+    }
+
+
 def get_settings() -> dict:
     """Return all configuration settings as a dictionary."""
     return {
         "MONGO_URI": MONGO_URI,
+        "MONGO_DB": MONGO_DB,
         "OPENWEATHER_API_KEY": OPENWEATHER_API_KEY,
         "JWT_SECRET": JWT_SECRET,
     }
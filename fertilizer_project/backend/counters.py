@@ -0,0 +1,83 @@
+"""
+Materialised document counts for the admin dashboard.
+
+``/api/admin/stats`` used to run ``count_documents({})`` on six collections
+per page load, each a full scan. The counted repositories now bump a
+per-collection counter in a single ``stats`` document whenever they insert
+or delete, so the endpoint reads one document by ``_id``. Counter updates
+are best-effort (a lost increment only skews the number), and
+``reconcile`` periodically overwrites them with exact counts.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+COUNTS_DOC_ID = "collection_counts"
+
+
+class CollectionCounters:
+    """
+    Per-collection document counts stored in one document of ``repo``.
+
+    Args:
+        repo: Repository of the ``stats`` collection
+        names: Collections whose writes are counted
+    """
+
+    def __init__(self, repo, names: Iterable[str], doc_id: str = COUNTS_DOC_ID):
+        self.repo = repo
+        self.names = tuple(names)
+        self.doc_id = doc_id
+        self.increments = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+
+    def counts(self, name: str) -> bool:
+        return name in self.names
+
+    async def incr(self, name: str, n: int = 1) -> None:
+        """Add ``n`` (negative for deletes) to ``name``'s count; never raises."""
+        if not n or name not in self.names:
+            return
+        try:
+            await self.repo.update_one(
+                {"_id": self.doc_id},
+                {"$inc": {f"counts.{name}": n}, "$set": {"updated_at": datetime.utcnow()}},
+                upsert=True,
+            )
+            self.increments += 1
+        except Exception as e:
+            self.errors += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            print(f"⚠️ Counter update for {name} failed: {e}")
+
+    async def read(self) -> Optional[Dict[str, Any]]:
+        """The stored counts document, or None before the first reconcile/write."""
+        return await self.repo.find_one({"_id": self.doc_id})
+
+    async def reconcile(self, repos_by_name: Dict[str, Any]) -> Dict[str, int]:
+        """
+        Replace the stored counts with exact ``count_documents`` results.
+
+        Writes that land while counting can be off by their own increment
+        until the next reconcile; that is the accepted price for not
+        locking the write path.
+        """
+        exact = {}
+        for name in self.names:
+            exact[name] = await repos_by_name[name].count()
+        now = datetime.utcnow()
+        await self.repo.update_one(
+            {"_id": self.doc_id},
+            {"$set": {"counts": exact, "updated_at": now, "reconciled_at": now}},
+            upsert=True,
+        )
+        return exact
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "collections": list(self.names),
+            "increments": self.increments,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,79 @@
+"""
+Precomputed feature layout for the fertilizer model.
+
+Resolves the model's column order (``feature_names_in_``) and the soil/crop
+code tables once at model load, so requests only fill a NumPy matrix and
+make one ``predict`` / ``inverse_transform`` call per batch. The matrix
+goes to the model as a plain array in ``feature_names_in_`` order; no
+DataFrame is built per request (see ``model_loader.predict_quietly`` for the
+feature-names warning that skips).
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# Column order used in training when the model does not record feature names
+DEFAULT_ORDER = ["temperature", "humidity", "moisture", "soil_type", "crop_type", "N", "P", "K", "pH"]
+NUMERIC_FIELDS = ("temperature", "moisture", "N", "P", "K", "pH")
+
+
+class FertilizerFeatureEncoder:
+    """
+    Encode ``RecommendReq``-shaped dicts into the model's feature matrix.
+
+    Unknown soil/crop names encode as 0 and columns the request does not
+    provide (e.g. humidity) stay 0, matching the single-row ``recommend``
+    behaviour.
+    """
+
+    def __init__(self, columns: Optional[Sequence[Any]], soil_types: List[str], crop_types: List[str]):
+        self.columns = [c if isinstance(c, str) else str(c) for c in columns] if columns is not None and len(columns) else list(DEFAULT_ORDER)
+        self.n_features = len(self.columns)
+        index = {col: i for i, col in enumerate(self.columns)}
+        self.numeric_offsets = [(name, index[name]) for name in NUMERIC_FIELDS if name in index]
+        self.soil_offset = index.get("soil_type")
+        self.crop_offset = index.get("crop_type")
+        self.soil_codes: Dict[str, int] = {name: i for i, name in enumerate(soil_types)}
+        self.crop_codes: Dict[str, int] = {name: i for i, name in enumerate(crop_types)}
+
+    @classmethod
+    def for_model(cls, model, soil_types: List[str], crop_types: List[str]) -> "FertilizerFeatureEncoder":
+        # scikit models often expose feature_names_in_ (numpy array)
+        return cls(getattr(model, "feature_names_in_", None), soil_types, crop_types)
+
+    @staticmethod
+    def _code(value: Any, codes: Dict[str, int]) -> int:
+        if isinstance(value, str):
+            return codes.get(value, 0)
+        return int(value)
+
+    def encode_many(self, rows: Iterable[Dict[str, Any]]) -> np.ndarray:
+        """Encode many request dicts into one ``(n_rows, n_features)`` matrix in ``columns`` order."""
+        rows = list(rows)
+        X = np.zeros((len(rows), self.n_features), dtype=np.float64)
+        for name, i in self.numeric_offsets:
+            X[:, i] = [row[name] for row in rows]
+        if self.soil_offset is not None:
+            X[:, self.soil_offset] = [self._code(row["soil_type"], self.soil_codes) for row in rows]
+        if self.crop_offset is not None:
+            X[:, self.crop_offset] = [self._code(row["crop_type"], self.crop_codes) for row in rows]
+        return X
+
+
+def decode_labels(predictions: np.ndarray, label_encoder=None) -> List[str]:
+    """Map model outputs to fertilizer names with one ``inverse_transform`` call."""
+    predictions = np.asarray(predictions)
+    if label_encoder is not None:
+        try:
+            return [str(name) for name in label_encoder.inverse_transform(predictions.astype(int))]
+        except Exception:
+            # Outputs are already labels (or some are out of range): decode row by row
+            out = []
+            for pred in predictions:
+                try:
+                    out.append(str(label_encoder.inverse_transform([int(pred)])[0]))
+                except Exception:
+                    out.append(str(pred))
+            return out
+    return [str(pred) for pred in predictions]
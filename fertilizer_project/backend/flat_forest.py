@@ -0,0 +1,308 @@
+"""
+Flat, memory-mappable format for tree ensembles.
+
+``joblib.load`` on a RandomForest pickle unpickles every tree into private
+memory, so each uvicorn worker pays for its own copy and for the unpickling
+time at startup. ``export_forest`` writes the tree arrays (feature,
+threshold, children, leaf values) of all trees into one flat binary file;
+``FlatForest.load`` maps that file read-only, so the OS page cache holds a
+single copy shared by every worker, and predicts by walking the arrays.
+
+File layout: 8-byte magic, little-endian uint64 header length, JSON header,
+then the arrays, each 64-byte aligned, at the offsets listed in the header.
+The header records the sha256 of the pickle it was exported from; a
+``.trees`` file whose pickle has since been replaced is ignored (and
+re-exported) so the pickle stays the source of truth.
+
+Usage (convert existing pickles):
+    python flat_forest.py ../ml_model/yield_model.pkl ../ml_model/fertilizer_model.pkl
+"""
+
+import hashlib
+import json
+import os
+import threading
+import sys
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+MAGIC = b"AGRFRST1"
+ALIGN = 64
+FLAT_SUFFIX = ".trees"
+
+
+def flat_path_for(pickle_path: str) -> str:
+    """``yield_model.pkl`` -> ``yield_model.trees``"""
+    return os.path.splitext(pickle_path)[0] + FLAT_SUFFIX
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _align(n: int) -> int:
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def _tree_list(model) -> List[Any]:
+    if hasattr(model, "estimators_"):
+        return [est.tree_ for est in np.ravel(model.estimators_)]
+    if hasattr(model, "tree_"):
+        return [model.tree_]
+    raise TypeError(f"Unsupported model type: {type(model).__name__}")
+
+
+def export_forest(
+    model,
+    path: str,
+    columns: Optional[List[str]] = None,
+    label_classes: Optional[List[Any]] = None,
+    source_sha256: Optional[str] = None,
+) -> str:
+    """
+    Write a fitted sklearn tree / forest (regressor or classifier) to ``path``.
+
+    Leaves are rewritten as self-loops (left = right = self, threshold = +inf)
+    so inference can step every walk uniformly and detect leaves as nodes
+    that no longer move. ``columns`` and ``label_classes`` (a
+    LabelEncoder's ``classes_``) are stored in the header for the server,
+    ``source_sha256`` (of the pickle the model came from) for staleness checks.
+    """
+    trees = _tree_list(model)
+    is_classifier = hasattr(model, "classes_")
+
+    features, thresholds, lefts, rights, values = [], [], [], [], []
+    roots = []
+    base = 0
+    for tree in trees:
+        if tree.n_outputs != 1:
+            raise ValueError("Multi-output trees are not supported")
+        n = tree.node_count
+        leaf = tree.children_left == -1
+        own = np.arange(n)
+        roots.append(base)
+        features.append(np.where(leaf, 0, tree.feature).astype(np.int32))
+        thresholds.append(np.where(leaf, np.inf, tree.threshold).astype(np.float64))
+        lefts.append((np.where(leaf, own, tree.children_left) + base).astype(np.int32))
+        rights.append((np.where(leaf, own, tree.children_right) + base).astype(np.int32))
+        value = tree.value[:, 0, :]
+        if is_classifier:
+            # Per-tree class probabilities, as DecisionTreeClassifier.predict_proba
+            totals = value.sum(axis=1, keepdims=True)
+            totals[totals == 0] = 1
+            values.append((value / totals).astype(np.float64))
+        else:
+            values.append(value[:, 0].astype(np.float64))
+        base += n
+
+    arrays = {
+        "roots": np.asarray(roots, dtype=np.int32),
+        "feature": np.concatenate(features),
+        "threshold": np.concatenate(thresholds),
+        "left": np.concatenate(lefts),
+        "right": np.concatenate(rights),
+        "value": np.concatenate(values),
+    }
+
+    feature_names = getattr(model, "feature_names_in_", None)
+    header: Dict[str, Any] = {
+        "version": 1,
+        "kind": "classifier" if is_classifier else "regressor",
+        "n_trees": len(trees),
+        "n_nodes": base,
+        "n_features": int(getattr(model, "n_features_in_", 0)),
+        "max_depth": int(max(tree.max_depth for tree in trees)),
+        "classes": np.asarray(model.classes_).tolist() if is_classifier else None,
+        "feature_names": [str(c) for c in feature_names] if feature_names is not None else None,
+        "columns": list(columns) if columns is not None else None,
+        "label_classes": np.asarray(label_classes).tolist() if label_classes is not None else None,
+        "source_sha256": source_sha256,
+        "arrays": {},
+    }
+    offset = 0
+    for name, arr in arrays.items():
+        header["arrays"][name] = {"offset": offset, "dtype": arr.dtype.str, "shape": list(arr.shape)}
+        offset = _align(offset + arr.nbytes)
+
+    # The data offset depends on the header size, which contains it: size the header first
+    header["data_offset"] = 0
+    header["data_offset"] = _align(16 + len(json.dumps(header).encode()) + 32)
+    header_bytes = json.dumps(header).encode()
+
+    # Several workers may re-export the same stale file at once
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(np.uint64(len(header_bytes)).tobytes())
+        f.write(header_bytes)
+        f.write(b"\0" * (header["data_offset"] - f.tell()))
+        for name, arr in arrays.items():
+            start = header["data_offset"] + header["arrays"][name]["offset"]
+            f.write(b"\0" * (start - f.tell()))
+            f.write(np.ascontiguousarray(arr).tobytes())
+    os.replace(tmp, path)  # readers never see a half-written file
+    return path
+
+
+class LabelDecoder:
+    """Stand-in for a fitted LabelEncoder (only ``inverse_transform``)."""
+
+    def __init__(self, classes: List[Any]):
+        self.classes_ = np.asarray(classes)
+
+    def inverse_transform(self, y) -> np.ndarray:
+        return self.classes_[np.asarray(y, dtype=np.intp)]
+
+
+class FlatForest:
+    """Read-only, memory-mapped tree ensemble with sklearn-style ``predict``."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mm = np.memmap(path, dtype=np.uint8, mode="r")
+        if bytes(self._mm[:8]) != MAGIC:
+            raise ValueError(f"{path} is not a flat forest file")
+        header_len = int(self._mm[8:16].view("<u8")[0])
+        self.header: Dict[str, Any] = json.loads(bytes(self._mm[16:16 + header_len]))
+
+        start = self.header["data_offset"]
+        for name, spec in self.header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"])) if spec["shape"] else 1
+            lo = start + spec["offset"]
+            view = self._mm[lo:lo + count * dtype.itemsize].view(dtype).reshape(spec["shape"])
+            setattr(self, "_" + name, view)
+
+        self.kind = self.header["kind"]
+        self.n_trees = self.header["n_trees"]
+        self.max_depth = self.header["max_depth"]
+        self.n_features_in_ = self.header["n_features"]
+        if self.header.get("feature_names"):
+            self.feature_names_in_ = np.asarray(self.header["feature_names"], dtype=object)
+        if self.kind == "classifier":
+            self.classes_ = np.asarray(self.header["classes"])
+
+    @classmethod
+    def load(cls, path: str) -> "FlatForest":
+        return cls(path)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self._mm.size)
+
+    def apply(self, X) -> np.ndarray:
+        """Return the global leaf index reached in every tree, shape (n_rows, n_trees)."""
+        # sklearn evaluates splits on float32 inputs against float64 thresholds
+        X = np.ascontiguousarray(np.asarray(X), dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        n_rows, n_features = X.shape
+        flat_x = X.ravel()
+        node = np.tile(self._roots.astype(np.int64), n_rows)
+        row_base = np.repeat(np.arange(n_rows, dtype=np.int64) * n_features, self.n_trees)
+
+        # Step all (row, tree) walks together, dropping those that reached a leaf
+        active = np.arange(node.size)
+        while active.size:
+            current = node[active]
+            go_left = flat_x[row_base[active] + self._feature[current]] <= self._threshold[current]
+            nxt = np.where(go_left, self._left[current], self._right[current])
+            node[active] = nxt
+            active = active[nxt != current]  # leaves loop back to themselves
+        return node.reshape(n_rows, self.n_trees)
+
+    def predict_proba(self, X) -> np.ndarray:
+        if self.kind != "classifier":
+            raise AttributeError("predict_proba is only available for classifiers")
+        return self._value[self.apply(X)].mean(axis=1)
+
+    def predict(self, X) -> np.ndarray:
+        leaves = self.apply(X)
+        if self.kind == "classifier":
+            return self.classes_[self._value[leaves].mean(axis=1).argmax(axis=1)]
+        return self._value[leaves].mean(axis=1)
+
+
+def _flat_bundle(forest: "FlatForest", flat: str) -> Dict[str, Any]:
+    bundle: Dict[str, Any] = {"model": forest, "format": "flat", "source": flat}
+    if forest.header.get("source_sha256"):
+        bundle["version"] = forest.header["source_sha256"][:12]
+    if forest.header.get("columns") is not None:
+        bundle["columns"] = forest.header["columns"]
+    if forest.header.get("label_classes") is not None:
+        bundle["label_encoder"] = LabelDecoder(forest.header["label_classes"])
+    return bundle
+
+
+def load_model_bundle(pickle_path: str, prefer_flat: bool = True) -> Any:
+    """
+    Load a model saved next to ``pickle_path``.
+
+    Uses the flat ``.trees`` export when it exists (and ``prefer_flat``) and
+    was exported from the current pickle, returning a dict shaped like the
+    pickled bundles ({"model", "columns", "label_encoder"}); otherwise falls
+    back to ``joblib.load(pickle_path)`` and, when preferring the flat
+    format, re-exports the ``.trees`` file for the next load. Dict bundles
+    get a "source" key naming the file that was read and a "version" (the
+    pickle's hash) when known.
+    """
+    flat = flat_path_for(pickle_path)
+    pickle_sha256 = None
+    if prefer_flat and os.path.exists(flat):
+        forest = FlatForest.load(flat)
+        if not os.path.exists(pickle_path):
+            return _flat_bundle(forest, flat)  # Deployed without the pickle
+        pickle_sha256 = file_sha256(pickle_path)
+        if forest.header.get("source_sha256") == pickle_sha256:
+            return _flat_bundle(forest, flat)
+        print(f"⚠️ {flat} was not exported from the current {os.path.basename(pickle_path)}, loading the pickle")
+    import joblib
+    bundle = joblib.load(pickle_path)
+    if isinstance(bundle, dict):
+        bundle.setdefault("source", pickle_path)
+    if prefer_flat and pickle_sha256 is not None:
+        try:
+            export_bundle(bundle, flat, source=pickle_path)
+            print(f"✅ Re-exported {flat}")
+        except Exception as e:
+            print(f"⚠️ Could not re-export {flat}: {e}")
+    return bundle
+
+
+def export_bundle(bundle: Any, path: str, source: Optional[str] = None) -> str:
+    """
+    Export a pickled bundle ({"model", "columns"?, "label_encoder"?} or a bare model).
+
+    ``source`` is the pickle the bundle was loaded from; its hash goes into the header.
+    """
+    source_sha256 = file_sha256(source) if source else None
+    if isinstance(bundle, dict) and "model" in bundle:
+        encoder = bundle.get("label_encoder")
+        return export_forest(
+            bundle["model"],
+            path,
+            columns=bundle.get("columns"),
+            label_classes=getattr(encoder, "classes_", None),
+            source_sha256=source_sha256,
+        )
+    return export_forest(bundle, path, source_sha256=source_sha256)
+
+
+def main(argv: List[str]) -> int:
+    import joblib
+    if not argv:
+        print(__doc__)
+        return 1
+    for pickle_path in argv:
+        out = export_bundle(joblib.load(pickle_path), flat_path_for(pickle_path), source=pickle_path)
+        print(f"✅ Exported {pickle_path} -> {out} ({os.path.getsize(out) / 1e6:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,292 @@
+"""
+Index plan for every query shape the backend issues.
+
+``INDEXES`` lists the indexes the app needs; startup creates them and
+``python indexes.py`` does the same as a migration (idempotent: existing
+indexes are left alone, conflicting definitions are reported). ``QUERIES``
+lists each find/count/delete shape with the endpoint that issues it. The
+migration runs every shape through ``explain`` and exits non-zero if a
+winning plan contains a COLLSCAN, so a new query without an index fails
+the deploy instead of degrading as the collection grows.
+
+Usage:
+    python indexes.py            # create missing indexes, then check plans
+    python indexes.py --check    # only check plans
+"""
+
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+try:
+    from bson import ObjectId
+    _PROBE_ID: Any = ObjectId("000000000000000000000000")
+except Exception:
+    _PROBE_ID = "probe"
+
+Keys = List[Tuple[str, int]]
+
+
+class IndexSpec(NamedTuple):
+    collection: str
+    keys: Keys
+    options: Dict[str, Any] = {}
+
+
+class QueryShape(NamedTuple):
+    name: str                      # endpoint or function issuing the query
+    collection: str
+    filter: Dict[str, Any]
+    sort: Optional[Keys] = None
+
+
+INDEXES: List[IndexSpec] = [
+    IndexSpec("users", [("email", 1)], {"unique": True}),
+    IndexSpec("users", [("created_at", -1), ("_id", -1)]),
+    IndexSpec("users", [("search_keys", 1)]),
+    IndexSpec("recommendations", [("user_email", 1), ("ts", -1)]),
+    IndexSpec("recommendations", [("ts", -1), ("_id", -1)]),
+    IndexSpec("soil_analysis", [("user_email", 1), ("created_at", -1)]),
+    IndexSpec("soil_analysis", [("created_at", -1), ("_id", -1)]),
+    IndexSpec("yield_predictions", [("created_at", -1), ("_id", -1)]),
+    IndexSpec("crop_recommendations", [("farmer_id", 1), ("timestamp", -1)]),
+    IndexSpec("market_logs", [("commodity", 1), ("fetched_at", -1)]),
+    IndexSpec("market_logs", [("fetched_at", -1)]),
+    IndexSpec("contacts", [("ts", -1), ("_id", -1)]),
+    IndexSpec("articles", [("publishedAt", -1), ("_id", -1)]),
+    IndexSpec("articles", [("id", 1)], {"sparse": True}),
+    IndexSpec("techniques", [("category", 1), ("_id", -1)]),
+    IndexSpec("techniques", [("tags", 1), ("_id", -1)]),
+    IndexSpec("techniques", [("id", 1)], {"sparse": True}),
+    IndexSpec("mandi_prices", [("commodity_key", 1), ("state_key", 1), ("arrival_date", -1)]),
+    IndexSpec("mandi_prices", [("state_key", 1), ("district_key", 1), ("arrival_date", -1)]),
+    IndexSpec("mandi_prices", [("arrival_date", -1)]),
+    IndexSpec("mandi_prices", [("fetched_at", -1)]),
+    IndexSpec("daily_rollups", [("metric", 1), ("day", 1), ("count", -1)]),
+]
+
+_PROBE_DATE = datetime(2026, 1, 1)
+
+
+def _after(field: str) -> Dict[str, Any]:
+    # The filter pagination.after_cursor builds for a descending page
+    return {"$or": [{field: {"$lt": _PROBE_DATE}}, {field: _PROBE_DATE, "_id": {"$lt": _PROBE_ID}}, {field: None}]}
+
+
+def _pages(name: str, collection: str, field: str) -> List[QueryShape]:
+    sort = [(field, -1), ("_id", -1)]
+    return [QueryShape(name, collection, {}, sort), QueryShape(f"{name} (cursor)", collection, _after(field), sort)]
+
+
+QUERIES: List[QueryShape] = [
+    QueryShape("get_user / login / PUT /api/me/update", "users", {"email": "probe@example.com"}),
+    *_pages("GET /api/admin/farmers", "users", "created_at"),
+    QueryShape("GET /api/admin/farmers?search= (prefixes)", "users", {"search_keys": {"$all": ["p:ra", "p:ku"]}}),
+    QueryShape("GET /api/admin/farmers?search= (exact words)", "users", {"search_keys": {"$all": ["w:ravi"]}}),
+    QueryShape("GET /api/admin/farmers?search= (typos)", "users", {"search_keys": {"$in": ["p:ravi", "d:rav"]}}),
+    QueryShape("backfill_search_keys", "users", {"search_keys": {"$exists": False}}),
+    QueryShape("GET /api/history", "recommendations", {"user_email": "probe@example.com"}, [("ts", -1)]),
+    *_pages("GET /api/admin/recommendations", "recommendations", "ts"),
+    QueryShape("GET /api/soil/history", "soil_analysis", {"user_email": "probe@example.com"}, [("created_at", -1)]),
+    *_pages("GET /api/admin/soil-health", "soil_analysis", "created_at"),
+    *_pages("GET /api/admin/yield-predictions", "yield_predictions", "created_at"),
+    QueryShape("GET /api/crop/recommendations/history", "crop_recommendations",
+               {"farmer_id": "probe@example.com"}, [("timestamp", -1)]),
+    QueryShape("GET /api/market/logs", "market_logs", {}, [("fetched_at", -1)]),
+    *_pages("GET /api/admin/contacts", "contacts", "ts"),
+    QueryShape("GET /api/articles", "articles", {}, [("_id", -1)]),
+    QueryShape("GET /api/articles/{id} (legacy id)", "articles", {"id": "probe"}),
+    *_pages("GET /api/admin/articles", "articles", "publishedAt"),
+    QueryShape("GET /api/techniques", "techniques", {}, [("_id", -1)]),
+    QueryShape("GET /api/techniques?category=", "techniques", {"category": "probe"}, [("_id", -1)]),
+    QueryShape("GET /api/techniques?tag=", "techniques", {"tags": {"$in": ["probe"]}}, [("_id", -1)]),
+    QueryShape("GET /api/techniques/{id} (legacy id)", "techniques", {"id": "probe"}),
+    QueryShape("refresh_mandi_snapshot (newest)", "mandi_prices", {}, [("fetched_at", -1)]),
+    QueryShape("refresh_mandi_snapshot (prune)", "mandi_prices",
+               {"commodity_key": "rice", "state_key": {"$in": ["punjab"]}, "fetched_at": {"$lt": _PROBE_DATE}}),
+    QueryShape("advance_rollups (recommendations)", "recommendations",
+               {"_id": {"$gt": _PROBE_ID, "$lt": _PROBE_ID}}, [("_id", 1)]),
+    QueryShape("advance_rollups (yield_predictions)", "yield_predictions",
+               {"_id": {"$gt": _PROBE_ID, "$lt": _PROBE_ID}}, [("_id", 1)]),
+    QueryShape("GET /api/admin/charts/fertilizer-distribution, crop-popularity", "daily_rollups",
+               {"metric": "crop", "day": "all"}, [("count", -1)]),
+    QueryShape("GET /api/admin/charts/yield-trend", "daily_rollups",
+               {"metric": "yield", "day": {"$gte": "2026-01-01", "$ne": "all"}}, [("day", 1)]),
+]
+
+
+# --- Static check: is there an index the planner can use? ---
+def _is_operator(value: Any) -> bool:
+    return isinstance(value, dict) and any(str(k).startswith("$") for k in value)
+
+
+def _fields(clause: Dict[str, Any]) -> Tuple[Set[str], Set[str]]:
+    """(equality fields, range fields) of a filter without $or."""
+    equality, ranges = set(), set()
+    for field, value in clause.items():
+        if _is_operator(value) and not set(value) <= {"$in", "$eq", "$all"}:
+            ranges.add(field)
+        else:
+            equality.add(field)
+    return equality, ranges
+
+
+def _index_serves(keys: Keys, clause: Dict[str, Any], sort: Optional[Keys]) -> bool:
+    """Equality fields first, then the sort (one direction or fully reversed), as the planner needs."""
+    equality, ranges = _fields(clause)
+    fields = [f for f, _ in keys]
+    n = len(equality)
+    if set(fields[:n]) != equality:
+        return False
+    rest = [(f, d) for f, d in (sort or []) if f not in equality]
+    if rest:
+        window = keys[n:n + len(rest)]
+        if [f for f, _ in window] != [f for f, _ in rest]:
+            return False
+        same = all(d == wd for (_, d), (_, wd) in zip(rest, window))
+        flipped = all(d == -wd for (_, d), (_, wd) in zip(rest, window))
+        return same or flipped
+    if n == 0:
+        # Nothing to seek on except a range on the leading key
+        return bool(ranges) and fields[0] in ranges
+    return True
+
+
+def _clauses(filter: Dict[str, Any]) -> List[Dict[str, Any]]:
+    base = {k: v for k, v in filter.items() if k != "$or"}
+    return [dict(base, **clause) for clause in filter["$or"]] if "$or" in filter else [base]
+
+
+def covering_indexes(shape: QueryShape, indexes: Sequence[IndexSpec] = INDEXES) -> Optional[List[Keys]]:
+    """
+    The registered index serving each branch of ``shape``, or None if a branch has none.
+
+    Lookups by ``_id`` alone use the default index.
+    """
+    keys = [spec.keys for spec in indexes if spec.collection == shape.collection] + [[("_id", 1)]]
+    chosen = []
+    for clause in _clauses(shape.filter):
+        match = next((k for k in keys if _index_serves(k, clause, shape.sort)), None)
+        if match is None:
+            return None
+        chosen.append(match)
+    return chosen
+
+
+# --- Migration against a live database ---
+# Server error codes that mean an index on these keys is already there
+INDEX_ALREADY_EXISTS = 68
+INDEX_OPTIONS_CONFLICT = 85     # same keys, different options (or name)
+
+
+def _failure(spec: IndexSpec, error: Exception) -> Dict[str, Any]:
+    """
+    Result for a create_index error. Only "already exists" codes are benign;
+    anything else (e.g. duplicate keys blocking a unique index) is a failure.
+    """
+    code = getattr(error, "code", None)
+    status = "exists" if code == INDEX_ALREADY_EXISTS else "conflict" if code == INDEX_OPTIONS_CONFLICT else "failed"
+    return {"collection": spec.collection, "keys": spec.keys, "status": status, "error": str(error)}
+
+
+def ensure_indexes(db, indexes: Sequence[IndexSpec] = INDEXES) -> List[Dict[str, Any]]:
+    """Create every registered index that is missing (synchronous PyMongo database)."""
+    results = []
+    for spec in indexes:
+        collection = db[spec.collection]
+        existing = {tuple(info["key"]) for info in collection.index_information().values()}
+        keys = tuple((f, d) for f, d in spec.keys)
+        if keys in existing:
+            results.append({"collection": spec.collection, "keys": spec.keys, "status": "exists"})
+            continue
+        try:
+            name = collection.create_index(spec.keys, **spec.options)
+            results.append({"collection": spec.collection, "keys": spec.keys, "status": "created", "name": name})
+        except Exception as e:
+            results.append(_failure(spec, e))
+    return results
+
+
+async def ensure_indexes_async(repos, indexes: Sequence[IndexSpec] = INDEXES) -> List[Dict[str, Any]]:
+    """
+    ``ensure_indexes`` for the app's async ``Repositories`` (used at startup).
+
+    createIndexes is a no-op for an identical existing index, so this does
+    not list indexes first; "created" therefore also covers those.
+    """
+    results = []
+    for spec in indexes:
+        try:
+            name = await getattr(repos, spec.collection).create_index(spec.keys, **spec.options)
+            results.append({"collection": spec.collection, "keys": spec.keys, "status": "created", "name": name})
+        except Exception as e:
+            results.append(_failure(spec, e))
+    return results
+
+
+def plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """Every stage name in an explain() plan tree (classic and slot-based engine layouts)."""
+    stages = []
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, dict):
+            continue
+        if "stage" in node:
+            stages.append(node["stage"])
+        for key in ("inputStage", "queryPlan", "outerStage", "innerStage"):
+            if key in node:
+                stack.append(node[key])
+        stack.extend(node.get("inputStages", []))
+    return stages
+
+
+def explain(db, shape: QueryShape) -> List[str]:
+    """Stages of the winning plan for ``shape``."""
+    command: Dict[str, Any] = {"find": shape.collection, "filter": shape.filter}
+    if shape.sort:
+        command["sort"] = dict(shape.sort)
+    result = db.command({"explain": command, "verbosity": "queryPlanner"})
+    return plan_stages(result["queryPlanner"]["winningPlan"])
+
+
+def check_plans(db, queries: Sequence[QueryShape] = QUERIES) -> List[Dict[str, Any]]:
+    results = []
+    for shape in queries:
+        stages = explain(db, shape)
+        results.append({"query": shape.name, "collection": shape.collection, "stages": stages,
+                        "collscan": "COLLSCAN" in stages, "registered": covering_indexes(shape) is not None})
+    return results
+
+
+def main(argv: List[str]) -> int:
+    from pymongo import MongoClient
+
+    import config
+
+    check_only = "--check" in argv
+    client = MongoClient(config.MONGO_URI, serverSelectionTimeoutMS=config.MONGO_SERVER_SELECTION_TIMEOUT_MS)
+    db = client[config.MONGO_DB]
+
+    failures = 0
+    if not check_only:
+        for result in ensure_indexes(db):
+            failures += result["status"] == "failed"
+            mark = {"created": "➕", "exists": "✓", "conflict": "⚠️", "failed": "❌"}[result["status"]]
+            print(f"{mark} {result['collection']} {result['keys']} {result.get('error', '')}")
+
+    for result in check_plans(db):
+        if result["collscan"]:
+            failures += 1
+        mark = "❌ COLLSCAN" if result["collscan"] else "✓" if result["registered"] else "⚠️ unregistered index"
+        print(f"{mark} {result['collection']}: {result['query']} -> {' > '.join(reversed(result['stages']))}")
+    client.close()
+    if failures:
+        print(f"❌ {failures} indexes failed or query shapes scan a whole collection")
+        return 1
+    print(f"✅ All {len(QUERIES)} query shapes use an index")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
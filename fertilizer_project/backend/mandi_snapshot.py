@@ -0,0 +1,278 @@
+"""
+Local snapshot of data.gov.in mandi prices.
+
+Market endpoints used to call data.gov.in on the request path, so their
+latency and availability followed the upstream API. A background job now
+pages every configured commodity x state pair through the API, stores the
+normalized records in the ``mandi_prices`` collection and loads them into a
+``MandiSnapshot``. ``fetch_mandi_prices`` answers from the snapshot whenever
+it covers the query and reports how old the data is.
+"""
+
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+ARRIVAL_DATE_FORMAT = "%d/%m/%Y"
+
+# States and union territories reported by the Agmarknet daily price feed
+DEFAULT_STATES = (
+    "Andaman and Nicobar", "Andhra Pradesh", "Arunachal Pradesh", "Assam", "Bihar",
+    "Chandigarh", "Chattisgarh", "Dadra and Nagar Haveli", "Goa", "Gujarat",
+    "Haryana", "Himachal Pradesh", "Jammu and Kashmir", "Jharkhand", "Karnataka",
+    "Kerala", "Madhya Pradesh", "Maharashtra", "Manipur", "Meghalaya", "Mizoram",
+    "Nagaland", "NCT of Delhi", "Odisha", "Pondicherry", "Punjab", "Rajasthan",
+    "Sikkim", "Tamil Nadu", "Telangana", "Tripura", "Uttar Pradesh",
+    "Uttrakhand", "West Bengal",
+)
+
+
+def match_key(value: Optional[str]) -> str:
+    """Case- and whitespace-insensitive form used for filtering."""
+    return " ".join(str(value or "").split()).casefold()
+
+
+def _price(value: Any) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def parse_arrival_date(text: Any) -> Optional[datetime]:
+    try:
+        return datetime.strptime(str(text).strip(), ARRIVAL_DATE_FORMAT)
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize_record(raw: Dict[str, Any], fetched_at: datetime) -> Optional[Dict[str, Any]]:
+    """
+    Turn one data.gov.in record into a ``mandi_prices`` document.
+
+    Prices become floats, ``arrival_date`` a datetime (so it sorts and
+    indexes), and the filter fields get ``*_key`` twins for case-insensitive
+    lookups. The ``_id`` is derived from the market, produce and date, so
+    re-fetching the same record overwrites it.
+
+    Returns:
+        The document, or None when the record has no commodity or state
+    """
+    commodity = " ".join(str(raw.get("commodity") or "").split())
+    state = " ".join(str(raw.get("state") or "").split())
+    if not commodity or not state:
+        return None
+    doc = {
+        "commodity": commodity,
+        "state": state,
+        "district": " ".join(str(raw.get("district") or "").split()),
+        "market": " ".join(str(raw.get("market") or "").split()),
+        "variety": raw.get("variety") or "",
+        "grade": raw.get("grade") or "",
+        "min_price": _price(raw.get("min_price")),
+        "max_price": _price(raw.get("max_price")),
+        "modal_price": _price(raw.get("modal_price")),
+        "arrival_date": parse_arrival_date(raw.get("arrival_date")),
+        "fetched_at": fetched_at,
+    }
+    doc["commodity_key"] = match_key(commodity)
+    doc["state_key"] = match_key(state)
+    doc["district_key"] = match_key(doc["district"])
+    day = doc["arrival_date"].strftime("%Y-%m-%d") if doc["arrival_date"] else ""
+    doc["_id"] = "|".join([doc["state_key"], doc["district_key"], match_key(doc["market"]),
+                           doc["commodity_key"], match_key(doc["variety"]), match_key(doc["grade"]), day])
+    return doc
+
+
+def record_view(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """A stored document in the shape data.gov.in returns records in."""
+    arrival = doc.get("arrival_date")
+    return {
+        "state": doc.get("state", ""),
+        "district": doc.get("district", ""),
+        "market": doc.get("market", ""),
+        "commodity": doc.get("commodity", ""),
+        "variety": doc.get("variety", ""),
+        "grade": doc.get("grade", ""),
+        "arrival_date": arrival.strftime(ARRIVAL_DATE_FORMAT) if isinstance(arrival, datetime) else "",
+        "min_price": doc.get("min_price", 0.0),
+        "max_price": doc.get("max_price", 0.0),
+        "modal_price": doc.get("modal_price", 0.0),
+    }
+
+
+def fetch_all_pages(
+    fetch_page: Callable[..., Dict[str, Any]],
+    commodity: str,
+    state: str,
+    page_size: int = 500,
+    max_pages: int = 20,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Page through every record for one commodity and state.
+
+    Args:
+        fetch_page: Called as ``fetch_page(commodity=, state=, limit=, offset=)``
+            and returning a mandi result dict (``records`` / ``error``)
+        page_size: Records requested per call; a shorter page ends the walk
+        max_pages: Safety cap on calls per pair
+
+    Returns:
+        (raw records, error message or None)
+    """
+    records: List[Dict[str, Any]] = []
+    for page in range(max_pages):
+        result = fetch_page(commodity=commodity, state=state, limit=page_size, offset=page * page_size)
+        if result.get("error"):
+            return records, result["error"]
+        batch = result.get("records") or []
+        records.extend(batch)
+        if len(batch) < page_size:
+            break
+    return records, None
+
+
+class MandiSnapshot:
+    """
+    In-memory view of the ``mandi_prices`` collection.
+
+    The whole snapshot is replaced at once after each refresh, so readers
+    never see a half-loaded set. ``covers`` says whether a query can be
+    answered locally; anything else still goes to the live API.
+
+    Only a successful pull rewrites a pair's records (with its
+    ``fetched_at``), so the newest ``fetched_at`` per (commodity, state) is
+    when that pair last pulled successfully with rows. Every worker derives
+    it from the stored documents, including workers that did not pull.
+
+    Args:
+        max_age_seconds: A pair whose last successful pull is older than
+            this is not covered (None: no limit)
+    """
+
+    def __init__(self, max_age_seconds: Optional[float] = None):
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._by_commodity: Dict[str, List[Dict[str, Any]]] = {}
+        self._pulled_at: Dict[Tuple[str, str], datetime] = {}
+        self._records: List[Dict[str, Any]] = []
+        self.commodities: frozenset = frozenset()
+        self.states: frozenset = frozenset()
+        self.refreshed_at: Optional[datetime] = None
+        self.served = 0
+        self.loads = 0
+        self.last_refresh: Optional[Dict[str, Any]] = None
+
+    def replace(self, docs: Iterable[Dict[str, Any]], refreshed_at: datetime,
+                commodities: Iterable[str], states: Iterable[str]) -> int:
+        """Swap in a new set of documents; returns the record count."""
+        records = sorted(docs, key=lambda d: d.get("arrival_date") or datetime.min, reverse=True)
+        by_commodity: Dict[str, List[Dict[str, Any]]] = {}
+        pulled_at: Dict[Tuple[str, str], datetime] = {}
+        for doc in records:
+            by_commodity.setdefault(doc["commodity_key"], []).append(doc)
+            pair, fetched_at = (doc["commodity_key"], doc["state_key"]), doc.get("fetched_at")
+            if fetched_at is not None and (pair not in pulled_at or fetched_at > pulled_at[pair]):
+                pulled_at[pair] = fetched_at
+        with self._lock:
+            self._records = records
+            self._by_commodity = by_commodity
+            self._pulled_at = pulled_at
+            self.commodities = frozenset(match_key(c) for c in commodities)
+            self.states = frozenset(match_key(s) for s in states)
+            self.refreshed_at = refreshed_at
+            self.loads += 1
+        return len(records)
+
+    def records(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._records)
+
+    def _fresh(self, pulled_at: Optional[datetime]) -> bool:
+        if pulled_at is None:
+            return False
+        return self.max_age_seconds is None or (datetime.utcnow() - pulled_at).total_seconds() <= self.max_age_seconds
+
+    def covers(self, commodity: Optional[str] = None, state: Optional[str] = None) -> bool:
+        """
+        True if the query can be answered locally.
+
+        A (commodity, state) pair needs its own successful, non-empty pull
+        within ``max_age_seconds``; a failed or empty pull falls back to the
+        live API. A query open on either side needs a fresh snapshot and the
+        given side among the configured commodities/states.
+        """
+        with self._lock:
+            if commodity and state:
+                return self._fresh(self._pulled_at.get((match_key(commodity), match_key(state))))
+            if not self._fresh(self.refreshed_at):
+                return False
+            if commodity and match_key(commodity) not in self.commodities:
+                return False
+            if state and match_key(state) not in self.states:
+                return False
+            return True
+
+    def age_seconds(self) -> Optional[float]:
+        if self.refreshed_at is None:
+            return None
+        return round((datetime.utcnow() - self.refreshed_at).total_seconds(), 1)
+
+    def query(
+        self,
+        commodity: Optional[str] = None,
+        state: Optional[str] = None,
+        district: Optional[str] = None,
+        limit: int = 100,
+    ) -> Dict[str, Any]:
+        """
+        Answer a mandi price query locally, newest arrivals first.
+
+        Returns:
+            The same fields as a live data.gov.in result, plus
+            ``served_from``, ``as_of`` and ``data_age_seconds``
+        """
+        with self._lock:
+            pool = self._by_commodity.get(match_key(commodity), []) if commodity else self._records
+            refreshed_at = self.refreshed_at
+            self.served += 1
+        state_key, district_key = match_key(state), match_key(district)
+        records = []
+        for doc in pool:
+            if state and doc["state_key"] != state_key:
+                continue
+            if district and doc["district_key"] != district_key:
+                continue
+            records.append(record_view(doc))
+            if limit and len(records) >= limit:
+                break
+
+        prices = [r["modal_price"] for r in records if r["modal_price"]]
+        return {
+            "commodity": commodity or "All",
+            "state": state or "All",
+            "district": district or "All",
+            "average_price": round(sum(prices) / len(prices), 2) if prices else 0.0,
+            "records_found": len(records),
+            "total_records": len(records),
+            "records": records,
+            "fallback_used": False,
+            "served_from": "snapshot",
+            "as_of": refreshed_at.isoformat() if refreshed_at else None,
+            "data_age_seconds": self.age_seconds(),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "records": len(self._records),
+                "commodities": len(self.commodities),
+                "states": len(self.states),
+                "fresh_pairs": sum(1 for at in self._pulled_at.values() if self._fresh(at)),
+                "pairs_with_records": len(self._pulled_at),
+                "refreshed_at": self.refreshed_at.isoformat() if self.refreshed_at else None,
+                "data_age_seconds": self.age_seconds(),
+                "queries_served": self.served,
+                "loads": self.loads,
+                "last_refresh": self.last_refresh,
+            }
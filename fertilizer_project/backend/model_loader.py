@@ -0,0 +1,247 @@
+"""
+Lazy, hot-swappable model loading.
+
+Importing backend used to unpickle both models (pulling in scikit-learn)
+before uvicorn could accept a connection, so every worker boot and
+``--reload`` cycle waited on it. A ``ModelSlot`` instead loads its bundle
+on first use, or from a warm-up task started after startup.
+
+``ModelSlot.reload`` loads a replacement file in the caller's thread,
+checks it with a canary callback and only then swaps ``slot.current``.
+That is a single reference assignment, so requests already running keep
+the ``LoadedModel`` they picked up and new requests see the new one; no
+request waits for a reload. Every ``LoadedModel`` carries a ``version``
+(content hash of the model pickle) for responses and logs.
+"""
+
+import hashlib
+import os
+import threading
+import time
+import warnings
+from datetime import datetime
+from typing import Any, Callable, Dict, NamedTuple, Optional, Sequence, Tuple
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+MISSING = "missing"
+FAILED = "failed"
+SETTLED = (READY, MISSING, FAILED)
+
+
+class LoadedModel(NamedTuple):
+    model: Any
+    encoder: Any            # feature encoder resolved for this model
+    label_encoder: Any      # None for regressors
+    version: str
+    format: str
+    loaded_at: datetime
+
+    def predict(self, X):
+        return predict_quietly(self.model, X)
+
+
+def predict_quietly(model, X):
+    """
+    ``model.predict(X)`` without scikit-learn's "X does not have valid feature
+    names" warning: models fitted on a DataFrame are served encoded NumPy rows
+    in the fitted column order. The filter only covers this call.
+    """
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="X does not have valid feature names")
+        return model.predict(X)
+
+
+def file_version(path: str) -> str:
+    """Short content hash of a model file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+class ModelSlot:
+    """
+    One model, loaded lazily and replaceable while serving.
+
+    Args:
+        name: Label used in logs and status reports
+        path: Model file handed to ``loader``
+        loader: Callable returning the bundle for ``path``
+        prepare: Turns a bundle into ``(model, encoder, label_encoder)``
+        validate: Optional canary check; raises if a candidate must not be served
+        watch_paths: Files whose changes trigger a reload (default: ``path``)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        path: str,
+        loader: Callable[[str], Any],
+        prepare: Callable[[Any], Tuple[Any, Any, Any]],
+        validate: Optional[Callable[[LoadedModel], None]] = None,
+        watch_paths: Optional[Sequence[str]] = None,
+    ):
+        self.name = name
+        self.path = path
+        self._loader = loader
+        self._prepare = prepare
+        self._validate = validate
+        self.watch_paths = tuple(watch_paths or (path,))
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._loaded_signature: Optional[Tuple] = None
+        self.current: Optional[LoadedModel] = None
+        self.state = PENDING
+        self.error: Optional[str] = None
+        self.load_ms: Optional[float] = None
+        self.reloads = 0
+        self.last_reload: Optional[Dict[str, Any]] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.current is not None
+
+    @property
+    def settled(self) -> bool:
+        return self.state in SETTLED
+
+    def ensure(self) -> Optional[LoadedModel]:
+        """
+        Load the model if nobody has tried yet (blocking, thread-safe).
+
+        Concurrent callers wait for the first one's load instead of
+        loading again. A missing or broken file is not retried here; a
+        reload picks it up once it changes.
+
+        Returns:
+            The model to serve, or None if none is loaded
+        """
+        if self.state not in SETTLED:
+            with self._lock:
+                if self.state not in SETTLED:
+                    self._first_load()
+        return self.current
+
+    def _first_load(self) -> None:
+        self.state = LOADING
+        started = time.perf_counter()
+        try:
+            self.current, self._loaded_signature = self._build()
+            self.state = READY
+            print(f"✅ Loaded {self.name} model {self.current.version} ({self.current.format}) "
+                  f"in {(time.perf_counter() - started) * 1000:.0f} ms")
+        except FileNotFoundError as e:
+            self.state = MISSING
+            self.error = str(e)
+            print(f"⚠️ {self.name} model not found: {self.path}")
+        except Exception as e:
+            self.state = FAILED
+            self.error = str(e)
+            print(f"❌ Failed to load {self.name} model: {e}")
+        finally:
+            if self._loaded_signature is None:
+                self._loaded_signature = self.signature()
+            self.load_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    def _build(self) -> Tuple[LoadedModel, Tuple]:
+        """Load, prepare and canary-check a candidate without touching ``current``."""
+        signature = self.signature()
+        bundle = self._loader(self.path)
+        model, encoder, label_encoder = self._prepare(bundle)
+        meta = bundle if isinstance(bundle, dict) else {}
+        version = meta.get("version") or file_version(meta.get("source", self.path))
+        candidate = LoadedModel(
+            model=model,
+            encoder=encoder,
+            label_encoder=label_encoder,
+            version=str(version),
+            format=meta.get("format", "pickle"),
+            loaded_at=datetime.utcnow(),
+        )
+        if self._validate is not None:
+            self._validate(candidate)
+        return candidate, signature
+
+    def signature(self) -> Tuple:
+        """(mtime, size) of each watched file; None for files that do not exist."""
+        out = []
+        for path in self.watch_paths:
+            try:
+                st = os.stat(path)
+                out.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                out.append(None)
+        return tuple(out)
+
+    def changed(self) -> bool:
+        """True if a watched file changed since the last load or reload attempt."""
+        return self.settled and self.signature() != self._loaded_signature
+
+    def reload(self, force: bool = False) -> Dict[str, Any]:
+        """
+        Load the model file again and swap it in if it passes validation.
+
+        The current model keeps serving throughout; a candidate that fails
+        to load or fails the canary check is discarded. Only one reload
+        runs at a time per slot.
+
+        Args:
+            force: Reload even if the files look unchanged
+
+        Returns:
+            {"model", "status": reloaded | unchanged | failed | busy,
+             "version", "previous_version", "load_ms", "error"?}
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return {"model": self.name, "status": "busy"}
+        try:
+            previous = self.current
+            result: Dict[str, Any] = {
+                "model": self.name,
+                "previous_version": previous.version if previous else None,
+            }
+            if not force and previous is not None and self.signature() == self._loaded_signature:
+                return dict(result, status="unchanged", version=previous.version)
+
+            started = time.perf_counter()
+            try:
+                candidate, signature = self._build()
+            except Exception as e:
+                # Remember the broken file so the watcher does not retry it every poll
+                self._loaded_signature = self.signature()
+                result.update(status="failed", version=result["previous_version"], error=str(e))
+                print(f"❌ Reload of {self.name} model rejected, still serving "
+                      f"{result['previous_version']}: {e}")
+            else:
+                self._loaded_signature = signature
+                if previous is not None and candidate.version == previous.version and not force:
+                    result.update(status="unchanged", version=previous.version)
+                else:
+                    with self._lock:
+                        self.current = candidate  # the atomic swap
+                        self.state = READY
+                        self.error = None
+                    self.reloads += 1
+                    result.update(status="reloaded", version=candidate.version)
+                    print(f"🔄 Reloaded {self.name} model: {result['previous_version']} -> {candidate.version}")
+            result["load_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            self.last_reload = dict(result, at=datetime.utcnow().isoformat())
+            return result
+        finally:
+            self._reload_lock.release()
+
+    def status(self) -> Dict[str, Any]:
+        current = self.current
+        return {
+            "state": self.state,
+            "version": current.version if current else None,
+            "format": current.format if current else None,
+            "load_ms": self.load_ms,
+            "loaded_at": current.loaded_at.isoformat() if current else None,
+            "error": self.error,
+            "reloads": self.reloads,
+            "last_reload": self.last_reload,
+        }
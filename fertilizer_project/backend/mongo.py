@@ -0,0 +1,160 @@
+"""
+Shared MongoDB client.
+
+Each worker process opens exactly one client, on first use, configured from
+``config.py``; every repository shares its connection pool. ``pool_monitor``
+follows the driver's connection-pool events so health probes can report how
+much of the pool is in use.
+"""
+
+import threading
+from typing import Any, Dict, Optional
+
+import config
+from repository import AsyncMongoClient, Repositories
+
+try:
+    from pymongo import monitoring
+except Exception:
+    monitoring = None
+
+_ListenerBase = monitoring.ConnectionPoolListener if monitoring is not None else object
+
+
+class PoolMonitor(_ListenerBase):
+    """Connection-pool listener keeping live utilisation counters."""
+
+    def __init__(self, max_pool_size: int):
+        self.max_pool_size = max_pool_size
+        self._lock = threading.Lock()
+        self._pools = set()
+        self.open = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.waiting = 0
+        self.created = 0
+        self.closed = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.clears = 0
+
+    def pool_created(self, event):
+        with self._lock:
+            self._pools.add(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.clears += 1
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._pools.discard(event.address)
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open += 1
+            self.created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open = max(0, self.open - 1)
+            self.closed += 1
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self.waiting += 1
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.waiting = max(0, self.waiting - 1)
+            self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.waiting = max(0, self.waiting - 1)
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            self.checkouts += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use = max(0, self.in_use - 1)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            # maxPoolSize applies per server, so scale by the pools we know of
+            capacity = self.max_pool_size * max(1, len(self._pools))
+            return {
+                "servers": len(self._pools),
+                "max_pool_size": self.max_pool_size,
+                "open": self.open,
+                "in_use": self.in_use,
+                "idle": max(0, self.open - self.in_use),
+                "waiting": self.waiting,
+                "peak_in_use": self.peak_in_use,
+                "utilisation": round(self.in_use / capacity, 4) if capacity else 0.0,
+                "created": self.created,
+                "closed": self.closed,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "clears": self.clears,
+            }
+
+
+pool_monitor = PoolMonitor(config.MONGO_MAX_POOL_SIZE)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Return the process-wide MongoDB client, creating it on first call.
+
+    Uses the async driver when available and falls back to a synchronous
+    ``MongoClient``. Returns None when PyMongo is not installed.
+    """
+    global _client
+    with _client_lock:
+        if _client is None and monitoring is not None:
+            options = config.get_mongo_client_options()
+            options["event_listeners"] = [pool_monitor]
+            if AsyncMongoClient is not None:
+                _client = AsyncMongoClient(config.MONGO_URI, **options)
+            else:
+                from pymongo import MongoClient
+                _client = MongoClient(config.MONGO_URI, **options)
+        return _client
+
+
+def get_repositories() -> Optional[Repositories]:
+    """Repositories for ``config.MONGO_DB`` on the shared client."""
+    client = get_client()
+    if client is None:
+        return None
+    database = client[config.MONGO_DB]
+    if AsyncMongoClient is not None:
+        return Repositories(database, client=client)
+    # No async driver installed: drive the sync client from threads
+    return Repositories.from_sync_database(database)
+
+
+async def close_client() -> None:
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is None:
+        return
+    result = client.close()
+    if hasattr(result, "__await__"):
+        await result
+
+
+def pool_stats() -> Dict[str, Any]:
+    return pool_monitor.stats()
@@ -0,0 +1,116 @@
+"""
+Keyset (cursor) pagination for the admin listings.
+
+``skip(n).limit(k)`` makes MongoDB walk and discard ``n`` index entries, so
+deep pages get slower as collections grow. ``keyset_page`` instead sorts on
+(sort key, ``_id``) and resumes strictly after the last row of the previous
+page, which an index on the same two fields answers with one seek whatever
+the page number. The position travels as an opaque, URL-safe cursor.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from bson import ObjectId
+except Exception:
+    ObjectId = None
+
+
+class CursorError(ValueError):
+    """Raised for a cursor that was not produced by ``encode_cursor``."""
+
+
+def _dump(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    if ObjectId is not None and isinstance(value, ObjectId):
+        return {"$oid": str(value)}
+    return value
+
+
+def _load(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "$date" in value:
+            return datetime.fromisoformat(value["$date"])
+        if "$oid" in value and ObjectId is not None:
+            return ObjectId(value["$oid"])
+        raise CursorError("Unknown value in cursor")
+    return value
+
+
+def encode_cursor(sort_value: Any, doc_id: Any) -> str:
+    raw = json.dumps([_dump(sort_value), _dump(doc_id)], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, Any]:
+    """Return the (sort value, _id) a cursor points after."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, doc_id = json.loads(raw)
+        return _load(sort_value), _load(doc_id)
+    except CursorError:
+        raise
+    except Exception as e:
+        raise CursorError("Invalid cursor") from e
+
+
+def after_cursor(field: str, direction: int, sort_value: Any, doc_id: Any) -> Dict[str, Any]:
+    """
+    Filter for rows strictly after (sort_value, doc_id) in (field, _id) order.
+
+    Documents without ``field`` sort as null: last when descending, first
+    when ascending, so they are only reached from (or past) a null cursor.
+    """
+    op = "$lt" if direction < 0 else "$gt"
+    tie = {field: sort_value, "_id": {op: doc_id}}
+    if sort_value is None:
+        return {"$or": [tie, {field: {"$ne": None}}]} if direction > 0 else tie
+    clauses = [{field: {op: sort_value}}, tie]
+    if direction < 0:
+        clauses.append({field: None})
+    return {"$or": clauses}
+
+
+async def keyset_page(
+    repo,
+    query: Optional[Dict[str, Any]],
+    field: str,
+    direction: int = -1,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Fetch one page of ``repo`` ordered by (field, _id).
+
+    Args:
+        repo: Repository to read from
+        query: Base filter
+        field: Sort key; pair it with an index on [(field, direction), ("_id", direction)]
+        limit: Page size
+        cursor: ``next_cursor`` of the previous page; None for the first page
+        skip: Offset for callers that still page by number (ignored with a cursor)
+
+    Returns:
+        (documents, cursor for the next page or None on the last page)
+
+    Raises:
+        CursorError: if ``cursor`` cannot be decoded
+    """
+    limit = max(1, int(limit))
+    query = dict(query or {})
+    if cursor:
+        condition = after_cursor(field, direction, *decode_cursor(cursor))
+        query = {"$and": [query, condition]} if query else condition
+        skip = 0
+    docs = await repo.find_many(query, sort=[(field, direction), ("_id", direction)],
+                                skip=max(0, int(skip)), limit=limit + 1)
+    if len(docs) <= limit:
+        return docs, None
+    docs = docs[:limit]
+    last = docs[-1]
+    return docs, encode_cursor(last.get(field), last["_id"])
@@ -0,0 +1,93 @@
+"""
+Bounded worker pool for bcrypt hashing and verification.
+
+bcrypt is deliberately slow, so running it on the event loop (or in the
+shared request threadpool) lets a login burst starve every other endpoint.
+This pool runs it on a small dedicated executor, caps how much work may be
+queued, and records queueing metrics.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when the pool already has ``max_pending`` jobs queued or running."""
+
+
+class PasswordWorkerPool:
+    def __init__(
+        self,
+        hash_fn: Callable[[str], str],
+        verify_fn: Callable[[str, str], bool],
+        max_workers: int = 2,
+        max_pending: int = 64,
+    ):
+        self._hash_fn = hash_fn
+        self._verify_fn = verify_fn
+        self.max_workers = max(1, int(max_workers))
+        self.max_pending = max(self.max_workers, int(max_pending))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self.completed = 0
+        self.rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(self._hash_fn, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._submit(self._verify_fn, password, hashed)
+
+    async def _submit(self, fn: Callable[..., Any], *args) -> Any:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordPoolBusy(f"{self._pending} password jobs already pending")
+            self._pending += 1
+        submitted = time.perf_counter()
+        try:
+            return await asyncio.wrap_future(self._executor.submit(self._job, submitted, fn, *args))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _job(self, submitted: float, fn: Callable[..., Any], *args) -> Any:
+        started = time.perf_counter()
+        with self._lock:
+            self._running += 1
+            waited = started - submitted
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self.completed += 1
+                self._run_total += time.perf_counter() - started
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            done = self.completed or 1
+            return {
+                "workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "running": self._running,
+                "queued": max(0, self._pending - self._running),
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self._wait_total / done * 1000, 2),
+                "max_wait_ms": round(self._wait_max * 1000, 2),
+                "avg_run_ms": round(self._run_total / done * 1000, 2),
+            }
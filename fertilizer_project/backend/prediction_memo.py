@@ -0,0 +1,127 @@
+"""
+LRU memo of model predictions keyed on the encoded feature row.
+
+Farmers resubmit the same inputs (same state/season/crop, region-default
+rainfall and fertilizer), so the single-request paths keep predicting the
+same rows. ``PredictionMemo.predict`` rounds each encoded row to
+``decimals`` places, serves rows it has seen from the cache and predicts
+the rest in one model call. Misses are predicted on the rounded row, so a
+key always maps to the model's output for that canonical row, whether it
+was a hit or not. The memo is emptied when the model version changes.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import numpy as np
+
+
+class PredictionMemo:
+    """
+    Thread-safe LRU of per-row predictions for one model.
+
+    Args:
+        maxsize: Rows kept; least recently used rows are evicted first
+        decimals: Rounding applied to every feature before keying and predicting
+        enabled: When False, ``predict`` just calls the model
+    """
+
+    def __init__(self, maxsize: int = 10000, decimals: int = 3, enabled: bool = True):
+        self.maxsize = max(1, int(maxsize))
+        self.decimals = int(decimals)
+        self.enabled = enabled
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.version: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.model_ms = 0.0        # time spent predicting misses
+        self.saved_ms = 0.0        # estimated model time avoided by hits
+
+    def _check_version(self, version: str) -> None:
+        # Called with the lock held
+        if version != self.version:
+            if self._data:
+                self.invalidations += 1
+            self._data.clear()
+            self.version = version
+
+    def predict(self, version: str, X, predict_fn: Callable[[Any], Any]) -> np.ndarray:
+        """
+        Predict every row of ``X`` (NumPy array or DataFrame) with memoisation.
+
+        Args:
+            version: Version of the model behind ``predict_fn``
+            X: Encoded feature rows
+            predict_fn: The model's ``predict``; called once with the missing rows
+
+        Returns:
+            One prediction per row, in order
+        """
+        if not self.enabled:
+            return np.asarray(predict_fn(X))
+        X = X.round(self.decimals)  # works for ndarray and DataFrame alike
+        values = np.ascontiguousarray(np.asarray(X, dtype=np.float64))
+        keys = [row.tobytes() for row in values]
+
+        out: list = [None] * len(keys)
+        missing = []
+        with self._lock:
+            self._check_version(version)
+            for i, key in enumerate(keys):
+                if key in self._data:
+                    self._data.move_to_end(key)
+                    out[i] = self._data[key]
+                else:
+                    missing.append(i)
+            hits = len(keys) - len(missing)
+            self.hits += hits
+            self.misses += len(missing)
+            per_row_ms = self.model_ms / self.misses if self.misses else 0.0
+            self.saved_ms += hits * per_row_ms
+
+        if missing:
+            rows = X.iloc[missing] if hasattr(X, "iloc") else X[missing]
+            started = time.perf_counter()
+            preds = predict_fn(rows)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self.model_ms += elapsed_ms
+                stale = version != self.version  # swapped mid-call: serve but don't cache
+                for i, pred in zip(missing, preds):
+                    out[i] = pred
+                    if not stale:
+                        self._data[keys[i]] = pred
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+                    self.evictions += 1
+        return np.asarray(out)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "version": self.version,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "decimals": self.decimals,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "avg_model_ms_per_row": round(self.model_ms / self.misses, 4) if self.misses else 0.0,
+                "latency_saved_ms": round(self.saved_ms, 2),
+            }
@@ -0,0 +1,242 @@
+"""
+Async MongoDB data-access layer.
+
+Route handlers talk to MongoDB through ``Repositories`` and await every
+call instead of blocking the event loop. The layer runs on PyMongo's native
+``AsyncMongoClient`` (or Motor on older PyMongo); the shared client lives in
+``mongo.py``. Any synchronous PyMongo compatible database, such as a plain
+``MongoClient`` when no async driver is installed or ``mongomock`` in tests,
+can be wrapped with ``Repositories.from_sync_database`` and is then driven
+from a thread.
+"""
+
+import asyncio
+import inspect
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from counters import CollectionCounters
+
+try:
+    from pymongo.errors import BulkWriteError
+except Exception:
+    BulkWriteError = None
+
+try:
+    from pymongo import AsyncMongoClient
+except Exception:
+    try:
+        from motor.motor_asyncio import AsyncIOMotorClient as AsyncMongoClient
+    except Exception:
+        AsyncMongoClient = None
+
+SortSpec = Optional[Sequence[Tuple[str, int]]]
+
+
+# --- Thread-backed adapters for synchronous drivers ---
+class _ThreadedCursor:
+    def __init__(self, collection, args, kwargs):
+        self._collection = collection
+        self._args = args
+        self._kwargs = kwargs
+        self._ops: List[Tuple[str, tuple]] = []
+
+    def sort(self, *args):
+        self._ops.append(("sort", args))
+        return self
+
+    def skip(self, n):
+        self._ops.append(("skip", (n,)))
+        return self
+
+    def limit(self, n):
+        self._ops.append(("limit", (n,)))
+        return self
+
+    def _run(self, length):
+        cursor = self._collection.find(*self._args, **self._kwargs)
+        for name, args in self._ops:
+            cursor = getattr(cursor, name)(*args)
+        docs = list(cursor)
+        return docs if length is None else docs[:length]
+
+    async def to_list(self, length=None):
+        return await asyncio.to_thread(self._run, length)
+
+
+class _ListCursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    async def to_list(self, length=None):
+        return self._docs if length is None else self._docs[:length]
+
+
+class _ThreadedCollection:
+    """Expose the awaitable subset of the collection API over a sync collection."""
+
+    def __init__(self, collection):
+        self._collection = collection
+        self.name = collection.name
+
+    def find(self, *args, **kwargs):
+        return _ThreadedCursor(self._collection, args, kwargs)
+
+    async def aggregate(self, pipeline, **kwargs):
+        docs = await asyncio.to_thread(lambda: list(self._collection.aggregate(pipeline, **kwargs)))
+        return _ListCursor(docs)
+
+    def __getattr__(self, name):
+        method = getattr(self._collection, name)
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(method, *args, **kwargs)
+        return call
+
+
+class _ThreadedDatabase:
+    def __init__(self, database):
+        self._database = database
+        self.name = database.name
+
+    def __getitem__(self, name):
+        return _ThreadedCollection(self._database[name])
+
+    async def command(self, *args, **kwargs):
+        return await asyncio.to_thread(self._database.command, *args, **kwargs)
+
+
+# --- Repository interface ---
+class Repository:
+    """Awaitable operations on one MongoDB collection.
+
+    When ``counters`` is given, inserts and deletes also adjust this
+    collection's materialised document count (see counters.py).
+    """
+
+    def __init__(self, collection, counters: Optional[CollectionCounters] = None):
+        self.collection = collection
+        self.name = collection.name
+        self.counters = counters
+
+    async def _counted(self, n: int) -> None:
+        if self.counters is not None:
+            await self.counters.incr(self.name, n)
+
+    async def find_one(self, query: Dict[str, Any], projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one(query, projection)
+
+    async def find_many(
+        self,
+        query: Optional[Dict[str, Any]] = None,
+        sort: SortSpec = None,
+        skip: int = 0,
+        limit: int = 0,
+        projection: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        cursor = self.collection.find(query or {}, projection)
+        if sort:
+            cursor = cursor.sort(list(sort))
+        if skip:
+            cursor = cursor.skip(skip)
+        if limit:
+            cursor = cursor.limit(limit)
+        return await cursor.to_list(None)
+
+    async def insert_one(self, doc: Dict[str, Any]) -> Any:
+        """Insert a document and return its id."""
+        res = await self.collection.insert_one(doc)
+        await self._counted(1)
+        return res.inserted_id
+
+    async def insert_many(self, docs: List[Dict[str, Any]], ordered: bool = False) -> List[Any]:
+        if not docs:
+            return []
+        try:
+            res = await self.collection.insert_many(docs, ordered=ordered)
+        except Exception as e:
+            if BulkWriteError is not None and isinstance(e, BulkWriteError):
+                # Partly applied: count what landed before re-raising
+                await self._counted(e.details.get("nInserted", 0))
+            raise
+        await self._counted(len(res.inserted_ids))
+        return list(res.inserted_ids)
+
+    async def record_inserts(self, n: int) -> None:
+        """Count ``n`` documents confirmed inserted outside an insert result (e.g. found on retry)."""
+        await self._counted(n)
+
+    async def update_one(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool = False) -> int:
+        """Apply an update and return the matched count."""
+        res = await self.collection.update_one(query, update, upsert=upsert)
+        return res.matched_count
+
+    async def replace_many(self, docs: List[Dict[str, Any]], ordered: bool = False) -> int:
+        """Upsert documents by ``_id`` in one bulk write; returns the upserted + modified count."""
+        if not docs:
+            return 0
+        from pymongo import ReplaceOne
+        res = await self.collection.bulk_write(
+            [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in docs], ordered=ordered
+        )
+        return res.upserted_count + res.modified_count
+
+    async def delete_many(self, query: Dict[str, Any]) -> int:
+        res = await self.collection.delete_many(query)
+        await self._counted(-res.deleted_count)
+        return res.deleted_count
+
+    async def find_one_and_delete(self, query: Dict[str, Any], projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        doc = await self.collection.find_one_and_delete(query, projection=projection)
+        if doc is not None:
+            await self._counted(-1)
+        return doc
+
+    async def count(self, query: Optional[Dict[str, Any]] = None, limit: int = 0) -> int:
+        """Count matching documents, stopping at ``limit`` when it is set."""
+        if limit:
+            return await self.collection.count_documents(query or {}, limit=limit)
+        return await self.collection.count_documents(query or {})
+
+    async def aggregate(self, pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        cursor = self.collection.aggregate(pipeline)
+        if inspect.isawaitable(cursor):
+            # PyMongo's async API returns the cursor from a coroutine; Motor does not
+            cursor = await cursor
+        return await cursor.to_list(None)
+
+    async def create_index(self, keys: List[Tuple[str, int]], **kwargs) -> Optional[str]:
+        return await self.collection.create_index(keys, **kwargs)
+
+
+class Repositories:
+    """One repository per collection the backend uses."""
+
+    # Collections with a materialised count for the admin dashboard
+    COUNTED = ("users", "recommendations", "soil_analysis", "yield_predictions", "articles", "contacts")
+
+    def __init__(self, database, client=None):
+        self.database = database
+        self.client = client
+        self.stats = Repository(database["stats"])
+        self.counters = CollectionCounters(self.stats, self.COUNTED)
+        self.users = Repository(database["users"], self.counters)
+        self.recommendations = Repository(database["recommendations"], self.counters)
+        self.soil_analysis = Repository(database["soil_analysis"], self.counters)
+        self.crop_recommendations = Repository(database["crop_recommendations"])
+        self.market_logs = Repository(database["market_logs"])
+        self.contacts = Repository(database["contacts"], self.counters)
+        self.articles = Repository(database["articles"], self.counters)
+        self.techniques = Repository(database["techniques"])
+        self.mandi_prices = Repository(database["mandi_prices"])
+        self.daily_rollups = Repository(database["daily_rollups"])
+        self.yield_predictions = Repository(database["yield_predictions"], self.counters)
+
+    @classmethod
+    def from_sync_database(cls, database) -> "Repositories":
+        """Wrap a synchronous PyMongo-compatible database (e.g. mongomock)."""
+        return cls(_ThreadedDatabase(database))
+
+    async def ping(self) -> bool:
+        await self.database.command("ping")
+        return True
+
@@ -0,0 +1,187 @@
+"""
+Daily rollups behind the admin dashboard charts.
+
+The chart endpoints used to ``$group`` the whole recommendations and
+yield_predictions collections on every render. ``advance_rollups`` instead
+folds only the documents written since a per-collection watermark (the last
+processed ``_id``, kept in the ``stats`` collection) into small
+``daily_rollups`` documents, one per (metric, day, key) plus an all-time row
+per key, so a chart reads a few dozen documents.
+
+Documents newer than ``upto`` are left for the next run: ObjectIds are
+generated by each writer, so ids from different workers or a write-behind
+batch can land slightly out of order. Runs from several workers are safe;
+a run claims its batch by compare-and-set on the watermark before adding
+it, so a batch is never added twice (a crash after the claim loses that
+batch until ``reset_rollups`` rebuilds everything).
+"""
+
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+try:
+    from bson import ObjectId
+except Exception:
+    ObjectId = None
+
+ALL_TIME = "all"
+DAY_FORMAT = "%Y-%m-%d"
+WATERMARK_PREFIX = "rollup_watermark."
+
+
+class RollupSpec(NamedTuple):
+    metric: str
+    source: str                                            # collection the documents come from
+    date_field: str
+    key: Callable[[Dict[str, Any]], Any]
+    value: Optional[Callable[[Dict[str, Any]], Any]] = None  # summed alongside the count
+    all_time: bool = True
+
+
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
+
+
+ROLLUPS: List[RollupSpec] = [
+    # Field fallbacks match the older recommendation log layout
+    RollupSpec("fertilizer", "recommendations", "ts",
+               lambda d: (d.get("output") or {}).get("name") or d.get("fertilizer")),
+    RollupSpec("crop", "recommendations", "ts",
+               lambda d: (d.get("input") or {}).get("crop_type") or d.get("crop_type")),
+    RollupSpec("crop", "yield_predictions", "created_at", lambda d: d.get("Crop")),
+    RollupSpec("yield", "yield_predictions", "created_at",
+               lambda d: "" if _number(d.get("predicted_yield")) is not None else None,
+               value=lambda d: _number(d.get("predicted_yield")), all_time=False),
+]
+
+SOURCES = sorted({spec.source for spec in ROLLUPS})
+_PROJECTIONS = {
+    "recommendations": {"ts": 1, "output.name": 1, "fertilizer": 1, "input.crop_type": 1, "crop_type": 1},
+    "yield_predictions": {"created_at": 1, "Crop": 1, "predicted_yield": 1},
+}
+
+
+def rollup_id(metric: str, day: str, key: str) -> str:
+    return f"{metric}|{day}|{key}"
+
+
+def day_of(doc: Dict[str, Any], date_field: str) -> Optional[str]:
+    """UTC day of ``doc``: its date field, else the creation time in its ObjectId."""
+    value = doc.get(date_field)
+    if isinstance(value, datetime):
+        return value.strftime(DAY_FORMAT)
+    if ObjectId is not None and isinstance(doc.get("_id"), ObjectId):
+        return doc["_id"].generation_time.strftime(DAY_FORMAT)
+    return None
+
+
+def accumulate(docs: List[Dict[str, Any]], specs: List[RollupSpec]) -> Dict[Tuple[str, str, str], List[float]]:
+    """Fold documents into {(metric, day, key): [count, sum]}."""
+    totals: Dict[Tuple[str, str, str], List[float]] = defaultdict(lambda: [0, 0.0])
+    for doc in docs:
+        for spec in specs:
+            key = spec.key(doc)
+            if key is None or (key == "" and spec.value is None):
+                continue
+            value = (spec.value(doc) or 0.0) if spec.value is not None else 0.0
+            day = day_of(doc, spec.date_field)
+            rows = ([day] if day else []) + ([ALL_TIME] if spec.all_time else [])
+            for bucket in rows:
+                row = totals[(spec.metric, bucket, str(key))]
+                row[0] += 1
+                row[1] += value
+    return totals
+
+
+async def _apply(rollups, totals: Dict[Tuple[str, str, str], List[float]], now: datetime) -> None:
+    for (metric, day, key), (count, total) in totals.items():
+        await rollups.update_one(
+            {"_id": rollup_id(metric, day, key)},
+            {"$inc": {"count": count, "sum": total},
+             "$set": {"updated_at": now},
+             "$setOnInsert": {"metric": metric, "day": day, "key": key}},
+            upsert=True,
+        )
+
+
+async def _advance_source(repos, source: str, upto_id: Any, batch_size: int, now: datetime) -> Tuple[int, bool]:
+    """Process one batch of ``source``; returns (documents processed, more may remain)."""
+    watermark_id = WATERMARK_PREFIX + source
+    try:
+        await repos.stats.update_one({"_id": watermark_id}, {"$setOnInsert": {"last_id": None, "processed": 0}},
+                                     upsert=True)
+    except Exception:
+        pass  # Created concurrently by another worker
+    watermark = await repos.stats.find_one({"_id": watermark_id}) or {}
+    last_id = watermark.get("last_id")
+
+    id_range: Dict[str, Any] = {"$lt": upto_id}
+    if last_id is not None:
+        id_range["$gt"] = last_id
+    docs = await getattr(repos, source).find_many({"_id": id_range}, sort=[("_id", 1)], limit=batch_size,
+                                                  projection=_PROJECTIONS.get(source))
+    if not docs:
+        return 0, False
+
+    claimed = await repos.stats.update_one(
+        {"_id": watermark_id, "last_id": last_id},
+        {"$set": {"last_id": docs[-1]["_id"], "updated_at": now}, "$inc": {"processed": len(docs)}},
+    )
+    if not claimed:
+        return 0, False  # Another worker took this batch
+    await _apply(repos.daily_rollups, accumulate(docs, [s for s in ROLLUPS if s.source == source]), now)
+    return len(docs), len(docs) == batch_size
+
+
+async def advance_rollups(repos, upto: datetime, batch_size: int = 5000, max_batches: int = 100) -> Dict[str, int]:
+    """
+    Fold documents written since the watermarks and before ``upto`` into the rollups.
+
+    Args:
+        repos: Repositories
+        upto: Only documents whose ObjectId was generated before this (naive UTC) time
+        batch_size: Documents read and claimed per step
+        max_batches: Per source and call, so a first run over a long history stays bounded
+
+    Returns:
+        Documents processed per source collection
+    """
+    now = datetime.utcnow()
+    upto_id = ObjectId.from_datetime(upto)
+    processed = {}
+    for source in SOURCES:
+        processed[source] = 0
+        for _ in range(max_batches):
+            n, more = await _advance_source(repos, source, upto_id, batch_size, now)
+            processed[source] += n
+            if not more:
+                break
+    return processed
+
+
+async def reset_rollups(repos) -> None:
+    """Drop every rollup and watermark so the next run rebuilds them from the start."""
+    await repos.daily_rollups.delete_many({})
+    await repos.stats.delete_many({"_id": {"$in": [WATERMARK_PREFIX + source for source in SOURCES]}})
+
+
+async def read_totals(repos, metric: str, limit: int = 10) -> List[Tuple[str, int]]:
+    """All-time (key, count) pairs of ``metric``, largest first."""
+    rows = await repos.daily_rollups.find_many({"metric": metric, "day": ALL_TIME},
+                                               sort=[("count", -1)], limit=limit)
+    return [(row["key"], int(row["count"])) for row in rows if row.get("key")]
+
+
+async def read_daily(repos, metric: str, since: str) -> List[Dict[str, Any]]:
+    """Per-day rows of ``metric`` from day ``since`` (YYYY-MM-DD) onward, oldest first."""
+    return await repos.daily_rollups.find_many({"metric": metric, "day": {"$gte": since, "$ne": ALL_TIME}},
+                                               sort=[("day", 1)])
+
+
+async def watermarks(repos) -> Dict[str, Any]:
+    docs = await repos.stats.find_many({"_id": {"$in": [WATERMARK_PREFIX + source for source in SOURCES]}})
+    return {doc["_id"][len(WATERMARK_PREFIX):]: {"processed": doc.get("processed", 0), "updated_at": doc.get("updated_at")}
+            for doc in docs}
@@ -0,0 +1,73 @@
+"""
+Request coalescing for slow upstream lookups.
+
+``SingleFlight`` makes sure that concurrent callers asking for the same key
+share one in-flight call instead of each hitting the upstream API.
+"""
+
+import threading
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Deduplicate identical in-flight calls across threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self.started = 0
+        self.shared = 0
+
+    def submit(self, key: Hashable, executor: Executor, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """
+        Return a future for ``fn(*args, **kwargs)`` run on ``executor``.
+
+        If a call for ``key`` is already running, its future is returned
+        instead of starting a new one.
+        """
+        with self._lock:
+            fut = self._calls.get(key)
+            if fut is not None:
+                self.shared += 1
+                return fut
+            fut = executor.submit(fn, *args, **kwargs)
+            self._calls[key] = fut
+            self.started += 1
+        fut.add_done_callback(lambda f, key=key: self._forget(key, f))
+        return fut
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run ``fn`` in the calling thread, or wait for the identical call already in flight."""
+        with self._lock:
+            fut = self._calls.get(key)
+            owner = fut is None
+            if owner:
+                fut = Future()
+                self._calls[key] = fut
+                self.started += 1
+            else:
+                self.shared += 1
+        if not owner:
+            return fut.result()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._forget(key, fut)
+            fut.set_exception(e)
+            raise
+        self._forget(key, fut)
+        fut.set_result(result)
+        return result
+
+    def _forget(self, key: Hashable, fut: Future) -> None:
+        with self._lock:
+            if self._calls.get(key) is fut:
+                del self._calls[key]
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": self.in_flight(), "started": self.started, "shared": self.shared}
@@ -0,0 +1,81 @@
+"""
+Vectorized soil health scoring.
+
+Array version of ``analyze_soil_health`` in backend.py: scores whole lab
+reports at once and returns compact codes (status per nutrient, suggestion
+indices into ``SUGGESTIONS``) that ``decode`` turns back into exactly what
+the scalar function returns for each sample.
+"""
+
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+NUTRIENTS = ("N", "P", "K", "pH")
+
+# Ideal ranges, same order as NUTRIENTS
+LOW = np.array([40, 30, 20, 6.0])
+HIGH = np.array([80, 60, 50, 7.5])
+
+OPTIMAL, DEFICIENT, EXCESS = 0, 1, 2
+STATUS_LABELS = ("Optimal", "Deficient", "Excess")
+PENALTY = np.array([0, 20, 10])
+
+# Suggestion catalogue: per-nutrient (Deficient, Excess) pairs, then the overall verdicts
+SUGGESTIONS = (
+    "🌾 Nitrogen is low. Increase using Urea, Ammonium Nitrate, or compost.",
+    "⚠️ Nitrogen is high. Reduce nitrogen fertilizers. Use low-N crops.",
+    "🌾 Phosphorus is low. Add bone meal, rock phosphate, or DAP fertilizer.",
+    "⚠️ Phosphorus is high. Avoid phosphorus-heavy fertilizers.",
+    "🌾 Potassium is low. Use potassium nitrate, wood ash, or sulfate of potash.",
+    "⚠️ Potassium is high. Reduce K fertilizers. Increase nitrogen ratio.",
+    "🌾 pH is too low (acidic). Apply agricultural lime to increase pH.",
+    "⚠️ pH is too high (alkaline). Use soil acidifiers, sulfur, or organic matter.",
+    "✅ Overall soil health is excellent! Maintain current practices.",
+    "👍 Soil health is good. Make minor adjustments above.",
+    "⚠️ Soil health needs attention. Follow recommendations above.",
+    "❌ Soil health is poor. Take corrective measures urgently.",
+)
+OVERALL_OFFSET = 2 * len(NUTRIENTS)
+OVERALL_THRESHOLDS = np.array([80, 60, 40])
+
+
+class SoilScores(NamedTuple):
+    scores: np.ndarray        # (n,) int, 0-100
+    status: np.ndarray        # (n, 4) int8 codes into STATUS_LABELS, columns in NUTRIENTS order
+    suggestions: np.ndarray   # (n, 5) int indices into SUGGESTIONS, -1 where a nutrient is optimal
+
+
+def score_samples(N, P, K, pH) -> SoilScores:
+    """Score arrays of samples (any array-likes of equal length)."""
+    values = np.column_stack([np.asarray(v, dtype=np.float64) for v in (N, P, K, pH)])
+    status = np.zeros(values.shape, dtype=np.int8)
+    status[values < LOW] = DEFICIENT
+    status[values > HIGH] = EXCESS
+
+    raw = 100 - PENALTY[status].sum(axis=1)
+
+    nutrient_suggestions = np.where(
+        status == OPTIMAL, -1, 2 * np.arange(len(NUTRIENTS)) + (status - 1)
+    )
+    # 0 when raw >= 80, 1 when >= 60, 2 when >= 40, else 3 (thresholds use the unclamped score)
+    overall = OVERALL_OFFSET + (raw[:, None] < OVERALL_THRESHOLDS).sum(axis=1)
+    suggestions = np.column_stack([nutrient_suggestions, overall])
+
+    return SoilScores(np.clip(raw, 0, 100), status, suggestions)
+
+
+def decode(result: SoilScores, i: int) -> Tuple[int, Dict[str, str], List[str]]:
+    """Return sample ``i`` as ``analyze_soil_health`` would: (score, status_dict, suggestions_list)."""
+    status = {name: STATUS_LABELS[code] for name, code in zip(NUTRIENTS, result.status[i])}
+    suggestions = [SUGGESTIONS[j] for j in result.suggestions[i] if j >= 0]
+    return int(result.scores[i]), status, suggestions
+
+
+def decode_all(result: SoilScores) -> List[Tuple[int, Dict[str, str], List[str]]]:
+    return [decode(result, i) for i in range(len(result.scores))]
+
+
+def score_records(rows: List[Dict[str, Any]]) -> SoilScores:
+    """Score dicts carrying N, P, K and pH."""
+    return score_samples(*([row[name] for row in rows] for name in NUTRIENTS))
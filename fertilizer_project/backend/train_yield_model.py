@@ -8,6 +8,9 @@ from sklearn.metrics import mean_squared_error
 import joblib
 import logging
 
+from flat_forest import export_bundle, flat_path_for
+from yield_table import CANDIDATE_CROPS, build_all
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -73,6 +76,9 @@ def save_model(model, X, path):
     }
     joblib.dump(model_dict, path)
     logging.info(f"Model saved to: {path}")
+    # Flat export served by the API (memory-mapped, shared across workers)
+    flat_path = export_bundle(model_dict, flat_path_for(path), source=path)
+    logging.info(f"Flat model exported to: {flat_path}")
 
 
 def main():
@@ -86,6 +92,8 @@ def main():
     X, y = prepare_features(df)
     model, X_full = train_and_evaluate(X, y)
     save_model(model, X_full, MODEL_PATH)
+    # Precompute the crop recommendation yield tables for the new model
+    build_all(MODEL_PATH, CANDIDATE_CROPS)
     print("Yield prediction model training complete and saved successfully.")
 
 
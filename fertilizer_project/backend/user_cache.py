@@ -0,0 +1,202 @@
+"""
+Bounded in-process user cache.
+
+Replaces the unbounded module-level ``USERS`` dict. Records are compact
+``__slots__`` objects, evicted least-recently-used once ``maxsize`` is
+reached and re-read from MongoDB after ``ttl`` seconds so that workers do
+not drift apart.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class UserRecord:
+    __slots__ = ("email", "name", "phone", "state", "district", "role", "password_hash", "expires_at")
+
+    def __init__(self, email, name=None, phone=None, state="", district="", role="farmer", password_hash=None):
+        self.email = email
+        self.name = name
+        self.phone = phone
+        self.state = state
+        self.district = district
+        self.role = role
+        self.password_hash = password_hash
+        self.expires_at = 0.0
+
+    @classmethod
+    def from_doc(cls, doc: Dict[str, Any]) -> "UserRecord":
+        # Handle backward compatibility for old location format
+        location = doc.get("location")
+        if isinstance(location, str):
+            # Old format: convert string to object
+            location = {"state": location, "district": ""}
+        elif not isinstance(location, dict):
+            location = {"state": "", "district": ""}
+        return cls(
+            email=doc.get("email"),
+            name=doc.get("name"),
+            phone=doc.get("phone"),
+            state=location.get("state", ""),
+            district=location.get("district", ""),
+            role=doc.get("role", "farmer"),  # Default to farmer for backward compatibility
+            password_hash=doc.get("password_hash"),
+        )
+
+    @property
+    def location(self) -> Dict[str, str]:
+        return {"state": self.state, "district": self.district}
+
+    def profile(self) -> Dict[str, Any]:
+        """Public profile handed to route handlers (no password hash)."""
+        return {
+            "name": self.name,
+            "email": self.email,
+            "phone": self.phone,
+            "location": self.location,
+            "role": self.role,
+        }
+
+    def to_doc(self) -> Dict[str, Any]:
+        return {
+            "email": self.email,
+            "name": self.name,
+            "phone": self.phone,
+            "location": self.location,
+            "role": self.role,
+            "password_hash": self.password_hash,
+        }
+
+    def nbytes(self) -> int:
+        """Approximate memory held by this record and its field values."""
+        size = sys.getsizeof(self)
+        for attr in self.__slots__:
+            size += sys.getsizeof(getattr(self, attr))
+        return size
+
+
+class UserCache:
+    """
+    LRU + TTL cache of UserRecord objects keyed by email.
+
+    ``loader(email)`` is a coroutine returning the user document from the
+    database or None if the user does not exist; it should raise when the
+    database is not reachable, in which case an expired record is kept and
+    served. Concurrent loads of the same email share one database call.
+    """
+
+    def __init__(self, loader: Callable[[str], Awaitable[Optional[Dict[str, Any]]]], maxsize: int = 5000, ttl: float = 300.0):
+        self.loader = loader
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = float(ttl)
+        self._data: "OrderedDict[str, UserRecord]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loads: Dict[str, asyncio.Future] = {}
+        self._nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.evictions = 0
+        self.load_errors = 0
+
+    def __contains__(self, email: str) -> bool:
+        with self._lock:
+            return email in self._data
+
+    def peek(self, email: str) -> Optional[UserRecord]:
+        """Return the cached record without loading, refreshing or touching LRU order."""
+        with self._lock:
+            return self._data.get(email)
+
+    async def get(self, email: str) -> Optional[UserRecord]:
+        """Return the user, loading it from the database on a miss or after the TTL."""
+        with self._lock:
+            record = self._data.get(email)
+            if record is not None:
+                self._data.move_to_end(email)
+                if record.expires_at > time.monotonic():
+                    self.hits += 1
+                    return record
+                self.refreshes += 1
+            else:
+                self.misses += 1
+
+        pending = self._loads.get(email)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        fut = asyncio.get_running_loop().create_future()
+        self._loads[email] = fut
+        try:
+            result = await self._load(email, record)
+        except BaseException:
+            fut.cancel()
+            raise
+        finally:
+            del self._loads[email]
+        fut.set_result(result)
+        return result
+
+    async def _load(self, email: str, stale: Optional[UserRecord]) -> Optional[UserRecord]:
+        try:
+            doc = await self.loader(email)
+        except Exception as e:
+            with self._lock:
+                self.load_errors += 1
+            print(f"⚠️ User lookup failed for {email}, serving cached copy: {e}")
+            if stale is not None:
+                # Back off until the next TTL instead of retrying on every request
+                stale.expires_at = time.monotonic() + self.ttl
+            return stale
+        if not doc:
+            self.invalidate(email)
+            return None
+        return self.put(doc)
+
+    def put(self, doc: Dict[str, Any]) -> UserRecord:
+        """Cache a user document (e.g. right after registration or login)."""
+        record = UserRecord.from_doc(doc)
+        record.expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            old = self._data.pop(record.email, None)
+            if old is not None:
+                self._nbytes -= old.nbytes()
+            self._data[record.email] = record
+            self._nbytes += record.nbytes()
+            while len(self._data) > self.maxsize:
+                _, evicted = self._data.popitem(last=False)
+                self._nbytes -= evicted.nbytes()
+                self.evictions += 1
+        return record
+
+    def invalidate(self, email: Optional[str]) -> bool:
+        """Drop a user so the next access reloads it. Returns True if it was cached."""
+        with self._lock:
+            record = self._data.pop(email, None)
+            if record is None:
+                return False
+            self._nbytes -= record.nbytes()
+            return True
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses + self.refreshes
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "evictions": self.evictions,
+                "load_errors": self.load_errors,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "memory_bytes": self._nbytes,
+                "avg_entry_bytes": round(self._nbytes / len(self._data), 1) if self._data else 0.0,
+            }
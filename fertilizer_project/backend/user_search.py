@@ -0,0 +1,177 @@
+"""
+Ranked, typo-tolerant farmer search for the admin dashboard.
+
+The admin farmer ``search`` used to run an unanchored case-insensitive
+``$regex`` on name and email, which scans every user. Each user document
+now carries ``search_keys``, computed on write from its name and email and
+served by one multikey index:
+
+* ``w:<word>`` for each normalised word, for exact-word lookups;
+* ``p:<prefix>`` for every prefix (up to ``MAX_PREFIX`` characters) of each
+  word, so "rav" finds "Ravi Kumar" as it is typed;
+* ``d:<variant>`` for each name / email-local-part word of at least
+  ``MIN_FUZZY`` characters and every variant with one character deleted.
+  A query word meets a stored word on a shared variant when they are at
+  most one insertion, deletion, substitution or transposition apart
+  ("raavi", "rvai" and "rabi" all find "ravi").
+
+A search is at most three index lookups, each capped at ``max_candidates``
+documents, which are then ranked in memory: prefixes; exact words when the
+prefix lookup hit the cap (so "ravi" is not crowded out by a cap's worth of
+"ravindra"s); typo variants when the page is still not full. Latency
+depends on that cap rather than on the number of users, and results are
+only ranked that deep: ``skip + limit`` may not exceed ``max_candidates``.
+"""
+
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+SEARCH_FIELD = "search_keys"
+MAX_PREFIX = 12
+MIN_FUZZY = 4
+MAX_QUERY_WORDS = 4
+PROJECTION = {SEARCH_FIELD: 0, "password_hash": 0}
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def normalize(text: Optional[str]) -> str:
+    """Casefold and strip accents ("Ráví" -> "ravi")."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def words(text: Optional[str]) -> List[str]:
+    return _WORD.findall(normalize(text))
+
+
+def _email_words(email: Optional[str]) -> Tuple[List[str], List[str]]:
+    """(local-part words, domain words)"""
+    local, _, domain = (email or "").partition("@")
+    return words(local), words(domain)
+
+
+def _deletes(word: str) -> Set[str]:
+    word = word[:MAX_PREFIX]
+    return {word} | {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def search_keys(name: Optional[str], email: Optional[str]) -> List[str]:
+    """The ``search_keys`` value for a user with this name and email."""
+    local, domain = _email_words(email)
+    keys = set()
+    for word in words(name) + local + domain:
+        keys.add("w:" + word)
+        keys.update("p:" + word[:i] for i in range(1, min(len(word), MAX_PREFIX) + 1))
+    # Domains are shared by many users, so they only get prefixes
+    for word in words(name) + local:
+        if len(word) >= MIN_FUZZY:
+            keys.update("d:" + variant for variant in _deletes(word))
+    return sorted(keys)
+
+
+def within_one_edit(a: str, b: str) -> bool:
+    """True if ``a`` and ``b`` differ by at most one insertion, deletion, substitution or transposition."""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:] or (a[i + 2:] == b[i + 2:] and a[i:i + 2] == b[i:i + 2][::-1])
+    return a[i:] == b[i + 1:]
+
+
+def _word_score(query: str, word: str) -> float:
+    if word == query:
+        return 1.0
+    if word.startswith(query):
+        return 0.8
+    if len(query) >= MIN_FUZZY and within_one_edit(query, word[:MAX_PREFIX]):
+        return 0.5
+    return 0.0
+
+
+def score(query_words: List[str], doc: Dict[str, Any]) -> float:
+    """
+    Relevance of ``doc`` to the query: per query word, the best match among
+    the document's words (exact > prefix > one typo), name words counting
+    more than email words. 0 if any query word matches nothing.
+    """
+    name = words(doc.get("name"))
+    local, domain = _email_words(doc.get("email"))
+    total = 0.0
+    for query in query_words:
+        best = max([_word_score(query, w) for w in name] + [0.9 * _word_score(query, w) for w in local + domain]
+                   + [0.0])
+        if best == 0.0:
+            return 0.0
+        total += best
+    return total
+
+
+async def search_users(repo, text: str, skip: int = 0, limit: int = 50,
+                       max_candidates: int = 200) -> Tuple[List[Dict[str, Any]], int, bool]:
+    """
+    Ranked users matching ``text``.
+
+    Args:
+        repo: Users repository
+        text: Free-text query (name and/or email words, partial last word allowed)
+        skip, limit: Window of the ranked list to return (clamped to ``max_candidates``)
+        max_candidates: Documents read per index lookup
+
+    Returns:
+        (users best match first, number of matches found, whether that number is exact)
+    """
+    query_words = words(text)[:MAX_QUERY_WORDS]
+    skip = min(max(0, skip), max_candidates)
+    limit = min(limit, max_candidates - skip)
+    if not query_words or limit <= 0:
+        return [], 0, True
+
+    prefix = {SEARCH_FIELD: {"$all": ["p:" + w[:MAX_PREFIX] for w in query_words]}}
+    candidates = await repo.find_many(prefix, limit=max_candidates, projection=PROJECTION)
+    capped = len(candidates) >= max_candidates
+
+    if capped:
+        # The cap is filled in index order, so make sure exact-word matches are ranked
+        exact = await repo.find_many({SEARCH_FIELD: {"$all": ["w:" + w for w in query_words]}},
+                                     limit=max_candidates, projection=PROJECTION)
+        seen = {doc["_id"] for doc in candidates}
+        candidates += [doc for doc in exact if doc["_id"] not in seen]
+
+    if len(candidates) < skip + limit and any(len(w) >= MIN_FUZZY for w in query_words):
+        # Every word must still match, either as a prefix or within one typo
+        clauses = [{SEARCH_FIELD: {"$in": ["p:" + w[:MAX_PREFIX]] +
+                                   (["d:" + v for v in sorted(_deletes(w))] if len(w) >= MIN_FUZZY else [])}}
+                   for w in query_words]
+        fuzzy = clauses[0] if len(clauses) == 1 else {"$and": clauses}
+        seen = {doc["_id"] for doc in candidates}
+        more = await repo.find_many(fuzzy, limit=max_candidates, projection=PROJECTION)
+        candidates += [doc for doc in more if doc["_id"] not in seen]
+        capped = capped or len(more) >= max_candidates
+
+    ranked = [(score(query_words, doc), doc) for doc in candidates]
+    ranked = [pair for pair in ranked if pair[0] > 0]
+    ranked.sort(key=lambda pair: (-pair[0], normalize(pair[1].get("name")), str(pair[1]["_id"])))
+    return [doc for _, doc in ranked[skip:skip + limit]], len(ranked), not capped
+
+
+async def backfill_search_keys(repo, batch_size: int = 1000) -> int:
+    """Add ``search_keys`` to users written before it existed; returns how many were updated."""
+    updated = 0
+    while True:
+        docs = await repo.find_many({SEARCH_FIELD: {"$exists": False}}, limit=batch_size,
+                                    projection={"name": 1, "email": 1})
+        if not docs:
+            return updated
+        for doc in docs:
+            await repo.update_one({"_id": doc["_id"]},
+                                  {"$set": {SEARCH_FIELD: search_keys(doc.get("name"), doc.get("email"))}})
+        updated += len(docs)
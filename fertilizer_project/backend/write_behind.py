@@ -0,0 +1,193 @@
+"""
+Write-behind queue for analytics inserts.
+
+Handlers hand their log documents (yield predictions, recommendations, soil
+analyses, market fetch logs, contact messages) to ``WriteBehindQueue.put``
+and return immediately. A background task groups them per collection into
+``insert_many`` batches, flushing when ``max_batch`` documents are waiting or
+``flush_interval`` seconds after the first one arrived, whichever comes first.
+
+When the queue holds ``max_queue`` documents, ``put`` waits up to
+``put_timeout`` seconds for room and then drops the document, so a slow or
+unreachable database slows requests down by a bounded amount instead of
+growing memory without limit.
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from pymongo.errors import BulkWriteError
+except Exception:
+    BulkWriteError = None
+
+try:
+    from bson import ObjectId
+except Exception:
+    ObjectId = None
+
+DUPLICATE_KEY = 11000
+
+
+class WriteBehindQueue:
+    def __init__(
+        self,
+        max_batch: int = 200,
+        flush_interval: float = 1.0,
+        max_queue: int = 10000,
+        put_timeout: float = 0.05,
+        max_retries: int = 3,
+    ):
+        self.max_batch = max(1, int(max_batch))
+        self.flush_interval = float(flush_interval)
+        self.max_queue = max(1, int(max_queue))
+        self.put_timeout = float(put_timeout)
+        self.max_retries = max(0, int(max_retries))
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.enqueued = 0
+        self.written = 0
+        self.direct_writes = 0
+        self.dropped = 0
+        self.failed = 0
+        self.retries = 0
+        self.batches = 0
+        self.last_flush_ms = 0.0
+        self.last_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start the flusher on the running event loop (call from app startup)."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._closing = False
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def put(self, repo, doc: Dict[str, Any]) -> bool:
+        """
+        Queue ``doc`` for insertion through ``repo``.
+
+        Returns False if the document was dropped because the queue stayed
+        full for ``put_timeout`` seconds. When the flusher is not running
+        (no startup hook in scripts/tests, or after shutdown) the document is
+        written straight through instead.
+        """
+        if not self.running:
+            self.direct_writes += 1
+            await repo.insert_one(doc)
+            return True
+        try:
+            self._queue.put_nowait((repo, doc))
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self._queue.put((repo, doc)), self.put_timeout)
+            except asyncio.TimeoutError:
+                self.dropped += 1
+                return False
+        self.enqueued += 1
+        return True
+
+    async def _run(self) -> None:
+        while not (self._closing and self._queue.empty()):
+            try:
+                first = await asyncio.wait_for(self._queue.get(), self.flush_interval)
+            except asyncio.TimeoutError:
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or (self._closing and self._queue.empty()):
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[Any, Dict[str, Any]]]) -> None:
+        started = time.perf_counter()
+        groups: Dict[int, Tuple[Any, List[Dict[str, Any]]]] = {}
+        for repo, doc in batch:
+            groups.setdefault(id(repo), (repo, []))[1].append(doc)
+        for repo, docs in groups.values():
+            await self._insert(repo, docs)
+        self.batches += 1
+        self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    async def _insert(self, repo, docs: List[Dict[str, Any]]) -> None:
+        # Ids are fixed once per batch: if an attempt fails after the server
+        # applied some inserts (e.g. a network timeout), the retry hits
+        # duplicate keys for those instead of writing them twice
+        assigned = set()
+        if ObjectId is not None:
+            for index, doc in enumerate(docs):
+                if "_id" not in doc:
+                    doc["_id"] = ObjectId()
+                    assigned.add(index)
+        for attempt in range(self.max_retries + 1):
+            try:
+                await repo.insert_many(docs, ordered=False)
+                self.written += len(docs)
+                return
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                if BulkWriteError is not None and isinstance(e, BulkWriteError):
+                    # Unordered insert: everything except the reported errors landed.
+                    # Retrying would not help (typically duplicate _ids).
+                    errors = e.details.get("writeErrors", [])
+                    # On a retry, a duplicate of an id we assigned is a document an earlier attempt wrote
+                    landed = sum(err.get("code") == DUPLICATE_KEY and err.get("index") in assigned
+                                 for err in errors) if attempt else 0
+                    if landed and hasattr(repo, "record_inserts"):
+                        await repo.record_inserts(landed)
+                    self.written += len(docs) - len(errors) + landed
+                    self.failed += len(errors) - landed
+                    return
+                if attempt == self.max_retries:
+                    break
+                self.retries += 1
+                await asyncio.sleep(min(2.0, 0.1 * 2 ** attempt))
+        print(f"⚠️ Write-behind insert into {repo.name} failed, {len(docs)} documents lost: {self.last_error}")
+        self.failed += len(docs)
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """Flush what is queued and stop the flusher (call from app shutdown)."""
+        self._closing = True
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            lost = self._queue.qsize()
+            self.dropped += lost
+            print(f"⚠️ Write-behind queue not drained within {timeout}s, dropped {lost} documents")
+
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "depth": self.depth(),
+            "max_queue": self.max_queue,
+            "max_batch": self.max_batch,
+            "flush_interval_seconds": self.flush_interval,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "direct_writes": self.direct_writes,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "retries": self.retries,
+            "batches": self.batches,
+            "avg_batch_size": round(self.written / self.batches, 1) if self.batches else 0.0,
+            "last_flush_ms": self.last_flush_ms,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,82 @@
+"""
+Precompiled one-hot feature encoder for the crop yield model.
+
+Built once from the ``columns`` list saved next to the model by
+``train_yield_model.py`` and used instead of running ``pd.get_dummies`` on
+every request.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+NUMERIC_FEATURES = ("Area", "Annual_Rainfall", "Fertilizer", "Pesticide")
+CATEGORICAL_FEATURES = ("Crop", "Season", "State")
+
+
+class YieldFeatureEncoder:
+    """
+    Encode yield inputs straight into NumPy rows aligned with ``yield_columns``.
+
+    Categorical values are resolved to column offsets through dict lookups.
+    Values that were never seen in training (or the category dropped by
+    ``drop_first=True``) leave every one-hot column at 0, exactly like the
+    training-time encoding. Whitespace around category names is ignored, so
+    "Kharif" matches the padded "Kharif     " stored in the dataset.
+    """
+
+    def __init__(self, columns: List[str]):
+        self.columns = list(columns)
+        self.n_features = len(self.columns)
+        index = {col: i for i, col in enumerate(self.columns)}
+
+        self.numeric_offsets = [(name, index[name]) for name in NUMERIC_FEATURES if name in index]
+        self.category_offsets: Dict[str, Dict[str, int]] = {name: {} for name in CATEGORICAL_FEATURES}
+        numeric = set(NUMERIC_FEATURES)
+        for col, i in index.items():
+            if col in numeric:
+                continue
+            for name in CATEGORICAL_FEATURES:
+                prefix = name + "_"
+                if col.startswith(prefix):
+                    value = col[len(prefix):]
+                    lookup = self.category_offsets[name]
+                    lookup[value] = i
+                    lookup.setdefault(value.strip(), i)
+                    break
+
+        self._zero_row = np.zeros(self.n_features, dtype=np.float64)
+
+    def offset(self, feature: str, value: Any) -> Optional[int]:
+        """Return the column offset for a categorical value, or None if it has no column."""
+        lookup = self.category_offsets.get(feature)
+        if lookup is None or value is None:
+            return None
+        value = str(value)
+        i = lookup.get(value)
+        if i is None:
+            i = lookup.get(value.strip())
+        return i
+
+    def encode_into(self, data: Dict[str, Any], row: np.ndarray) -> np.ndarray:
+        """Write one input dict into a zeroed, preallocated row of length ``n_features``."""
+        for name, i in self.numeric_offsets:
+            row[i] = float(data[name])
+        for name in CATEGORICAL_FEATURES:
+            i = self.offset(name, data.get(name))
+            if i is not None:
+                row[i] = 1.0
+        return row
+
+    def encode(self, data: Dict[str, Any]) -> np.ndarray:
+        """Encode a single input dict into a ``(1, n_features)`` matrix."""
+        row = self._zero_row.copy()
+        return self.encode_into(data, row).reshape(1, -1)
+
+    def encode_many(self, rows: Iterable[Dict[str, Any]]) -> np.ndarray:
+        """Encode many input dicts into one ``(n_rows, n_features)`` matrix."""
+        rows = list(rows)
+        X = np.zeros((len(rows), self.n_features), dtype=np.float64)
+        for r, data in enumerate(rows):
+            self.encode_into(data, X[r])
+        return X
@@ -0,0 +1,375 @@
+"""
+Precomputed yield tables for crop recommendation.
+
+``recommend_crop`` scores the same fixed candidate crops for every request,
+and within a (state, season) pair the yield depends only on area, rainfall,
+fertilizer and pesticide. A ``CropYieldTable`` holds the model's yields
+for every candidate crop on a coarse grid over those four inputs, so a
+request becomes a multilinear interpolation instead of a forest
+evaluation.
+
+In crop_yield.csv, fertilizer and pesticide totals scale with area
+(95-194 kg/ha and 0.09-0.38 per ha). The grid therefore spans log(area),
+rainfall and the two per-hectare rates rather than the raw totals. A grid
+over the totals wastes points on impossible combinations and
+interpolates badly.
+
+Inputs outside the grid return None and the caller falls back to live
+inference. A random forest is piecewise constant, so interpolation can be
+well off near its splits: each table records its interpolation error
+against the model, and a store with ``max_p90_rel`` never serves a table
+whose 90th percentile relative error exceeds it (those pairs always use
+live inference). Tables are tied to a model version: ``YieldTableStore`` drops
+every table when the version changes and builds tables per (state,
+season) on demand. The CLI prebuilds all pairs offline:
+
+    python yield_table.py ../ml_model/yield_model.pkl
+"""
+
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from model_loader import predict_quietly
+
+# Candidate crops recommend_crop scores (backend.RECOMMENDATION_CROPS)
+CANDIDATE_CROPS = ["Rice", "Wheat", "Maize", "Cotton", "Sugarcane", "Mango", "Banana", "Apple", "Orange", "Grapes"]
+
+# Grid bounds from crop_yield.csv: area and rainfall at the 1st/99th
+# percentiles, fertilizer and pesticide rates at their observed range
+AREA_AXIS = np.geomspace(3.0, 3.3e6, 12)                 # hectares
+RAINFALL_AXIS = np.linspace(345.0, 4475.0, 6)           # mm
+FERTILIZER_RATE_AXIS = np.linspace(94.0, 194.0, 3)      # kg per hectare
+PESTICIDE_RATE_AXIS = np.linspace(0.09, 0.38, 3)        # kg per hectare
+GRID_SHAPE = (len(AREA_AXIS), len(RAINFALL_AXIS), len(FERTILIZER_RATE_AXIS), len(PESTICIDE_RATE_AXIS))
+
+# Interpolation happens in these coordinates (log area, everything else linear)
+_AXES = (np.log(AREA_AXIS), RAINFALL_AXIS, FERTILIZER_RATE_AXIS, PESTICIDE_RATE_AXIS)
+VALIDATION_POINTS = 16
+
+
+def table_key(state: str, season: str) -> Tuple[str, str]:
+    # The yield encoder ignores surrounding whitespace, so the table does too
+    return (str(state).strip(), str(season).strip())
+
+
+def grid_coordinates(area: float, rainfall: float, fertilizer: float, pesticide: float) -> Optional[np.ndarray]:
+    """Map request inputs to grid coordinates; None if any falls outside the grid."""
+    if area <= 0:
+        return None
+    point = np.array([np.log(area), rainfall, fertilizer / area, pesticide / area])
+    for value, axis in zip(point, _AXES):
+        if not axis[0] <= value <= axis[-1]:
+            return None
+    return point
+
+
+def _grid_rows(crops: Sequence[str], state: str, season: str) -> List[Dict[str, Any]]:
+    rows = []
+    for crop in crops:
+        for area, rainfall, fert_rate, pest_rate in itertools.product(
+            AREA_AXIS, RAINFALL_AXIS, FERTILIZER_RATE_AXIS, PESTICIDE_RATE_AXIS
+        ):
+            rows.append({
+                "Area": area, "Annual_Rainfall": rainfall,
+                "Fertilizer": area * fert_rate, "Pesticide": area * pest_rate,
+                "Crop": crop, "Season": season, "State": state,
+            })
+    return rows
+
+
+class CropYieldTable:
+    """Yields of every candidate crop on the grid for one (state, season)."""
+
+    def __init__(self, crops: Sequence[str], values: np.ndarray, error: Optional[Dict[str, float]] = None):
+        self.crops = list(crops)
+        self.values = np.asarray(values, dtype=np.float32).reshape((len(self.crops),) + GRID_SHAPE)
+        self.error = error or {}
+
+    @classmethod
+    def build(cls, model, encoder, crops: Sequence[str], state: str, season: str) -> "CropYieldTable":
+        """
+        Predict the whole grid in one model call and measure interpolation error.
+
+        Args:
+            model, encoder: The yield model and its YieldFeatureEncoder
+            crops: Candidate crops, in the order ``lookup`` reports them
+        """
+        values = predict_quietly(model, encoder.encode_many(_grid_rows(crops, state, season)))
+        table = cls(crops, values)
+
+        # Compare against live predictions at seeded random points between grid nodes
+        rng = np.random.default_rng(0)
+        points = np.column_stack([rng.uniform(axis[0], axis[-1], VALIDATION_POINTS) for axis in _AXES])
+        rows = [
+            {"Area": float(np.exp(p[0])), "Annual_Rainfall": p[1], "Fertilizer": float(np.exp(p[0])) * p[2],
+             "Pesticide": float(np.exp(p[0])) * p[3], "Crop": crop, "Season": season, "State": state}
+            for crop in crops for p in points
+        ]
+        live = np.asarray(predict_quietly(model, encoder.encode_many(rows)), dtype=np.float64).reshape(len(crops), -1)
+        estimated = np.array([table._interpolate(p) for p in points]).T
+        rel = np.abs(estimated - live) / np.maximum(np.abs(live), 1e-3)
+        table.error = {"median_rel": round(float(np.median(rel)), 4), "p90_rel": round(float(np.quantile(rel, 0.9)), 4)}
+        return table
+
+    def _interpolate(self, point: np.ndarray) -> np.ndarray:
+        """Multilinear interpolation of every crop at one in-grid point."""
+        lows, weights = [], []
+        for value, axis in zip(point, _AXES):
+            i = int(np.clip(np.searchsorted(axis, value, side="right") - 1, 0, len(axis) - 2))
+            lows.append(i)
+            weights.append((value - axis[i]) / (axis[i + 1] - axis[i]))
+        out = np.zeros(len(self.crops), dtype=np.float64)
+        for corner in itertools.product((0, 1), repeat=len(lows)):
+            w = 1.0
+            for bit, t in zip(corner, weights):
+                w *= t if bit else 1.0 - t
+            if w:
+                index = tuple(i + bit for i, bit in zip(lows, corner))
+                out += w * self.values[(slice(None),) + index]
+        return out
+
+    def lookup(self, area: float, rainfall: float, fertilizer: float, pesticide: float) -> Optional[Dict[str, Optional[float]]]:
+        """
+        Interpolated yield per crop (None where not positive, as live inference reports).
+
+        Returns None if the inputs fall outside the grid.
+        """
+        point = grid_coordinates(area, rainfall, fertilizer, pesticide)
+        if point is None:
+            return None
+        yields = self._interpolate(point)
+        return {crop: (float(y) if y > 0 else None) for crop, y in zip(self.crops, yields)}
+
+
+class YieldTableStore:
+    """
+    Tables for one model version, keyed by (state, season), LRU-bounded.
+
+    Args:
+        crops: Candidate crops every table covers
+        maxsize: Most (state, season) tables kept in memory
+        max_builds: Most tables built at once; further claims are refused
+        max_p90_rel: Tables with a larger p90 relative interpolation error are
+            neither stored nor rebuilt for this model version (None: keep all)
+    """
+
+    def __init__(self, crops: Sequence[str], maxsize: int = 256, max_builds: int = 2,
+                 max_p90_rel: Optional[float] = None):
+        self.crops = list(crops)
+        self.maxsize = max(1, int(maxsize))
+        self.max_builds = max(1, int(max_builds))
+        self.max_p90_rel = max_p90_rel
+        self.version: Optional[str] = None
+        self._tables: "OrderedDict[Hashable, CropYieldTable]" = OrderedDict()
+        self._building: set = set()
+        self._rejected: set = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.out_of_grid = 0
+        self.builds = 0
+        self.builds_deferred = 0
+        self.build_ms = 0.0
+        self.build_errors = 0
+
+    def _check_version(self, version: str) -> None:
+        # Called with the lock held
+        if version != self.version:
+            self._tables.clear()
+            self._rejected.clear()
+            self.version = version
+
+    def accurate(self, table: CropYieldTable) -> bool:
+        """True if ``table`` may be served under ``max_p90_rel``."""
+        if self.max_p90_rel is None:
+            return True
+        p90 = table.error.get("p90_rel")
+        return p90 is not None and p90 <= self.max_p90_rel
+
+    def lookup(self, version: str, state: str, season: str, area: float, rainfall: float,
+               fertilizer: float, pesticide: float) -> Optional[Dict[str, Optional[float]]]:
+        """Table yields for the request, or None (no table yet for this pair/version, or off-grid)."""
+        key = table_key(state, season)
+        with self._lock:
+            self._check_version(version)
+            table = self._tables.get(key)
+            if table is None:
+                self.misses += 1
+                return None
+            self._tables.move_to_end(key)
+        yields = table.lookup(area, rainfall, fertilizer, pesticide)
+        with self._lock:
+            if yields is None:
+                self.out_of_grid += 1
+            else:
+                self.hits += 1
+        return yields
+
+    def claim_build(self, version: str, state: str, season: str) -> bool:
+        """
+        True if the caller should build this pair: not present, nobody else is
+        building it and fewer than ``max_builds`` builds are running.
+        """
+        key = table_key(state, season)
+        with self._lock:
+            self._check_version(version)
+            if key in self._tables or key in self._rejected or (version, key) in self._building:
+                return False
+            if len(self._building) >= self.max_builds:
+                self.builds_deferred += 1  # a later miss claims it again
+                return False
+            self._building.add((version, key))
+            return True
+
+    def build(self, version: str, model, encoder, state: str, season: str) -> Optional[CropYieldTable]:
+        """Build and store one table (blocking; call off the event loop after ``claim_build``)."""
+        key = table_key(state, season)
+        started = time.perf_counter()
+        try:
+            table = CropYieldTable.build(model, encoder, self.crops, *key)
+        except Exception as e:
+            with self._lock:
+                self.build_errors += 1
+            print(f"⚠️ Failed to build yield table for {key}: {e}")
+            return None
+        finally:
+            with self._lock:
+                self._building.discard((version, key))
+        with self._lock:
+            self.builds += 1
+            self.build_ms += (time.perf_counter() - started) * 1000
+            if version != self.version:
+                pass  # the model was swapped meanwhile
+            elif self.accurate(table):
+                self._put(key, table)
+            else:
+                self._rejected.add(key)
+                print(f"⚠️ Yield table for {key} not served: p90 interpolation error "
+                      f"{table.error.get('p90_rel')} > {self.max_p90_rel}")
+        return table
+
+    def _put(self, key: Hashable, table: CropYieldTable) -> None:
+        self._tables[key] = table
+        self._tables.move_to_end(key)
+        while len(self._tables) > self.maxsize:
+            self._tables.popitem(last=False)
+
+    def save(self, path: str) -> str:
+        """Write all tables with the model version to an ``.npz`` file (atomically)."""
+        with self._lock:
+            keys = list(self._tables)
+            tables = [self._tables[k] for k in keys]
+        meta = {"version": self.version, "crops": self.crops, "keys": keys,
+                "errors": [t.error for t in tables]}
+        values = np.stack([t.values for t in tables]) if tables else np.zeros((0, len(self.crops)) + GRID_SHAPE)
+        tmp = f"{path}.tmp.npz"
+        np.savez_compressed(tmp, values=values.astype(np.float32), meta=np.array(json.dumps(meta)))
+        os.replace(tmp, path)
+        return path
+
+    def load(self, path: str, version: str) -> int:
+        """
+        Load prebuilt tables if they were built for ``version``.
+
+        Returns how many were loaded; tables failing ``max_p90_rel`` are skipped
+        and their pairs left to live inference.
+        """
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("version") != version or meta.get("crops") != self.crops:
+                return 0
+            values = data["values"]
+        with self._lock:
+            self._check_version(version)
+            loaded = 0
+            for key, table_values, error in zip(meta["keys"], values, meta["errors"]):
+                table = CropYieldTable(self.crops, table_values, error)
+                if self.accurate(table):
+                    self._put(tuple(key), table)
+                    loaded += 1
+                else:
+                    self._rejected.add(tuple(key))
+            return loaded
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses + self.out_of_grid
+            errors = [t.error for t in self._tables.values() if t.error]
+            return {
+                "version": self.version,
+                "tables": len(self._tables),
+                "rejected": len(self._rejected),
+                "max_p90_rel": self.max_p90_rel,
+                "maxsize": self.maxsize,
+                "building": len(self._building),
+                "max_builds": self.max_builds,
+                "grid_shape": list(GRID_SHAPE),
+                "hits": self.hits,
+                "misses": self.misses,
+                "out_of_grid": self.out_of_grid,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "builds": self.builds,
+                "builds_deferred": self.builds_deferred,
+                "build_errors": self.build_errors,
+                "avg_build_ms": round(self.build_ms / self.builds, 2) if self.builds else 0.0,
+                "median_rel_error": round(float(np.median([e["median_rel"] for e in errors])), 4) if errors else None,
+                "worst_p90_rel_error": max(e["p90_rel"] for e in errors) if errors else None,
+            }
+
+
+def table_path_for(model_path: str) -> str:
+    """``yield_model.pkl`` -> ``yield_model.tables.npz``"""
+    return os.path.splitext(model_path)[0] + ".tables.npz"
+
+
+def build_all(model_path: str, crops: Sequence[str], pairs: Optional[Sequence[Tuple[str, str]]] = None) -> str:
+    """
+    Offline job: build tables for every (state, season) the model knows and save them.
+
+    Args:
+        model_path: The yield model .pkl (the .trees export is used if present)
+        crops: Candidate crops (CANDIDATE_CROPS)
+        pairs: (state, season) pairs; default all one-hot states x seasons of the model
+    """
+    from flat_forest import load_model_bundle
+    from model_loader import file_version
+    from yield_encoder import YieldFeatureEncoder
+
+    bundle = load_model_bundle(model_path)
+    encoder = YieldFeatureEncoder(bundle["columns"])
+    version = bundle.get("version") or file_version(bundle.get("source", model_path))
+    if pairs is None:
+        states = sorted({s.strip() for s in encoder.category_offsets["State"]})
+        seasons = sorted({s.strip() for s in encoder.category_offsets["Season"]})
+        pairs = list(itertools.product(states, seasons))
+
+    store = YieldTableStore(crops, maxsize=len(pairs))
+    for state, season in pairs:
+        if store.claim_build(version, state, season):
+            store.build(version, bundle["model"], encoder, state, season)
+    stats = store.stats()
+    out = store.save(table_path_for(model_path))
+    print(f"✅ Built {stats['tables']} yield tables for model {version} -> {out} "
+          f"(interpolation error: median {stats['median_rel_error']}, p90 up to {stats['worst_p90_rel_error']})")
+    return out
+
+
+def main(argv: List[str]) -> int:
+    if not argv:
+        print(__doc__)
+        return 1
+    for model_path in argv:
+        build_all(model_path, CANDIDATE_CROPS)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,4 +1,5 @@
 import os
+import sys
 import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
@@ -6,10 +7,11 @@ from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import accuracy_score
 import joblib
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+from flat_forest import export_bundle, flat_path_for
+
 DATA_PATH = os.path.join(os.path.dirname(__file__), 'data_core.csv')
 MODEL_PATH = os.path.join(os.path.dirname(__file__), "fertilizer_model.pkl")
-cd fertilizer_project/backend
-uvicorn backend:app --host 0.0.0.0 --port 8000 --reload
 
 def train_and_save_model(data_path: str = DATA_PATH, model_path: str = MODEL_PATH) -> str:
     df = pd.read_csv(data_path)
@@ -30,6 +32,8 @@ def train_and_save_model(data_path: str = DATA_PATH, model_path: str = MODEL_PAT
 
     joblib.dump({"model": clf, "label_encoder": le}, model_path)
     print(f"Model saved to: {model_path}")
+    flat_path = export_bundle({"model": clf, "label_encoder": le}, flat_path_for(model_path), source=model_path)
+    print(f"Flat model exported to: {flat_path}")
     return model_path
 
 
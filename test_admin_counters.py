@@ -0,0 +1,80 @@
+"""Materialised admin dashboard counts: kept on write, reconciled against exact counts"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "fertilizer_project", "backend"))
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:1/?serverSelectionTimeoutMS=100")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+mongomock = pytest.importorskip("mongomock")
+
+import backend
+from fastapi.testclient import TestClient
+from repository import Repositories, Repository
+
+
+@pytest.fixture()
+def client():
+    db = mongomock.MongoClient()["agri_test"]
+    backend.repos = Repositories.from_sync_database(db)
+    backend.user_cache.put({"email": "admin@example.com", "name": "Admin", "role": "admin"})
+    headers = {"Authorization": f"Bearer {backend.create_access_token('admin@example.com')}"}
+    try:
+        yield TestClient(backend.app), db, headers
+    finally:
+        backend.repos = None
+
+
+def contact(http, n):
+    for i in range(n):
+        res = http.post("/api/contact", json={"name": "A", "mobile": "9999999999",
+                                              "email": f"a{i}@example.com", "message": "hi"})
+        assert res.json()["stored"] == "db"
+
+
+def test_counts_follow_writes_without_scanning(client, monkeypatch):
+    http, db, headers = client
+    db["users"].insert_many([{"email": f"old{i}@example.com", "name": "Old"} for i in range(3)])
+
+    # First load on an existing database counts once
+    first = http.get("/api/admin/stats", headers=headers).json()
+    assert first["total_farmers"] == 3 and first["reconciled_at"] is not None
+
+    async def no_scans(self, query=None):
+        raise AssertionError(f"count_documents on {self.name}")
+    monkeypatch.setattr(Repository, "count", no_scans)
+
+    contact(http, 2)
+    res = http.post("/api/auth/register", json={"name": "New", "email": "new@example.com", "password": "secret123",
+                                                 "state": "Telangana", "district": "Hyderabad"})
+    assert res.status_code == 200
+    stats = http.get("/api/admin/stats", headers=headers).json()
+    assert (stats["total_farmers"], stats["total_contacts"]) == (4, 2)
+    assert stats["updated_at"] >= stats["reconciled_at"]
+
+    farmer_id = str(db["users"].find_one({"email": "old0@example.com"})["_id"])
+    assert http.delete(f"/api/admin/farmers/{farmer_id}", headers=headers).status_code == 200
+    assert http.get("/api/admin/stats", headers=headers).json()["total_farmers"] == 3
+
+
+def test_reconcile_corrects_drift(client):
+    http, db, headers = client
+    contact(http, 1)
+    http.get("/api/admin/stats", headers=headers)
+
+    # Writes that bypass the repositories are invisible until the next reconcile
+    db["contacts"].insert_many([{"message": "bulk import"} for _ in range(4)])
+    assert http.get("/api/admin/stats", headers=headers).json()["total_contacts"] == 1
+    assert asyncio.run(backend.reconcile_admin_counts()) is None  # not due yet
+
+    counts = asyncio.run(backend.reconcile_admin_counts(force=True))
+    assert counts["contacts"] == 5
+    assert http.get("/api/admin/stats", headers=headers).json()["total_contacts"] == 5
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
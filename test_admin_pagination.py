@@ -0,0 +1,98 @@
+"""Keyset pagination of the admin listings: opaque cursors on (sort key, _id)"""
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "fertilizer_project", "backend"))
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:1/?serverSelectionTimeoutMS=100")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+mongomock = pytest.importorskip("mongomock")
+
+from bson import ObjectId
+
+import backend
+from fastapi.testclient import TestClient
+from pagination import CursorError, decode_cursor, encode_cursor, keyset_page
+from repository import Repositories
+
+START = datetime(2026, 1, 1)
+
+
+@pytest.fixture()
+def client():
+    db = mongomock.MongoClient()["agri_test"]
+    backend.repos = Repositories.from_sync_database(db)
+    backend.user_cache.put({"email": "admin@example.com", "name": "Admin", "role": "admin"})
+    headers = {"Authorization": f"Bearer {backend.create_access_token('admin@example.com')}"}
+    try:
+        yield TestClient(backend.app), db, headers
+    finally:
+        backend.repos = None
+
+
+def test_cursor_round_trip():
+    oid = ObjectId()
+    for value in (START, "2026-01-01", 3.5, None):
+        assert decode_cursor(encode_cursor(value, oid)) == (value, oid)
+    with pytest.raises(CursorError):
+        decode_cursor("not-a-cursor")
+
+
+@pytest.mark.parametrize("direction", [-1, 1])
+def test_pages_cover_ties_and_missing_keys_once(direction):
+    db = mongomock.MongoClient()["agri_test"]
+    # Three rows share each timestamp; the last four have no created_at at all
+    docs = [{"_id": ObjectId(), "created_at": START + timedelta(days=i // 3)} for i in range(11)]
+    docs += [{"_id": ObjectId()} for _ in range(4)]
+    db["soil_analysis"].insert_many(docs)
+    repo = Repositories.from_sync_database(db).soil_analysis
+
+    expected = [d["_id"] for d in db["soil_analysis"].find().sort([("created_at", direction), ("_id", direction)])]
+    seen, cursor = [], None
+    while True:
+        page, cursor = asyncio.run(keyset_page(repo, {}, "created_at", direction, limit=4, cursor=cursor))
+        seen += [d["_id"] for d in page]
+        if cursor is None:
+            break
+    assert seen == expected
+
+
+def test_admin_listings_follow_the_cursor(client):
+    http, db, headers = client
+    db["contacts"].insert_many([{"name": f"c{i}", "ts": START + timedelta(hours=i)} for i in range(7)])
+
+    first = http.get("/api/admin/contacts", params={"limit": 3}, headers=headers).json()
+    assert [c["name"] for c in first["contacts"]] == ["c6", "c5", "c4"]
+    assert first["total"] == 7 and first["total_exact"] and first["next_cursor"]
+
+    names, cursor = [], first["next_cursor"]
+    while cursor:
+        page = http.get("/api/admin/contacts", params={"limit": 3, "cursor": cursor, "include_total": False},
+                        headers=headers).json()
+        assert page["total"] is None
+        names += [c["name"] for c in page["contacts"]]
+        cursor = page["next_cursor"]
+    assert names == ["c3", "c2", "c1", "c0"]
+
+    # Old clients paging by offset still work
+    legacy = http.get("/api/admin/contacts", params={"skip": 5, "limit": 3}, headers=headers).json()
+    assert [c["name"] for c in legacy["contacts"]] == ["c1", "c0"] and legacy["next_cursor"] is None
+
+    assert http.get("/api/admin/contacts", params={"cursor": "garbage"}, headers=headers).status_code == 400
+
+
+def test_filtered_totals_are_capped(client, monkeypatch):
+    http, db, headers = client
+    db["soil_analysis"].insert_many([{"user_email": "f@example.com", "created_at": START} for _ in range(5)])
+    monkeypatch.setattr(backend, "ADMIN_TOTAL_COUNT_LIMIT", 3)
+    total = asyncio.run(backend._listing_total(backend.repos.soil_analysis, {"user_email": "f@example.com"}))
+    assert total == (3, False)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
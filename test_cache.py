@@ -0,0 +1,90 @@
+"""TTLCache: LRU eviction, TTL expiry, stale-while-revalidate, coalescing and counters"""
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "fertilizer_project", "backend"))
+
+from cache import TTLCache
+
+
+def test_lru_eviction_and_counters():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.get_or_load("a", lambda: 1)
+    cache.get_or_load("b", lambda: 2)
+    cache.get_or_load("a", lambda: 99)      # hit, "a" becomes most recent
+    cache.get_or_load("c", lambda: 3)       # evicts "b"
+
+    assert cache.lookup("b") is None
+    assert cache.lookup("a").value == 1
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 3, 1)
+
+
+def test_ttl_expiry_and_uncacheable_values():
+    cache = TTLCache(maxsize=8, ttl=0.05, should_cache=lambda v: not v.get("error"))
+    cache.get_or_load("k", lambda: {"error": "down"})
+    assert cache.lookup("k") is None
+
+    cache.get_or_load("k", lambda: {"v": 1})
+    time.sleep(0.08)
+    assert cache.get_or_load("k", lambda: {"v": 2}).value == {"v": 2}
+
+
+def test_stale_while_revalidate_does_not_block():
+    release = threading.Event()
+    calls = []
+
+    def slow_loader():
+        calls.append(1)
+        release.wait(2)
+        return "fresh"
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        cache = TTLCache(maxsize=8, ttl=0.05, stale_ttl=60, executor=pool)
+        cache.put("k", "old")
+        time.sleep(0.08)
+
+        start = time.perf_counter()
+        assert cache.get_or_load("k", slow_loader).value == "old"
+        assert cache.get_or_load("k", slow_loader).value == "old"
+        assert time.perf_counter() - start < 0.5
+
+        release.set()
+        time.sleep(0.1)
+        assert cache.lookup("k").value == "fresh"
+        assert len(calls) == 1
+        assert cache.stats()["stale_hits"] == 2
+
+
+def test_concurrent_misses_share_one_load():
+    calls = []
+    gate = threading.Barrier(100)
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"temperature": 30}
+
+    def worker(_):
+        gate.wait()
+        return cache.get_or_load("hyderabad", loader)
+
+    cache = TTLCache(maxsize=8, ttl=60)
+    with ThreadPoolExecutor(max_workers=100) as pool:
+        entries = list(pool.map(worker, range(100)))
+
+    assert len(calls) == 1
+    assert all(e.value == {"temperature": 30} for e in entries)
+    assert all(e is entries[0] for e in entries)
+
+
+if __name__ == "__main__":
+    test_lru_eviction_and_counters()
+    test_ttl_expiry_and_uncacheable_values()
+    test_stale_while_revalidate_does_not_block()
+    test_concurrent_misses_share_one_load()
+    print("✅ Cache tests OK")
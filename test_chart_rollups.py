@@ -0,0 +1,104 @@
+"""Admin charts read daily rollups that only fold in documents past a watermark"""
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "fertilizer_project", "backend"))
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:1/?serverSelectionTimeoutMS=100")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+mongomock = pytest.importorskip("mongomock")
+
+import backend
+from fastapi.testclient import TestClient
+from repository import Repositories, Repository
+from rollups import advance_rollups
+
+SOON = timedelta(minutes=1)
+
+
+@pytest.fixture()
+def client():
+    db = mongomock.MongoClient()["agri_test"]
+    backend.repos = Repositories.from_sync_database(db)
+    backend.user_cache.put({"email": "admin@example.com", "name": "Admin", "role": "admin"})
+    headers = {"Authorization": f"Bearer {backend.create_access_token('admin@example.com')}"}
+    try:
+        yield TestClient(backend.app), db, headers
+    finally:
+        backend.repos = None
+
+
+def recommendation(crop, fertilizer, ts):
+    return {"ts": ts, "input": {"crop_type": crop}, "output": {"name": fertilizer}}
+
+
+def chart(http, headers, name):
+    res = http.get(f"/api/admin/charts/{name}", headers=headers).json()
+    return dict(zip(res["labels"], res["data"]))
+
+
+def test_charts_fold_in_new_documents_only(client, monkeypatch):
+    http, db, headers = client
+    now = datetime.utcnow()
+    today, yesterday = now.strftime("%Y-%m-%d"), (now - timedelta(days=1)).strftime("%Y-%m-%d")
+    db["recommendations"].insert_many([recommendation("Rice", "Urea", now), recommendation("Wheat", "DAP", now)])
+    db["yield_predictions"].insert_many([
+        {"Crop": "Rice", "predicted_yield": 2.0, "created_at": now - timedelta(days=1)},
+        {"Crop": "Rice", "predicted_yield": 4.0, "created_at": now},
+        {"Crop": "Maize", "predicted_yield": 3.0, "created_at": now},
+        {"Crop": "Maize", "predicted_yield": None, "created_at": now},
+    ])
+
+    # Documents inside the lag window are left for a later run
+    assert asyncio.run(backend.refresh_chart_rollups()) == {"recommendations": 0, "yield_predictions": 0}
+    assert asyncio.run(backend.refresh_chart_rollups(upto=now + SOON)) == {"recommendations": 2, "yield_predictions": 4}
+
+    async def no_aggregates(self, pipeline):
+        raise AssertionError(f"aggregate on {self.name}")
+    monkeypatch.setattr(Repository, "aggregate", no_aggregates)
+
+    assert chart(http, headers, "fertilizer-distribution") == {"Urea": 1, "DAP": 1}
+    assert chart(http, headers, "crop-popularity") == {"Rice": 3, "Maize": 2, "Wheat": 1}
+    assert chart(http, headers, "yield-trend") == {yesterday: 2.0, today: 3.5}
+
+    # A second run only reads what was written since the watermark
+    db["recommendations"].insert_one(recommendation("Rice", "Urea", now))
+    assert asyncio.run(backend.refresh_chart_rollups(upto=now + SOON)) == {"recommendations": 1, "yield_predictions": 0}
+    assert chart(http, headers, "fertilizer-distribution") == {"Urea": 2, "DAP": 1}
+    assert chart(http, headers, "crop-popularity")["Rice"] == 4
+
+
+def test_batches_are_claimed_once(client):
+    http, db, headers = client
+    now = datetime.utcnow()
+    db["recommendations"].insert_many([recommendation("Rice", "Urea", now) for _ in range(7)])
+
+    async def two_workers():
+        return await asyncio.gather(*(advance_rollups(backend.repos, now + SOON, batch_size=2) for _ in range(2)))
+    runs = asyncio.run(two_workers())
+    assert sum(run["recommendations"] for run in runs) == 7
+    assert asyncio.run(backend.refresh_chart_rollups(upto=now + SOON))["recommendations"] == 0
+    assert chart(http, headers, "fertilizer-distribution") == {"Urea": 7}
+
+
+def test_rebuild_sees_deletes(client, monkeypatch):
+    http, db, headers = client
+    now = datetime.utcnow()
+    db["recommendations"].insert_many([recommendation("Rice", "Urea", now), recommendation("Rice", "DAP", now)])
+    asyncio.run(backend.refresh_chart_rollups(upto=now + SOON))
+    db["recommendations"].delete_many({"output.name": "DAP"})
+    assert chart(http, headers, "fertilizer-distribution") == {"Urea": 1, "DAP": 1}
+
+    monkeypatch.setattr(backend, "CHART_ROLLUP_LAG_SECONDS", -60)
+    res = http.post("/api/admin/charts/rebuild", headers=headers).json()
+    assert res["processed"]["recommendations"] == 1
+    assert chart(http, headers, "fertilizer-distribution") == {"Urea": 1}
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
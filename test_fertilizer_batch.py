@@ -0,0 +1,124 @@
+"""Batch fertilizer recommendation: parity with the one-row path and throughput"""
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "fertilizer_project", "backend"))
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:1/?serverSelectionTimeoutMS=100")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder
+
+import backend
+from fertilizer_encoder import DEFAULT_ORDER, FertilizerFeatureEncoder
+from model_loader import ModelSlot
+
+FERTILIZERS = ["Urea", "DAP", "14-35-14", "28-28", "17-17-17", "20-20", "10-26-26"]
+
+
+def random_rows(n, seed=0):
+    rng = random.Random(seed)
+    return [{
+        "N": rng.uniform(0, 140), "P": rng.uniform(0, 90), "K": rng.uniform(0, 60),
+        "pH": rng.uniform(4.5, 8.5), "moisture": rng.uniform(10, 70), "temperature": rng.uniform(15, 40),
+        "crop_type": rng.choice(backend.CROP_TYPES + ["Unknown"]),
+        "soil_type": rng.choice(backend.SOIL_TYPES + ["Unknown"]),
+    } for _ in range(n)]
+
+
+def legacy_predict(model, encoder, row):
+    """The original per-request path: list.index codes and a one-row DataFrame."""
+    def code(value, choices):
+        return choices.index(value) if value in choices else 0
+    features = dict(row, humidity=0.0, soil_type=code(row["soil_type"], backend.SOIL_TYPES),
+                    crop_type=code(row["crop_type"], backend.CROP_TYPES))
+    cols = [str(c) for c in model.feature_names_in_]
+    pred = model.predict(pd.DataFrame([{c: features.get(c, 0) for c in cols}]))[0]
+    return str(encoder.inverse_transform([int(pred)])[0])
+
+
+@pytest.fixture()
+def fertilizer_model(monkeypatch):
+    rows = random_rows(600, seed=1)
+    encoder = LabelEncoder().fit(FERTILIZERS)
+    labels = encoder.transform([FERTILIZERS[int(r["N"] + r["P"]) % len(FERTILIZERS)] for r in rows])
+    X = FertilizerFeatureEncoder(DEFAULT_ORDER, backend.SOIL_TYPES, backend.CROP_TYPES).encode_many(rows)
+    # Fitted on a DataFrame like model_train.py, so the model records feature_names_in_
+    model = RandomForestClassifier(n_estimators=50, random_state=0).fit(pd.DataFrame(X, columns=DEFAULT_ORDER), labels)
+
+    bundle = {"model": model, "label_encoder": encoder, "version": "synthetic"}
+    slot = ModelSlot("fertilizer", "synthetic.pkl", lambda path: bundle, backend._prepare_fertilizer_model)
+    slot.ensure()
+    monkeypatch.setattr(backend, "fertilizer_slot", slot)
+    return model, encoder
+
+
+def test_batch_matches_one_row_path(fertilizer_model):
+    model, encoder = fertilizer_model
+    rows = random_rows(200, seed=2)
+    expected = [legacy_predict(model, encoder, r) for r in rows]
+    assert backend.predict_fertilizers(rows) == expected
+    assert backend.predict_fertilizer(backend.RecommendReq(**rows[0])) == expected[0]
+
+
+def test_batch_is_an_order_of_magnitude_faster(fertilizer_model):
+    rows = random_rows(300, seed=3)
+    reqs = [backend.RecommendReq(**r) for r in rows]
+
+    start = time.perf_counter()
+    looped = [backend.predict_fertilizer(r) for r in reqs]
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = backend.predict_fertilizers(rows)
+    batch_time = time.perf_counter() - start
+
+    assert batched == looped
+    assert loop_time / batch_time >= 10
+
+
+def test_single_row_encoding_builds_no_dataframe(fertilizer_model):
+    model, _ = fertilizer_model
+    encoder = FertilizerFeatureEncoder.for_model(model, backend.SOIL_TYPES, backend.CROP_TYPES)
+    row = random_rows(1, seed=5)[0]
+    X = encoder.encode_many([row])
+    assert isinstance(X, np.ndarray) and X.shape == (1, len(model.feature_names_in_))
+
+    n = 2000
+    start = time.perf_counter()
+    for _ in range(n):
+        encoder.encode_many([row])
+    encode_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(n):
+        pd.DataFrame(encoder.encode_many([row]), columns=encoder.columns)
+    frame_time = time.perf_counter() - start
+
+    print(f"encode_many, one row: {encode_time / n * 1e6:.1f} us (with a DataFrame: {frame_time / n * 1e6:.1f} us)")
+    assert frame_time / encode_time >= 3
+
+
+def test_batch_endpoint(fertilizer_model):
+    from fastapi.testclient import TestClient
+    client = TestClient(backend.app)
+    token = backend.create_access_token("batch@example.com")
+    backend.user_cache.put({"email": "batch@example.com", "name": "Batch", "role": "farmer"})
+
+    rows = random_rows(25, seed=4)
+    res = client.post("/api/recommend/batch", json=rows, headers={"Authorization": f"Bearer {token}"})
+    assert res.status_code == 200, res.text
+    body = res.json()
+    assert body["count"] == 25 and body["model_version"] == "synthetic"
+    assert [r["fertilizer"] for r in body["recommendations"]] == backend.predict_fertilizers(rows)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
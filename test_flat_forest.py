@@ -0,0 +1,110 @@
+"""Flat memory-mapped forest: prediction parity with sklearn and read-only loading"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "fertilizer_project", "backend"))
+
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.preprocessing import LabelEncoder
+
+from flat_forest import FlatForest, export_bundle, export_forest, flat_path_for, load_model_bundle
+
+YIELD_PKL = os.path.join(ROOT, "fertilizer_project", "ml_model", "yield_model.pkl")
+
+
+def make_data(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(0, 100, size=(n, 6))
+    return X, rng
+
+
+def test_regressor_parity(tmp_path):
+    X, rng = make_data()
+    y = X[:, 0] * 2 + np.sin(X[:, 1]) + rng.normal(size=len(X))
+    model = RandomForestRegressor(n_estimators=30, random_state=0).fit(X, y)
+    forest = FlatForest.load(export_forest(model, str(tmp_path / "reg.trees")))
+
+    X_test, _ = make_data(300, seed=1)
+    assert forest.n_trees == 30
+    np.testing.assert_allclose(forest.predict(X_test), model.predict(X_test), rtol=0, atol=1e-9)
+    np.testing.assert_allclose(forest.predict(X_test[0]), model.predict(X_test[:1]), atol=1e-9)
+
+
+def test_classifier_bundle_parity(tmp_path):
+    X, _ = make_data()
+    names = np.array(["Urea", "DAP", "28-28", "17-17-17"])
+    encoder = LabelEncoder().fit(names)
+    y = encoder.transform(names[(X[:, 0] + X[:, 2]).astype(int) % len(names)])
+    model = RandomForestClassifier(n_estimators=25, random_state=0).fit(X, y)
+
+    pkl = str(tmp_path / "fert.pkl")
+    export_bundle({"model": model, "label_encoder": encoder}, flat_path_for(pkl))
+    bundle = load_model_bundle(pkl)
+    assert bundle["format"] == "flat"
+
+    X_test, _ = make_data(200, seed=2)
+    forest = bundle["model"]
+    np.testing.assert_allclose(forest.predict_proba(X_test), model.predict_proba(X_test), atol=1e-12)
+    assert forest.predict(X_test).tolist() == model.predict(X_test).tolist()
+    decoded = bundle["label_encoder"].inverse_transform(forest.predict(X_test))
+    assert decoded.tolist() == encoder.inverse_transform(model.predict(X_test)).tolist()
+
+
+def test_mapping_is_read_only_and_pickle_fallback(tmp_path):
+    X, _ = make_data(100)
+    model = RandomForestRegressor(n_estimators=3, random_state=0).fit(X, X[:, 0])
+    joblib = pytest.importorskip("joblib")
+    pkl = str(tmp_path / "m.pkl")
+    joblib.dump({"model": model, "columns": list("abcdef")}, pkl)
+
+    # No .trees file yet: the pickle is loaded as before
+    assert load_model_bundle(pkl)["model"].__class__ is RandomForestRegressor
+
+    export_bundle(joblib.load(pkl), flat_path_for(pkl), source=pkl)
+    bundle = load_model_bundle(pkl)
+    assert bundle["columns"] == list("abcdef")
+    with pytest.raises(ValueError):
+        bundle["model"]._threshold[0] = 0.0
+    assert load_model_bundle(pkl, prefer_flat=False)["model"].__class__ is RandomForestRegressor
+
+
+def test_trained_fertilizer_export_loads_without_unpickling(tmp_path, monkeypatch):
+    joblib = pytest.importorskip("joblib")
+    sys.path.insert(0, os.path.join(ROOT, "fertilizer_project", "ml_model"))
+    from model_train import train_and_save_model
+
+    X, rng = make_data(60)
+    labels = np.array(["Urea", "DAP", "MOP"])[(X[:, 0] // 34).astype(int)]
+    csv = tmp_path / "data.csv"
+    csv.write_text("N,P,K,pH,moisture,label\n" +
+                   "".join(",".join(f"{v:.2f}" for v in row[:5]) + f",{label}\n" for row, label in zip(X, labels)))
+    pkl = train_and_save_model(str(csv), str(tmp_path / "fertilizer_model.pkl"))
+
+    def no_unpickling(path, *args, **kwargs):
+        raise AssertionError(f"unpickled {path}")
+
+    monkeypatch.setattr(joblib, "load", no_unpickling)
+    bundle = load_model_bundle(pkl)
+    assert bundle["format"] == "flat"
+    assert bundle["model"].header["source_sha256"]
+
+
+@pytest.mark.skipif(not os.path.exists(YIELD_PKL), reason="yield model not trained")
+def test_yield_model_parity(tmp_path):
+    import joblib
+    bundle = joblib.load(YIELD_PKL)
+    model = bundle["model"]
+    forest = FlatForest.load(export_bundle(bundle, str(tmp_path / "yield.trees")))
+
+    rng = np.random.default_rng(3)
+    X = rng.uniform(0, 1, size=(200, model.n_features_in_))
+    X[:, :3] *= [2020, 1e6, 1e7]
+    np.testing.assert_allclose(forest.predict(X), model.predict(X), rtol=1e-9, atol=1e-9)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,102 @@
+"""Index registry: every registered query shape has an index, the migration is idempotent"""
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "fertilizer_project", "backend"))
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:1/?serverSelectionTimeoutMS=100")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+mongomock = pytest.importorskip("mongomock")
+
+from indexes import INDEXES, QUERIES, QueryShape, _failure, covering_indexes, ensure_indexes, plan_stages
+
+
+@pytest.mark.parametrize("shape", QUERIES, ids=[q.name for q in QUERIES])
+def test_every_query_shape_has_an_index(shape):
+    assert covering_indexes(shape) is not None
+
+
+def test_unindexed_shapes_are_detected():
+    assert covering_indexes(QueryShape("by name", "users", {"name": "Ravi"})) is None
+    # Sorting on a field that is never indexed (the old recommendations created_at sort)
+    assert covering_indexes(QueryShape("old sort", "recommendations", {}, [("created_at", -1)])) is None
+    # The sort key is indexed, but not behind the equality field
+    assert covering_indexes(QueryShape("by soil", "recommendations", {"input.soil_type": "Loamy"}, [("ts", -1)])) is None
+
+
+def test_plan_stages_find_collscans():
+    classic = {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}
+    sbe = {"queryPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}}
+    merged = {"stage": "SORT_MERGE", "inputStages": [{"stage": "IXSCAN"}, {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}]}
+    assert "COLLSCAN" in plan_stages(classic)
+    assert plan_stages(sbe) == ["FETCH", "IXSCAN"]
+    assert "COLLSCAN" not in plan_stages(merged)
+
+
+def test_migration_is_idempotent():
+    db = mongomock.MongoClient()["agri_test"]
+    first = ensure_indexes(db)
+    assert {r["status"] for r in first} == {"created"} and len(first) == len(INDEXES)
+    assert {r["status"] for r in ensure_indexes(db)} == {"exists"}
+
+
+def test_startup_reports_real_index_failures():
+    import backend
+    from pymongo.errors import OperationFailure
+    from repository import Repositories
+
+    spec = INDEXES[0]
+    assert _failure(spec, OperationFailure("exists", code=68))["status"] == "exists"
+    assert _failure(spec, OperationFailure("options differ", code=85))["status"] == "conflict"
+    assert _failure(spec, OperationFailure("E11000 duplicate key", code=11000))["status"] == "failed"
+
+    # Duplicate emails block the unique index registration depends on
+    db = mongomock.MongoClient()["agri_test"]
+    db["users"].insert_many([{"email": "dup@example.com"}, {"email": "dup@example.com"}])
+    asyncio.run(backend._create_indexes(Repositories.from_sync_database(db)))
+    try:
+        assert [(f["collection"], f["status"]) for f in backend.index_failures] == [("users", "failed")]
+        assert backend.readiness()["database"]["index_failures"] == ["users [('email', 1)]: failed"]
+        # The other indexes were still created
+        assert [("created_at", -1), ("_id", -1)] in [info["key"] for info in db["users"].index_information().values()]
+    finally:
+        backend.index_failures = []
+
+
+def test_admin_recommendations_use_the_written_fields():
+    import backend
+    from fastapi.testclient import TestClient
+    from repository import Repositories
+
+    db = mongomock.MongoClient()["agri_test"]
+    start = datetime(2026, 1, 1)
+    db["recommendations"].insert_many([
+        {"ts": start + timedelta(hours=i), "user_email": "f@example.com",
+         "input": {"crop_type": crop, "soil_type": "Loamy"}, "output": {"name": fertilizer}}
+        for i, (crop, fertilizer) in enumerate([("Rice", "Urea"), ("Wheat", "DAP"), ("Rice", "Urea")])
+    ])
+    backend.repos = Repositories.from_sync_database(db)
+    backend.user_cache.put({"email": "admin@example.com", "name": "Admin", "role": "admin"})
+    headers = {"Authorization": f"Bearer {backend.create_access_token('admin@example.com')}"}
+    try:
+        client = TestClient(backend.app)
+        recs = client.get("/api/admin/recommendations", headers=headers).json()["recommendations"]
+        assert [(r["crop"], r["fertilizer"]) for r in recs] == [("Rice", "Urea"), ("Wheat", "DAP"), ("Rice", "Urea")]
+        assert recs[0]["date"] == (start + timedelta(hours=2)).isoformat()
+
+        asyncio.run(backend.refresh_chart_rollups(upto=datetime.utcnow() + timedelta(minutes=1)))
+        chart = client.get("/api/admin/charts/fertilizer-distribution", headers=headers).json()
+        assert dict(zip(chart["labels"], chart["data"])) == {"Urea": 2, "DAP": 1}
+        crops = client.get("/api/admin/charts/crop-popularity", headers=headers).json()
+        assert dict(zip(crops["labels"], crops["data"])) == {"Rice": 2, "Wheat": 1}
+    finally:
+        backend.repos = None
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
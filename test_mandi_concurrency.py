@@ -0,0 +1,80 @@
+"""Concurrent mandi price fetching against a local stub data.gov.in server"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "fertilizer_project", "backend"))
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:1/?serverSelectionTimeoutMS=100")
+
+# Per-commodity latency injected by the stub (seconds)
+LATENCY = {"Rice": 0.3, "Wheat": 0.3, "Maize": 0.3, "Cotton": 2.0}
+HITS = Counter()
+HITS_LOCK = threading.Lock()
+
+
+class StubMandiHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        qs = parse_qs(urlparse(self.path).query)
+        commodity = qs.get("filters[commodity]", [""])[0]
+        with HITS_LOCK:
+            HITS[commodity] += 1
+        time.sleep(LATENCY.get(commodity, 0.1))
+        body = json.dumps({"records": [{"commodity": commodity, "modal_price": "1000"}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def backend():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubMandiHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    import backend as mod
+    saved = mod.MANDI_API_KEY, mod.MANDI_API_URL
+    mod.MANDI_API_KEY = "stub-key"
+    mod.MANDI_API_URL = f"http://127.0.0.1:{server.server_address[1]}/resource"
+    yield mod
+    # Later tests start the app, whose snapshot scheduler would page this stub
+    mod.MANDI_API_KEY, mod.MANDI_API_URL = saved
+    server.shutdown()
+
+
+def test_prices_fetched_concurrently_with_deadline(backend):
+    HITS.clear()
+    crops = ["Rice", "Wheat", "Maize", "Cotton"]
+    start = time.perf_counter()
+    prices = backend.get_crop_market_prices(crops, "Punjab", deadline=1.0)
+    elapsed = time.perf_counter() - start
+
+    # Three 0.3 s lookups ran in parallel; the 2 s one was cut off at the deadline
+    assert elapsed < 1.5
+    assert prices["Rice"] == prices["Wheat"] == prices["Maize"] == 1000.0
+    assert prices["Cotton"] == backend.FALLBACK_PRICES["Cotton"]
+
+
+def test_identical_lookups_share_one_upstream_call(backend):
+    HITS.clear()
+    crops = ["Rice", "Wheat", "Maize"]
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        results = list(ex.map(lambda _: backend.get_crop_market_prices(crops, "Kerala", deadline=5.0), range(8)))
+
+    assert all(r == results[0] for r in results)
+    assert HITS == Counter({"Rice": 1, "Wheat": 1, "Maize": 1})
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
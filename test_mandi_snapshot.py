@@ -0,0 +1,205 @@
+"""Mandi price snapshot: paged background pull into mandi_prices and endpoints served from it"""
+import asyncio
+import json
+import os
+import sys
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "fertilizer_project", "backend"))
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:1/?serverSelectionTimeoutMS=100")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from mandi_snapshot import MandiSnapshot, fetch_all_pages, normalize_record
+
+
+def make_records(commodity, state, count, day="17/10/2026"):
+    return [
+        {"state": state, "district": f"District {i % 3}", "market": f"Market {i}", "commodity": commodity,
+         "variety": "Other", "grade": "FAQ", "arrival_date": day,
+         "min_price": str(1000 + i), "max_price": str(1200 + i), "modal_price": str(1100 + i)}
+        for i in range(count)
+    ]
+
+
+# (commodity, state) -> records the stub serves; missing pairs return HTTP 500
+UPSTREAM = {}
+CALLS = Counter()
+CALLS_LOCK = threading.Lock()
+
+
+class StubMandiHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        qs = parse_qs(urlparse(self.path).query)
+        pair = (qs.get("filters[commodity]", [""])[0], qs.get("filters[state]", [""])[0])
+        with CALLS_LOCK:
+            CALLS[pair] += 1
+        if pair not in UPSTREAM:
+            self.send_response(500)
+            self.end_headers()
+            return
+        offset, limit = int(qs["offset"][0]), int(qs["limit"][0])
+        body = json.dumps({"records": UPSTREAM[pair][offset:offset + limit]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def backend(monkeypatch):
+    import mongomock
+    import backend as mod
+    from repository import Repositories
+
+    # PyMongo >= 4.11 passes sort= to bulk replaces, which mongomock does not accept yet
+    add_replace = mongomock.collection.BulkOperationBuilder.add_replace
+    monkeypatch.setattr(mongomock.collection.BulkOperationBuilder, "add_replace",
+                        lambda self, selector, doc, upsert, sort=None, **kwargs: add_replace(self, selector, doc, upsert, **kwargs))
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubMandiHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(mod, "MANDI_API_KEY", "stub-key")
+    monkeypatch.setattr(mod, "MANDI_API_URL", f"http://127.0.0.1:{server.server_address[1]}/resource")
+    monkeypatch.setattr(mod, "MANDI_SNAPSHOT_COMMODITIES", ["Rice", "Wheat"])
+    monkeypatch.setattr(mod, "MANDI_SNAPSHOT_STATES", ["Punjab", "Kerala"])
+    monkeypatch.setattr(mod, "MANDI_SNAPSHOT_PAGE_SIZE", 10)
+    monkeypatch.setattr(mod, "mandi_snapshot", MandiSnapshot())
+    monkeypatch.setattr(mod, "_mandi_snapshot_lock", asyncio.Lock())
+    mod.mandi_cache.clear()
+    UPSTREAM.clear()
+    UPSTREAM.update({
+        ("Rice", "Punjab"): make_records("Rice", "Punjab", 25),
+        ("Rice", "Kerala"): make_records("Rice", "Kerala", 3),
+        ("Wheat", "Punjab"): make_records("Wheat", "Punjab", 10),
+        ("Wheat", "Kerala"): [],
+    })
+    CALLS.clear()
+    mod.repos = Repositories.from_sync_database(mongomock.MongoClient()["agri_test"])
+    try:
+        asyncio.run(mod._create_indexes(mod.repos))
+        yield mod
+    finally:
+        mod.repos = None
+        mod.mandi_cache.clear()
+        server.shutdown()
+
+
+def test_normalize_and_paging():
+    doc = normalize_record({"commodity": " Rice ", "state": "Punjab", "district": "Ludhiana", "market": "Khanna",
+                            "arrival_date": "17/10/2026", "modal_price": "2450"}, fetched_at=None)
+    again = normalize_record({"commodity": "rice", "state": "PUNJAB", "district": "Ludhiana", "market": "Khanna",
+                              "arrival_date": "17/10/2026", "modal_price": "2500"}, fetched_at=None)
+    assert doc["_id"] == again["_id"] and doc["modal_price"] == 2450.0
+    assert doc["arrival_date"].day == 17 and doc["commodity_key"] == "rice"
+    assert normalize_record({"commodity": "Rice"}, fetched_at=None) is None
+
+    pages = []
+
+    def fetch_page(commodity, state, limit, offset):
+        pages.append(offset)
+        return {"records": list(range(25))[offset:offset + limit]}
+
+    records, error = fetch_all_pages(fetch_page, "Rice", "Punjab", page_size=10)
+    assert (len(records), error, pages) == (25, None, [0, 10, 20])
+
+
+def test_refresh_stores_pages_and_serves_locally(backend):
+    summary = asyncio.run(backend.refresh_mandi_snapshot())
+    assert summary["pulled"] and summary["records"] == 38 and summary["failed_pairs"] == 0
+    # 25 records at 10 per page: three calls; a full page of 10 needs a second, empty one
+    assert CALLS[("Rice", "Punjab")] == 3 and CALLS[("Wheat", "Punjab")] == 2
+    assert asyncio.run(backend.repos.mandi_prices.count()) == 38
+
+    CALLS.clear()
+    result = backend.fetch_mandi_prices(commodity="rice", state="Punjab", district="district 1", limit=50)
+    assert result["served_from"] == "snapshot" and result["data_age_seconds"] >= 0
+    assert result["records_found"] == 8 and {r["district"] for r in result["records"]} == {"District 1"}
+
+    from fastapi.testclient import TestClient
+    client = TestClient(backend.app)
+    by_state = client.get("/api/market-prices/Punjab", params={"commodity": "Wheat"}).json()
+    assert by_state["served_from"] == "snapshot" and by_state["records_found"] == 10
+    best = client.get("/api/market/best-price/Rice").json()
+    assert best["best_market"]["modal_price"] == 1124.0 and best["data_age_seconds"] is not None
+    assert backend.get_crop_market_price("Rice", "Kerala") == 1101.0
+    assert sum(CALLS.values()) == 0
+
+    # Anything outside the snapshot still goes upstream
+    UPSTREAM[("Maize", "Punjab")] = make_records("Maize", "Punjab", 2)
+    assert backend.fetch_mandi_prices(commodity="Maize", state="Punjab")["served_from"] == "live"
+
+
+def test_fresh_snapshot_is_reused_and_failed_pairs_keep_records(backend):
+    asyncio.run(backend.refresh_mandi_snapshot())
+    CALLS.clear()
+
+    # Another worker (or the next tick) finds fresh data and only reloads it
+    backend.mandi_snapshot = MandiSnapshot()
+    summary = asyncio.run(backend.refresh_mandi_snapshot())
+    assert not summary["pulled"] and summary["records"] == 38 and sum(CALLS.values()) == 0
+
+    # Forced pull: Rice/Punjab shrank, Rice/Kerala errors and keeps its old rows
+    UPSTREAM[("Rice", "Punjab")] = make_records("Rice", "Punjab", 5, day="18/10/2026")
+    del UPSTREAM[("Rice", "Kerala")]
+    summary = asyncio.run(backend.refresh_mandi_snapshot(force=True))
+    assert summary["failed_pairs"] == 1 and summary["records"] == 5 + 3 + 10
+    punjab = backend.fetch_mandi_prices(commodity="Rice", state="Punjab")
+    assert {r["arrival_date"] for r in punjab["records"]} == {"18/10/2026"}
+    assert backend.fetch_mandi_prices(commodity="Rice", state="Kerala")["records_found"] == 3
+
+
+def test_failed_empty_or_stale_pairs_are_not_covered(backend):
+    from datetime import datetime, timedelta
+
+    asyncio.run(backend.refresh_mandi_snapshot())
+    # Wheat/Kerala pulled fine but returned nothing
+    assert backend.mandi_snapshot.covers("Wheat", "Kerala") is False
+    assert backend.mandi_snapshot.covers("Rice", "Kerala") is True
+
+    # Everything stored was pulled three hours ago; the forced pull then fails for Rice/Kerala
+    docs = asyncio.run(backend.repos.mandi_prices.find_many({}))
+    for doc in docs:
+        doc["fetched_at"] -= timedelta(hours=3)
+    asyncio.run(backend.repos.mandi_prices.replace_many(docs))
+    backend.mandi_snapshot = MandiSnapshot(max_age_seconds=3600)
+    del UPSTREAM[("Rice", "Kerala")]
+    summary = asyncio.run(backend.refresh_mandi_snapshot(force=True))
+    assert summary["failed_pairs"] == 1 and summary["records"] == 38
+
+    snapshot = backend.mandi_snapshot
+    assert snapshot.covers("Rice", "Punjab") and not snapshot.covers("Rice", "Kerala")
+    assert snapshot.stats()["fresh_pairs"] == 2
+
+    CALLS.clear()
+    prices = backend.get_crop_market_prices(["Rice", "Wheat"], "Kerala")
+    assert prices == {"Rice": backend.FALLBACK_PRICES["Rice"], "Wheat": backend.FALLBACK_PRICES["Wheat"]}
+    assert CALLS[("Rice", "Kerala")] >= 1 and CALLS[("Wheat", "Kerala")] == 1
+
+
+def test_snapshot_pull_and_covered_prices_stay_off_the_request_pool(backend, monkeypatch):
+    class ClosedPool:
+        def submit(self, *args, **kwargs):
+            raise AssertionError("request-path mandi pool used")
+
+    monkeypatch.setattr(backend, "_mandi_pool", ClosedPool())
+    assert asyncio.run(backend.refresh_mandi_snapshot())["records"] == 38
+
+    def no_dispatch(*args, **kwargs):
+        raise AssertionError("covered price dispatched to a pool")
+    monkeypatch.setattr(backend._mandi_flight, "submit", no_dispatch)
+    prices = backend.get_crop_market_prices(["Rice", "Wheat"], "Punjab", deadline=0.01)
+    assert prices == {"Rice": 1109.5, "Wheat": 1104.5}
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,146 @@
+"""Hot model reload: canary-checked atomic swap, file watching and versioned responses"""
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "fertilizer_project", "backend"))
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:1/?serverSelectionTimeoutMS=100")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from sklearn.ensemble import RandomForestRegressor
+
+import backend
+from flat_forest import FlatForest, export_bundle, flat_path_for
+from model_loader import FAILED, MISSING, READY, ModelSlot, file_version
+
+COLUMNS = ["Area", "Annual_Rainfall", "Fertilizer", "Pesticide", "Crop_Rice", "Crop_Wheat"]
+
+
+def write_yield_model(path, offset):
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0, 10, size=(200, len(COLUMNS)))
+    model = RandomForestRegressor(n_estimators=5, random_state=0).fit(X, X[:, 0] + offset)
+    joblib.dump({"model": model, "columns": COLUMNS}, path)
+    # Distinct mtimes even on coarse-grained filesystems
+    os.utime(path, ns=(time.time_ns() + offset * 10**9,) * 2)
+
+
+def make_slot(path, validate=None):
+    return ModelSlot("yield", path, backend._load_model_file, backend._prepare_yield_model,
+                     validate=validate or backend._check_yield_model, watch_paths=backend._model_files(path))
+
+
+def test_reload_swaps_only_when_the_file_changes(tmp_path):
+    path = str(tmp_path / "yield_model.pkl")
+    write_yield_model(path, 0)
+    slot = make_slot(path)
+    first = slot.ensure()
+    assert first.version == file_version(path) and slot.status()["version"] == first.version
+
+    assert slot.changed() is False
+    assert slot.reload()["status"] == "unchanged"
+
+    write_yield_model(path, 100)
+    assert slot.changed() is True
+    result = slot.reload()
+    assert result["status"] == "reloaded" and result["previous_version"] == first.version
+    second = slot.current
+    assert second.version == result["version"] != first.version
+
+    # A request that picked up the old model still predicts with it
+    row = first.encoder.encode(backend.YIELD_CANARY[0])
+    assert first.model.predict(row)[0] < 50 < second.model.predict(second.encoder.encode(backend.YIELD_CANARY[0]))[0]
+    assert slot.reloads == 1 and slot.last_reload["status"] == "reloaded"
+
+
+def test_replaced_pickle_wins_over_a_stale_flat_export(tmp_path):
+    path = str(tmp_path / "yield_model.pkl")
+    write_yield_model(path, 0)
+    export_bundle(joblib.load(path), flat_path_for(path), source=path)
+    slot = make_slot(path)
+    first = slot.ensure()
+    assert first.format == "flat" and first.version == file_version(path)
+
+    # download_model.py only replaces the pickle
+    write_yield_model(path, 100)
+    assert slot.changed() is True
+    result = slot.reload()
+    assert result["status"] == "reloaded" and result["version"] == file_version(path) != first.version
+    row = slot.current.encoder.encode(backend.YIELD_CANARY[0])
+    assert slot.current.model.predict(row)[0] > 50
+
+    # The stale export was rewritten from the new pickle and is served again on the next load
+    assert FlatForest.load(flat_path_for(path)).header["source_sha256"][:12] == file_version(path)
+    fresh = make_slot(path).ensure()
+    assert fresh.format == "flat" and fresh.version == result["version"]
+
+
+def test_failed_canary_keeps_serving_the_old_model(tmp_path):
+    path = str(tmp_path / "yield_model.pkl")
+    write_yield_model(path, 0)
+
+    def reject_large(candidate):
+        backend._check_yield_model(candidate)
+        if candidate.model.predict(candidate.encoder.encode_many(backend.YIELD_CANARY)).min() > 50:
+            raise ValueError("canary out of range")
+
+    slot = make_slot(path, validate=reject_large)
+    served = slot.ensure()
+
+    write_yield_model(path, 100)
+    result = slot.reload()
+    assert result["status"] == "failed" and "canary" in result["error"]
+    assert slot.current is served and slot.state == READY
+    # The rejected file is not retried until it changes again
+    assert slot.changed() is False
+
+    open(path, "wb").write(b"not a pickle")
+    assert slot.reload()["status"] == "failed" and slot.current is served
+
+
+def test_missing_model_is_picked_up_when_it_appears(tmp_path):
+    path = str(tmp_path / "yield_model.pkl")
+    slot = make_slot(path)
+    assert slot.ensure() is None and slot.state == MISSING
+    write_yield_model(path, 0)
+    assert slot.changed()
+    assert slot.reload()["status"] == "reloaded" and slot.state == READY
+
+
+def test_admin_reload_and_versioned_predictions(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    path = str(tmp_path / "yield_model.pkl")
+    write_yield_model(path, 0)
+    slot = make_slot(path)
+    monkeypatch.setattr(backend, "yield_slot", slot)
+    monkeypatch.setattr(backend, "MODEL_SLOTS", (slot,))
+
+    backend.user_cache.put({"email": "admin@example.com", "name": "Admin", "role": "admin"})
+    headers = {"Authorization": f"Bearer {backend.create_access_token('admin@example.com')}"}
+    client = TestClient(backend.app)
+    payload = dict(backend.YIELD_CANARY[0])
+
+    first = client.post("/api/yield/predict", json=payload).json()
+    assert first["model_version"] == file_version(path)
+
+    write_yield_model(path, 100)
+    res = client.post("/api/admin/models/reload", params={"model": "yield"}, headers=headers)
+    assert res.status_code == 200 and res.json()["results"][0]["status"] == "reloaded"
+
+    second = client.post("/api/yield/predict", json=payload).json()
+    assert second["model_version"] == file_version(path) != first["model_version"]
+    assert second["predicted_yield"] > first["predicted_yield"]
+
+    status = client.get("/api/admin/models", headers=headers).json()
+    assert status["yield"]["version"] == second["model_version"] and status["yield"]["reloads"] == 1
+    assert client.post("/api/admin/models/reload", params={"model": "nope"}, headers=headers).status_code == 404
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,62 @@
+"""Shared MongoDB client: lazy singleton, pool utilisation counters, health probe"""
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "fertilizer_project", "backend"))
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:1/?serverSelectionTimeoutMS=100")
+
+import mongo
+from mongo import PoolMonitor
+
+
+def test_pool_monitor_tracks_utilisation():
+    monitor = PoolMonitor(max_pool_size=4)
+    address = SimpleNamespace(address=("db", 27017))
+    monitor.pool_created(address)
+    for _ in range(3):
+        monitor.connection_created(address)
+        monitor.connection_check_out_started(address)
+        monitor.connection_checked_out(address)
+    monitor.connection_checked_in(address)
+    monitor.connection_check_out_started(address)
+    monitor.connection_check_out_failed(address)
+
+    stats = monitor.stats()
+    assert (stats["open"], stats["in_use"], stats["idle"]) == (3, 2, 1)
+    assert stats["peak_in_use"] == 3 and stats["waiting"] == 0
+    assert stats["utilisation"] == 0.5
+    assert stats["checkout_failures"] == 1
+
+
+def test_client_is_created_once_and_lazily():
+    pytest.importorskip("pymongo")
+    assert mongo._client is None
+    first = mongo.get_client()
+    assert first is mongo.get_client()
+    assert mongo.get_repositories().users.collection.database.client is first
+
+
+def test_health_probe_reports_pool():
+    mongomock = pytest.importorskip("mongomock")
+    import backend
+    from fastapi.testclient import TestClient
+    from repository import Repositories
+
+    http = TestClient(backend.app)
+    res = http.get("/api/health/db")
+    assert res.status_code == 503 and "utilisation" in res.json()["pool"]
+
+    backend.repos = Repositories.from_sync_database(mongomock.MongoClient()["agri_test"])
+    try:
+        body = http.get("/api/health/db").json()
+        assert body["connected"] and "ping_ms" in body
+    finally:
+        backend.repos = None
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,104 @@
+"""Prediction memo: LRU keyed on rounded feature rows, invalidated by model version"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "fertilizer_project", "backend"))
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:1/?serverSelectionTimeoutMS=100")
+
+from prediction_memo import PredictionMemo
+
+
+class CountingModel:
+    def __init__(self, offset=0.0):
+        self.offset = offset
+        self.rows = 0
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=float)
+        self.rows += len(X)
+        return X.sum(axis=1) + self.offset
+
+
+def test_repeated_rows_are_served_from_the_memo():
+    memo, model = PredictionMemo(maxsize=100, decimals=2), CountingModel()
+    X = np.array([[1.0, 2.0], [3.0, 4.0], [1.0, 2.0]])
+    assert memo.predict("v1", X, model.predict).tolist() == [3.0, 7.0, 3.0]
+    assert model.rows == 3
+
+    # Rows equal after rounding share a key; only the new row reaches the model
+    again = memo.predict("v1", np.array([[1.001, 2.0], [5.0, 5.0], [3.0, 4.0]]), model.predict)
+    assert again.tolist() == [3.0, 10.0, 7.0] and model.rows == 4
+
+    stats = memo.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (2, 4, 3)
+    assert stats["hit_ratio"] == pytest.approx(2 / 6, abs=1e-4)
+    assert stats["latency_saved_ms"] >= 0 and stats["avg_model_ms_per_row"] > 0
+
+
+def test_misses_predict_the_rounded_row():
+    memo, model = PredictionMemo(decimals=1), CountingModel()
+    first = memo.predict("v1", np.array([[1.04, 0.0]]), model.predict)
+    second = memo.predict("v1", np.array([[0.96, 0.0]]), model.predict)
+    assert first.tolist() == second.tolist() == [1.0]
+
+
+def test_version_change_invalidates_and_lru_evicts():
+    memo = PredictionMemo(maxsize=2, decimals=3)
+    old, new = CountingModel(), CountingModel(offset=100)
+    memo.predict("v1", np.array([[1.0], [2.0], [3.0]]), old.predict)
+    assert len(memo) == 2 and memo.stats()["evictions"] == 1
+
+    assert memo.predict("v2", np.array([[2.0]]), new.predict).tolist() == [102.0]
+    stats = memo.stats()
+    assert stats["version"] == "v2" and stats["invalidations"] == 1 and stats["size"] == 1
+
+
+def test_dataframes_keep_their_columns():
+    memo = PredictionMemo(decimals=3)
+    seen = []
+
+    def predict(X):
+        seen.append(list(X.columns))
+        return np.zeros(len(X))
+
+    X = pd.DataFrame([[1.0, 2.0], [1.0, 2.0], [3.0, 4.0]], columns=["N", "P"])
+    memo.predict("v1", X, predict)
+    assert seen == [["N", "P"]]
+    assert memo.stats()["misses"] == 3  # duplicate rows within one call are all predicted
+
+
+def test_disabled_memo_calls_the_model():
+    memo, model = PredictionMemo(enabled=False), CountingModel()
+    memo.predict("v1", np.array([[1.0]]), model.predict)
+    memo.predict("v1", np.array([[1.0]]), model.predict)
+    assert model.rows == 2 and memo.stats()["hits"] == 0
+
+
+def test_yield_endpoint_reports_hits(monkeypatch):
+    import backend
+    from fastapi.testclient import TestClient
+    if backend.yield_slot.ensure() is None:
+        pytest.skip("yield_model.pkl not available")
+
+    monkeypatch.setattr(backend, "yield_memo", PredictionMemo(maxsize=100, decimals=3))
+    backend.user_cache.put({"email": "admin@example.com", "name": "Admin", "role": "admin"})
+    headers = {"Authorization": f"Bearer {backend.create_access_token('admin@example.com')}"}
+    client = TestClient(backend.app)
+
+    payload = dict(backend.YIELD_CANARY[0])
+    first = client.post("/api/yield/predict", json=payload).json()
+    second = client.post("/api/yield/predict", json=dict(payload, State=" Punjab ")).json()
+    assert first["predicted_yield"] == second["predicted_yield"]
+
+    stats = client.get("/api/admin/cache/stats", headers=headers).json()["yield_predictions"]
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert stats["version"] == backend.yield_slot.current.version
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
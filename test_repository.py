@@ -0,0 +1,115 @@
+"""Async data layer: route handlers against a mongomock-backed Repositories"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "fertilizer_project", "backend"))
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:1/?serverSelectionTimeoutMS=100")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+mongomock = pytest.importorskip("mongomock")
+
+import backend
+from fastapi.testclient import TestClient
+from repository import Repositories
+
+
+@pytest.fixture()
+def client():
+    db = mongomock.MongoClient()["agri_test"]
+    db["users"].create_index([("email", 1)], unique=True)
+    backend.repos = Repositories.from_sync_database(db)
+    backend.user_cache.invalidate("farmer@example.com")
+    backend.user_cache.invalidate("admin@example.com")
+    # Skip the startup hook: it would try to reach a real MongoDB
+    yield TestClient(backend.app), db
+    backend.repos = None
+
+
+def register(client, email, role="farmer"):
+    payload = {"name": "Test User", "email": email, "password": "secret123",
+               "state": "Telangana", "district": "Hyderabad", "role": role}
+    res = client.post("/api/auth/register", json=payload)
+    assert res.status_code == 200, res.text
+    return {"Authorization": f"Bearer {res.json()['access_token']}"}
+
+
+def test_register_login_and_profile(client):
+    http, db = client
+    register(http, "farmer@example.com")
+    assert db["users"].count_documents({"email": "farmer@example.com"}) == 1
+    assert http.post("/api/auth/register", json={
+        "name": "Dup", "email": "farmer@example.com", "password": "secret123",
+        "state": "Telangana", "district": "Hyderabad"}).status_code == 400
+
+    # Drop the cached copy so login has to go through the repository
+    backend.user_cache.invalidate("farmer@example.com")
+    res = http.post("/api/auth/login", json={"email": "farmer@example.com", "password": "secret123"})
+    assert res.status_code == 200
+    headers = {"Authorization": f"Bearer {res.json()['access_token']}"}
+
+    res = http.put("/api/me/update", json={"name": "Renamed"}, headers=headers)
+    assert res.status_code == 200
+    assert db["users"].find_one({"email": "farmer@example.com"})["name"] == "Renamed"
+
+
+def test_re_registration_never_replaces_the_cached_password(client):
+    http, db = client
+    register(http, "farmer@example.com")
+    # Evicted from this worker's cache (or registered on another worker)
+    backend.user_cache.invalidate("farmer@example.com")
+    res = http.post("/api/auth/register", json={"name": "Intruder", "email": "farmer@example.com",
+                                                 "password": "hijacked1", "state": "Telangana", "district": "Hyderabad"})
+    assert res.status_code == 400
+    assert "farmer@example.com" not in backend.user_cache
+    assert http.post("/api/auth/login", json={"email": "farmer@example.com", "password": "hijacked1"}).status_code == 401
+
+    # Without a database nothing is cached or issued
+    backend.repos = None
+    res = http.post("/api/auth/register", json={"name": "Later", "email": "later@example.com",
+                                                 "password": "secret123", "state": "Telangana", "district": "Hyderabad"})
+    assert res.status_code == 503 and "later@example.com" not in backend.user_cache
+
+
+def test_soil_history_and_admin_listings(client):
+    http, db = client
+    farmer = register(http, "farmer@example.com")
+    admin = register(http, "admin@example.com", role="admin")
+
+    for n in (10, 50, 90):
+        res = http.post("/api/soil/analyze", json={"N": n, "P": 40, "K": 30, "pH": 6.5,
+                                                     "crop_type": "Rice", "soil_type": "Loamy"}, headers=farmer)
+        assert res.status_code == 200
+    history = http.get("/api/soil/history", headers=farmer).json()
+    assert [h["N"] for h in history] == [90, 50, 10]
+
+    assert http.post("/api/contact", json={"name": "A", "mobile": "9999999999",
+                                           "email": "a@example.com", "message": "hi"}).json()["stored"] == "db"
+
+    stats = http.get("/api/admin/stats", headers=admin).json()
+    assert stats["total_farmers"] == 2
+    assert stats["total_soil_analyses"] == 3
+    assert stats["total_contacts"] == 1
+
+    page = http.get("/api/admin/soil-health?skip=1&limit=1", headers=admin).json()
+    assert page["total"] == 3 and len(page["reports"]) == 1
+
+    farmers = http.get("/api/admin/farmers", headers=admin).json()
+    target = next(f for f in farmers["farmers"] if f["email"] == "farmer@example.com")
+    assert http.delete(f"/api/admin/farmers/{target['id']}", headers=admin).status_code == 200
+    assert db["users"].count_documents({}) == 1
+    assert http.get("/api/soil/history", headers=farmer).status_code == 401
+
+
+def test_articles_round_trip(client):
+    http, _ = client
+    created = http.post("/api/articles", json={"title": "Drip irrigation", "excerpt": "Save water",
+                                                  "content": "Use drip lines."}).json()
+    assert http.get(f"/api/articles/{created['id']}").json()["title"] == "Drip irrigation"
+    assert [a["title"] for a in http.get("/api/articles").json()] == ["Drip irrigation"]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
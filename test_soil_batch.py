@@ -0,0 +1,66 @@
+"""Vectorized soil scorer: exact parity with analyze_soil_health, bulk CSV endpoint"""
+import itertools
+import os
+import random
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "fertilizer_project", "backend"))
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:1/?serverSelectionTimeoutMS=100")
+
+import backend
+from soil_scoring import decode_all, score_samples
+
+
+def test_matches_scalar_function_exactly():
+    # Every combination of below/at-low/inside/at-high/above for the four inputs
+    edges = {"N": [0, 39.99, 40, 60, 80, 80.01, 200], "P": [0, 29.9, 30, 45, 60, 60.1],
+             "K": [0, 19.5, 20, 35, 50, 50.5], "pH": [3.0, 5.99, 6.0, 7.0, 7.5, 7.51, 10]}
+    samples = list(itertools.product(*edges.values()))
+    rng = random.Random(0)
+    samples += [(rng.uniform(0, 150), rng.uniform(0, 100), rng.uniform(0, 80), rng.uniform(3, 10))
+                for _ in range(2000)]
+
+    N, P, K, pH = (np.array(col) for col in zip(*samples))
+    batch = decode_all(score_samples(N, P, K, pH))
+    assert batch == [backend.analyze_soil_health(*s) for s in samples]
+
+
+def test_codes_and_empty_batch():
+    result = score_samples([10], [45], [70], [7.0])
+    assert result.scores.tolist() == [70]
+    assert result.status.tolist() == [[1, 0, 2, 0]]
+    assert result.suggestions.tolist() == [[0, -1, 5, -1, 9]]
+    assert decode_all(score_samples([], [], [], [])) == []
+
+
+def test_batch_endpoint_csv_and_bulk_insert():
+    mongomock = pytest.importorskip("mongomock")
+    from fastapi.testclient import TestClient
+    from repository import Repositories
+
+    db = mongomock.MongoClient()["agri_test"]
+    backend.repos = Repositories.from_sync_database(db)
+    backend.user_cache.put({"email": "officer@example.com", "name": "Officer", "role": "farmer"})
+    headers = {"Authorization": f"Bearer {backend.create_access_token('officer@example.com')}",
+               "Content-Type": "text/csv"}
+    csv_body = "sample,N,P,K,pH,crop_type\nA1,10,45,70,7.0,Rice\nA2,x,1,1,1,Rice\nA3,50,40,30,6.5,\n"
+    try:
+        res = TestClient(backend.app).post("/api/soil/analyze/batch", content=csv_body, headers=headers)
+        assert res.status_code == 200, res.text
+        body = res.json()
+        assert (body["count"], body["errors"]) == (2, 1)
+        score, status, suggestions = backend.analyze_soil_health(10, 45, 70, 7.0)
+        assert body["results"][0] == {"index": 0, "score": score, "status": status, "suggestions": suggestions}
+        assert "N" in body["results"][1]["error"]
+        assert body["results"][2]["score"] == 100
+        assert db["soil_analysis"].count_documents({"user_email": "officer@example.com"}) == 2
+    finally:
+        backend.repos = None
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
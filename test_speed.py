@@ -1,6 +1,9 @@
 import requests
 import json
 import time
+import statistics
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 API = "http://127.0.0.1:8000"
 
@@ -14,7 +17,8 @@ register_data = {
     "email": "speedtest@example.com",
     "password": "SpeedTest123",
     "phone": "9876543210",
-    "location": "Hyderabad"
+    "state": "Telangana",
+    "district": "Hyderabad"
 }
 r_reg = requests.post(f"{API}/api/auth/register", json=register_data)
 reg_time = time.time() - start
@@ -52,3 +56,61 @@ for i in range(5):
 avg_time = sum(times) / len(times)
 print(f"\n📊 Average login time: {avg_time:.3f}s ({int(avg_time*1000)}ms)")
 print(f"⚡ This should be <100ms for instant response")
+
+# Test 4: Latency of unrelated endpoints during a login storm
+print("\n" + "=" * 60)
+print("🧪 SPEED TEST - UNRELATED ENDPOINTS DURING LOGIN STORM")
+print("=" * 60)
+
+STORM_CLIENTS = 32
+PROBE_ENDPOINTS = ["/", "/api/prices", "/api/articles"]
+
+
+def percentile_ms(samples, pct):
+    """Return the pct-th percentile of samples (seconds) in milliseconds."""
+    if len(samples) < 2:
+        return (samples[0] if samples else 0.0) * 1000
+    return statistics.quantiles(samples, n=100, method="inclusive")[pct - 1] * 1000
+
+
+def probe(stop, samples):
+    """Hit unrelated endpoints in a loop, recording per-request latency."""
+    session = requests.Session()
+    i = 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        session.get(f"{API}{PROBE_ENDPOINTS[i % len(PROBE_ENDPOINTS)]}")
+        samples.append(time.perf_counter() - start)
+        i += 1
+
+
+def storm(stop, counts):
+    """Send logins back to back until told to stop."""
+    session = requests.Session()
+    while not stop.is_set():
+        r = session.post(f"{API}/api/auth/login", json=login_data)
+        counts[r.status_code] = counts.get(r.status_code, 0) + 1
+
+
+def measure(duration, with_storm):
+    stop = threading.Event()
+    samples, counts = [], {}
+    workers = STORM_CLIENTS if with_storm else 0
+    with ThreadPoolExecutor(max_workers=workers + 1) as ex:
+        ex.submit(probe, stop, samples)
+        for _ in range(workers):
+            ex.submit(storm, stop, counts)
+        time.sleep(duration)
+        stop.set()
+    return samples, counts
+
+
+for label, with_storm in (("idle", False), (f"{STORM_CLIENTS} concurrent logins", True)):
+    samples, counts = measure(5, with_storm)
+    print(f"  [{label}] probes: {len(samples)}"
+          f" - p50: {percentile_ms(samples, 50):.1f}ms"
+          f" - p99: {percentile_ms(samples, 99):.1f}ms")
+    if counts:
+        print(f"  [{label}] login responses by status: {counts}")
+
+print(f"⚡ p99 during the storm should stay close to idle p99")
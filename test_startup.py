@@ -0,0 +1,101 @@
+"""Lazy model loading, background warm-up and the liveness/readiness probes"""
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "fertilizer_project", "backend"))
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:1/?serverSelectionTimeoutMS=100")
+
+import backend
+from model_loader import FAILED, MISSING, PENDING, READY, ModelSlot
+
+
+def test_slot_loads_once_under_concurrency():
+    calls, installed = [], []
+
+    def loader(path):
+        calls.append(path)
+        time.sleep(0.05)
+        return {"model": "m", "format": "flat", "version": "v1"}
+
+    def prepare(bundle):
+        installed.append(bundle)
+        return bundle["model"], None, None
+
+    slot = ModelSlot("test", "model.pkl", loader, prepare)
+    assert slot.state == PENDING
+    with ThreadPoolExecutor(8) as pool:
+        assert all(pool.map(lambda _: slot.ensure() is not None, range(8)))
+    assert calls == ["model.pkl"] and len(installed) == 1
+    assert slot.status()["state"] == READY and slot.status()["format"] == "flat"
+    assert slot.load_ms >= 50
+
+
+def test_missing_and_broken_models_settle():
+    def missing(path):
+        raise FileNotFoundError(path)
+
+    def broken(path):
+        raise ValueError("bad pickle")
+
+    slot = ModelSlot("missing", "nope.pkl", missing, lambda b: (b, None, None))
+    assert slot.ensure() is None and slot.state == MISSING and slot.settled
+    slot = ModelSlot("broken", "bad.pkl", broken, lambda b: (b, None, None))
+    assert slot.ensure() is None and slot.state == FAILED and "bad pickle" in slot.error
+
+
+def test_import_does_not_load_models_or_pandas():
+    # A fresh interpreter: importing the app must not unpickle models or import pandas/sklearn
+    import subprocess
+    code = ("import sys, backend; "
+            "assert backend.yield_slot.state == 'pending', backend.yield_slot.state; "
+            "assert 'pandas' not in sys.modules and 'sklearn' not in sys.modules, 'eager import'")
+    env = dict(os.environ, PYTHONPATH=os.path.join(ROOT, "fertilizer_project", "backend"))
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True,
+                            cwd=os.path.join(ROOT, "fertilizer_project", "backend"))
+    assert result.returncode == 0, result.stderr
+
+
+def test_probes_report_warm_up(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    gate = threading.Event()
+
+    def slow_loader(path):
+        gate.wait(5)
+        return {"model": object(), "format": "flat", "version": "v1"}
+
+    slot = ModelSlot("slow", "slow.pkl", slow_loader, lambda b: (b["model"], None, None))
+    monkeypatch.setattr(backend, "MODEL_SLOTS", (slot,))
+    monkeypatch.setattr(backend, "MODEL_WARMUP", True)
+    monkeypatch.setattr(backend, "get_repositories", lambda: None)  # no MongoDB here
+    for key in backend.startup_timings:
+        monkeypatch.setitem(backend.startup_timings, key, backend.startup_timings[key] if key == "import_ms" else None)
+
+    with TestClient(backend.app) as client:
+        started = time.perf_counter()
+        live = client.get("/api/health/live")
+        assert live.status_code == 200 and (time.perf_counter() - started) < 0.5
+
+        res = client.get("/api/health/ready")
+        assert res.status_code == 503
+        assert res.json()["models"]["slow"]["state"] in (PENDING, "loading")
+
+        gate.set()
+        deadline = time.time() + 5
+        while client.get("/api/health/ready").status_code != 200 and time.time() < deadline:
+            time.sleep(0.02)
+        body = client.get("/api/health/ready").json()
+        assert body["ready"], body
+        assert body["models"]["slow"]["state"] == READY
+        assert body["startup"]["ready_ms"] >= body["startup"]["startup_hook_ms"] > 0
+        assert body["startup"]["import_ms"] > 0
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
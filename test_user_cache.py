@@ -0,0 +1,96 @@
+"""UserCache: LRU eviction, TTL refresh from the database, memory accounting"""
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "fertilizer_project", "backend"))
+
+from user_cache import UserCache
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def loader_for(db):
+    async def load(email):
+        return db.get(email)
+    return load
+
+
+def make_doc(email, name="Farmer", state="Telangana"):
+    return {"email": email, "name": name, "location": {"state": state, "district": "Hyderabad"},
+            "role": "farmer", "password_hash": "$2b$12$hash"}
+
+
+def test_eviction_and_memory_accounting():
+    cache = UserCache(loader_for({}), maxsize=2, ttl=60)
+    cache.put(make_doc("a@x.in"))
+    cache.put(make_doc("b@x.in"))
+    run(cache.get("a@x.in"))            # "a" becomes most recent
+    cache.put(make_doc("c@x.in"))       # evicts "b"
+
+    assert "b@x.in" not in cache and "a@x.in" in cache
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    expected = sum(cache.peek(e).nbytes() for e in ("a@x.in", "c@x.in"))
+    assert stats["memory_bytes"] == expected
+
+    cache.invalidate("a@x.in")
+    cache.invalidate("c@x.in")
+    assert cache.stats()["memory_bytes"] == 0
+
+
+def test_ttl_refresh_from_database():
+    db = {"a@x.in": make_doc("a@x.in", name="Old")}
+    cache = UserCache(loader_for(db), maxsize=10, ttl=0.05)
+
+    assert run(cache.get("a@x.in")).name == "Old"
+    db["a@x.in"] = make_doc("a@x.in", name="New")
+    assert run(cache.get("a@x.in")).name == "Old"     # still fresh
+    time.sleep(0.08)
+    assert run(cache.get("a@x.in")).name == "New"     # refreshed after TTL
+
+    del db["a@x.in"]
+    time.sleep(0.08)
+    assert run(cache.get("a@x.in")) is None           # deleted upstream
+
+
+def test_database_outage_serves_cached_copy():
+    async def down(email):
+        raise RuntimeError("Database not available")
+
+    cache = UserCache(down, maxsize=10, ttl=0.05)
+    cache.put(make_doc("a@x.in"))
+    time.sleep(0.08)
+    record = run(cache.get("a@x.in"))
+    assert record is not None and record.profile()["location"]["state"] == "Telangana"
+    assert "password_hash" not in record.profile()
+    assert run(cache.get("missing@x.in")) is None
+
+
+def test_concurrent_loads_share_one_query():
+    calls = []
+
+    async def slow(email):
+        calls.append(email)
+        await asyncio.sleep(0.05)
+        return make_doc(email)
+
+    async def burst():
+        cache = UserCache(slow, maxsize=10, ttl=60)
+        return await asyncio.gather(*(cache.get("a@x.in") for _ in range(50)))
+
+    records = run(burst())
+    assert calls == ["a@x.in"]
+    assert all(r is records[0] for r in records)
+
+
+if __name__ == "__main__":
+    test_eviction_and_memory_accounting()
+    test_ttl_refresh_from_database()
+    test_database_outage_serves_cached_copy()
+    test_concurrent_loads_share_one_query()
+    print("✅ User cache tests OK")
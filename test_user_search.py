@@ -0,0 +1,117 @@
+"""Admin farmer search: indexed prefix and typo keys kept on write, ranked results"""
+import asyncio
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "fertilizer_project", "backend"))
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:1/?serverSelectionTimeoutMS=100")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+mongomock = pytest.importorskip("mongomock")
+
+import backend
+from fastapi.testclient import TestClient
+from repository import Repositories
+from user_search import backfill_search_keys, search_keys, within_one_edit, words
+
+USERS = [
+    ("Ravi Kumar", "ravi.kumar@example.com"),
+    ("Ravindra Singh", "rsingh@example.com"),
+    ("Kumar Swamy", "kswamy@gmail.com"),
+    ("Rabi Das", "rabi@example.com"),
+    ("Sunita Devi", "sunita.devi@example.com"),
+]
+
+
+@pytest.fixture()
+def client():
+    db = mongomock.MongoClient()["agri_test"]
+    backend.repos = Repositories.from_sync_database(db)
+    backend.user_cache.put({"email": "admin@example.com", "name": "Admin", "role": "admin"})
+    headers = {"Authorization": f"Bearer {backend.create_access_token('admin@example.com')}"}
+    try:
+        yield TestClient(backend.app), db, headers
+    finally:
+        backend.repos = None
+
+
+def names(http, headers, search, **params):
+    res = http.get("/api/admin/farmers", params=dict(params, search=search), headers=headers).json()
+    return [f["name"] for f in res["farmers"]]
+
+
+def test_keys_and_edit_distance():
+    assert words("Ráví  KUMAR-Reddy") == ["ravi", "kumar", "reddy"]
+    keys = search_keys("Ravi", "rk99@gmail.com")
+    assert {"p:r", "p:ravi", "p:rk99", "p:gmail", "d:ravi", "d:rvi"} <= set(keys)
+    assert "d:gmail" not in keys and "p:ravi kumar" not in keys
+    for typo in ("rvai", "rabi", "ravii", "rav"):
+        assert within_one_edit(typo, "ravi")
+    assert not within_one_edit("rbai", "ravi")
+
+
+def test_search_is_ranked_and_typo_tolerant(client):
+    http, db, headers = client
+    db["users"].insert_many([{"name": n, "email": e, "created_at": datetime(2026, 1, 1)} for n, e in USERS])
+    assert asyncio.run(backfill_search_keys(backend.repos.users)) == len(USERS)
+    assert asyncio.run(backfill_search_keys(backend.repos.users)) == 0
+
+    # Exact word first, then prefixes; the rest of the page is typo matches
+    assert names(http, headers, "ravi") == ["Ravi Kumar", "Ravindra Singh", "Rabi Das"]
+    assert names(http, headers, "rav") == ["Ravi Kumar", "Ravindra Singh"]
+    assert names(http, headers, "kumar") == ["Kumar Swamy", "Ravi Kumar"]
+    assert names(http, headers, "Kumar Ravi") == ["Ravi Kumar"]
+    assert names(http, headers, "suntia") == ["Sunita Devi"]
+    assert names(http, headers, "rk kumar") == []
+    assert names(http, headers, "gmail") == ["Kumar Swamy"]
+    assert names(http, headers, "ravi", skip=1, limit=1) == ["Ravindra Singh"]
+    res = http.get("/api/admin/farmers", params={"search": "ravi"}, headers=headers).json()
+    assert (res["total"], res["total_exact"], res["next_cursor"]) == (3, True, None)
+
+
+def test_exact_match_is_found_past_a_capped_prefix(client, monkeypatch):
+    http, db, headers = client
+    monkeypatch.setattr(backend, "USER_SEARCH_CANDIDATES", 10)
+    # Thirty prefix matches fill the cap before the exact match in index order
+    users = [(f"Ravindra {i}", f"rn{i}@example.com") for i in range(30)] + [("Ravi Kumar", "rk@example.com")]
+    db["users"].insert_many([{"name": n, "email": e, "search_keys": search_keys(n, e)} for n, e in users])
+
+    res = http.get("/api/admin/farmers", params={"search": "ravi", "limit": 5}, headers=headers).json()
+    assert res["farmers"][0]["name"] == "Ravi Kumar"
+    assert (res["total_exact"], res["max_results"]) == (False, 10)
+
+    # Only the ranked candidates can be paged through
+    assert len(names(http, headers, "ravi", skip=5, limit=5)) == 5
+    res = http.get("/api/admin/farmers", params={"search": "ravi", "skip": 8, "limit": 5}, headers=headers)
+    assert res.status_code == 400
+
+
+def test_keys_follow_register_and_profile_updates(client, monkeypatch):
+    http, db, headers = client
+    res = http.post("/api/auth/register", json={"name": "Meena Patel", "email": "meena@example.com",
+                                                 "password": "secret123", "state": "Gujarat", "district": "Surat"})
+    assert res.status_code == 200
+    assert names(http, headers, "pate") == ["Meena Patel"]
+
+    token = res.json()["access_token"]
+    res = http.put("/api/me/update", json={"name": "Meena Shah", "state": "Gujarat", "district": "Surat"},
+                   headers={"Authorization": f"Bearer {token}"})
+    assert res.status_code == 200
+    assert names(http, headers, "patel") == [] and names(http, headers, "shah") == ["Meena Shah"]
+
+    # Regex searches are gone: every lookup goes through the search_keys index
+    original = backend.repos.users.find_many
+
+    async def find_many(query=None, **kwargs):
+        assert "$regex" not in str(query) and "search_keys" in str(query)
+        return await original(query, **kwargs)
+    monkeypatch.setattr(backend.repos.users, "find_many", find_many)
+    assert names(http, headers, "meena") == ["Meena Shah"]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
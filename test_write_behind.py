@@ -0,0 +1,144 @@
+"""WriteBehindQueue: size/time flushes, backpressure, drain on shutdown"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "fertilizer_project", "backend"))
+
+from write_behind import WriteBehindQueue
+
+
+class FakeRepo:
+    def __init__(self, name="logs", delay=0.0):
+        self.name = name
+        self.delay = delay
+        self.batches = []
+
+    async def insert_many(self, docs, ordered=False):
+        await asyncio.sleep(self.delay)
+        self.batches.append(list(docs))
+        return [None] * len(docs)
+
+    async def insert_one(self, doc):
+        self.batches.append([doc])
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_flushes_on_size_and_groups_per_collection():
+    async def scenario():
+        queue = WriteBehindQueue(max_batch=10, flush_interval=5)
+        queue.start()
+        soil, recs = FakeRepo("soil"), FakeRepo("recs")
+        for i in range(10):
+            await queue.put(soil if i % 2 else recs, {"i": i})
+        await asyncio.sleep(0.05)        # far below flush_interval
+        return queue, soil, recs
+
+    queue, soil, recs = run(scenario())
+    assert [len(b) for b in soil.batches] == [5] and [len(b) for b in recs.batches] == [5]
+    assert queue.stats()["written"] == 10 and queue.stats()["batches"] == 1
+
+
+def test_flushes_on_time():
+    async def scenario():
+        queue = WriteBehindQueue(max_batch=100, flush_interval=0.05)
+        queue.start()
+        repo = FakeRepo()
+        await queue.put(repo, {"i": 1})
+        await queue.put(repo, {"i": 2})
+        await asyncio.sleep(0.2)
+        return repo
+
+    assert [len(b) for b in run(scenario()).batches] == [2]
+
+
+def test_backpressure_drops_when_full_and_close_drains():
+    async def scenario():
+        queue = WriteBehindQueue(max_batch=2, flush_interval=0.01, max_queue=4, put_timeout=0.01)
+        queue.start()
+        repo = FakeRepo(delay=0.2)
+        accepted = [await queue.put(repo, {"i": i}) for i in range(20)]
+        assert queue.stats()["depth"] <= 4
+        await queue.close(timeout=5)
+        return queue, repo, accepted
+
+    queue, repo, accepted = run(scenario())
+    stats = queue.stats()
+    assert stats["dropped"] == accepted.count(False) > 0
+    assert stats["depth"] == 0 and not stats["running"]
+    assert sum(len(b) for b in repo.batches) == accepted.count(True) == stats["written"]
+
+
+def test_writes_through_when_not_started():
+    repo = FakeRepo()
+    queue = WriteBehindQueue()
+    assert run(queue.put(repo, {"i": 1}))
+    assert repo.batches == [[{"i": 1}]] and queue.stats()["direct_writes"] == 1
+
+
+def test_insert_many_against_mongomock():
+    mongomock = pytest.importorskip("mongomock")
+    from repository import Repositories
+
+    db = mongomock.MongoClient()["agri_test"]
+    repos = Repositories.from_sync_database(db)
+
+    async def scenario():
+        queue = WriteBehindQueue(max_batch=50, flush_interval=0.05)
+        queue.start()
+        for i in range(120):
+            await queue.put(repos.market_logs, {"commodity": "Rice", "i": i})
+        await queue.close()
+        return queue
+
+    queue = run(scenario())
+    assert db["market_logs"].count_documents({}) == 120
+    assert queue.stats()["batches"] >= 3
+
+
+def test_retry_after_applied_timeout_does_not_duplicate():
+    mongomock = pytest.importorskip("mongomock")
+    from pymongo.errors import AutoReconnect
+    from repository import Repositories
+
+    db = mongomock.MongoClient()["agri_test"]
+    repos = Repositories.from_sync_database(db)
+    db["contacts"].insert_one({"_id": "taken"})
+    real_insert_many = db["contacts"].insert_many
+    calls = []
+
+    def applied_then_timeout(docs, ordered=False):
+        calls.append([d["_id"] for d in docs])
+        if len(calls) == 1:
+            # The server applies the first three, then the connection drops
+            real_insert_many(docs[:3], ordered=ordered)
+            raise AutoReconnect("timed out")
+        return real_insert_many(docs, ordered=ordered)
+    repos.contacts.collection._collection = type("C", (), {"insert_many": staticmethod(applied_then_timeout)})()
+
+    async def scenario():
+        queue = WriteBehindQueue(max_batch=10, flush_interval=0.05)
+        queue.start()
+        for i in range(5):
+            await queue.put(repos.contacts, {"i": i})
+        await queue.put(repos.contacts, {"_id": "taken", "i": 5})
+        await queue.close()
+        return queue
+
+    queue = run(scenario())
+    assert calls[0] == calls[1]                              # same ids on the retry
+    assert db["contacts"].count_documents({"i": {"$exists": True}}) == 5
+    stats = queue.stats()
+    assert (stats["written"], stats["failed"], stats["retries"]) == (5, 1, 1)
+    # Three counted from the retry's duplicates, two from its nInserted
+    assert db["stats"].find_one({"_id": "collection_counts"})["counts"]["contacts"] == 5
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,106 @@
+"""Batch yield prediction: JSON/NDJSON/CSV uploads, chunked predict, bulk logging"""
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "fertilizer_project", "backend"))
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:1/?serverSelectionTimeoutMS=100")
+
+from batch_input import BatchInputError, RowError, iter_rows
+
+ROWS = [
+    {"Area": 1200, "Annual_Rainfall": 1100, "Fertilizer": 90000, "Pesticide": 300,
+     "Crop": "Rice", "Season": "Kharif", "State": "Telangana"},
+    {"Area": 500, "Annual_Rainfall": 800, "Fertilizer": 40000, "Pesticide": 120,
+     "Crop": "Wheat", "Season": "Rabi", "State": "Punjab"},
+    {"Area": 75, "Annual_Rainfall": 650, "Fertilizer": 9000, "Pesticide": 20,
+     "Crop": "Maize", "Season": "Whole Year", "State": "Karnataka"},
+]
+
+
+def parse(body: bytes, content_type: str, chunk_size: int = 7):
+    async def chunks():
+        for i in range(0, len(body), chunk_size):
+            yield body[i:i + chunk_size]
+
+    async def collect():
+        return [row async for row in iter_rows(chunks(), content_type)]
+    return asyncio.run(collect())
+
+
+def to_csv(rows):
+    header = list(rows[0])
+    lines = [",".join(header)] + [",".join(str(r[h]) for h in header) for r in rows]
+    return ("\r\n".join(lines) + "\r\n").encode()
+
+
+def test_parsers_split_rows_across_chunks():
+    ndjson = ("\n".join(json.dumps(r) for r in ROWS) + "\n{broken\n").encode()
+    rows = parse(ndjson, "application/x-ndjson")
+    assert rows[:3] == ROWS and isinstance(rows[3], RowError)
+
+    rows = parse(to_csv(ROWS) + b"1,2\n", "text/csv; charset=utf-8")
+    assert [r["Crop"] for r in rows[:3]] == ["Rice", "Wheat", "Maize"]
+    assert isinstance(rows[3], RowError)
+
+    assert parse(json.dumps(ROWS).encode(), "application/json") == ROWS
+    with pytest.raises(BatchInputError):
+        parse(b'{"not": "a list"}', "application/json")
+
+
+@pytest.fixture()
+def client():
+    import backend
+    if not backend.yield_slot.ensure():
+        pytest.skip("yield_model.pkl not available")
+    from fastapi.testclient import TestClient
+    return TestClient(backend.app)
+
+
+def read_lines(res):
+    assert res.status_code == 200, res.text
+    assert res.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in res.text.splitlines()]
+
+
+def test_batch_matches_single_predictions(client, monkeypatch):
+    import backend
+    monkeypatch.setattr(backend, "YIELD_BATCH_CHUNK_SIZE", 2)
+    single = [client.post("/api/yield/predict", json=r).json()["predicted_yield"] for r in ROWS]
+
+    bad = dict(ROWS[0], Area="lots")
+    lines = read_lines(client.post("/api/yield/predict/batch", json=ROWS + [bad]))
+    assert [l["index"] for l in lines[:-1]] == [0, 1, 2, 3]
+    assert [l["predicted_yield"] for l in lines[:3]] == pytest.approx(single)
+    assert "Area" in lines[3]["error"]
+    assert lines[-1] == {"done": True, "rows": 4, "predicted": 3, "errors": 1,
+                         "model_version": backend.yield_slot.current.version}
+
+    lines = read_lines(client.post("/api/yield/predict/batch", content=to_csv(ROWS),
+                                   headers={"Content-Type": "text/csv"}))
+    assert [l["predicted_yield"] for l in lines[:3]] == pytest.approx(single)
+
+
+def test_batch_logs_with_bulk_insert(client):
+    mongomock = pytest.importorskip("mongomock")
+    import backend
+    from repository import Repositories
+
+    db = mongomock.MongoClient()["agri_test"]
+    backend.repos = Repositories.from_sync_database(db)
+    try:
+        body = "\n".join(json.dumps(r) for r in ROWS * 10).encode()
+        lines = read_lines(client.post("/api/yield/predict/batch", content=body,
+                                       headers={"Content-Type": "application/x-ndjson"}))
+        assert lines[-1]["predicted"] == 30
+        assert db["yield_predictions"].count_documents({"Crop": "Wheat"}) == 10
+    finally:
+        backend.repos = None
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
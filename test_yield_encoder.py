@@ -0,0 +1,66 @@
+"""Parity test: YieldFeatureEncoder vs the training-time pd.get_dummies encoding"""
+import os
+import sys
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(ROOT, "fertilizer_project", "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+from train_yield_model import DATA_PATH, MODEL_PATH, load_and_clean_data, prepare_features
+from yield_encoder import YieldFeatureEncoder
+
+INPUT_COLS = ["Area", "Annual_Rainfall", "Fertilizer", "Pesticide", "Crop", "Season", "State"]
+
+
+def reference_matrix(df, columns):
+    """Encode rows the way train_yield_model.py does, aligned to the saved columns."""
+    X, _ = prepare_features(df)
+    return X.reindex(columns=columns, fill_value=0).to_numpy(dtype=np.float64)
+
+
+def load_columns():
+    if os.path.exists(MODEL_PATH):
+        return joblib.load(MODEL_PATH)["columns"]
+    X, _ = prepare_features(load_and_clean_data(DATA_PATH))
+    return X.columns.tolist()
+
+
+def test_encoder_matches_training_encoding():
+    df = load_and_clean_data(DATA_PATH)
+    columns = load_columns()
+    encoder = YieldFeatureEncoder(columns)
+
+    expected = reference_matrix(df, columns)
+    actual = encoder.encode_many(df[INPUT_COLS].to_dict("records"))
+    assert actual.shape == expected.shape
+    assert np.array_equal(actual, expected)
+
+    # Single-row path and whitespace-trimmed category names give identical rows
+    for i, row in enumerate(df[INPUT_COLS].head(200).to_dict("records")):
+        assert np.array_equal(encoder.encode(row)[0], expected[i])
+        trimmed = {k: (v.strip() if isinstance(v, str) else v) for k, v in row.items()}
+        assert np.array_equal(encoder.encode(trimmed)[0], expected[i])
+
+
+def test_encoder_predictions_match():
+    if not os.path.exists(MODEL_PATH):
+        pytest.skip("yield_model.pkl not trained")
+    bundle = joblib.load(MODEL_PATH)
+    model, columns = bundle["model"], bundle["columns"]
+    encoder = YieldFeatureEncoder(columns)
+
+    df = load_and_clean_data(DATA_PATH)
+    expected = model.predict(pd.DataFrame(reference_matrix(df, columns), columns=columns))
+    actual = model.predict(encoder.encode_many(df[INPUT_COLS].to_dict("records")))
+    assert np.array_equal(actual, expected)
+
+
+if __name__ == "__main__":
+    test_encoder_matches_training_encoding()
+    test_encoder_predictions_match()
+    print("✅ Yield encoder parity OK")
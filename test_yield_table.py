@@ -0,0 +1,165 @@
+"""Precomputed crop yield tables: interpolation, versioning and the recommend_crop fast path"""
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "fertilizer_project", "backend"))
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:1/?serverSelectionTimeoutMS=100")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from yield_encoder import YieldFeatureEncoder
+from yield_table import CropYieldTable, YieldTableStore, grid_coordinates
+
+COLUMNS = ["Area", "Annual_Rainfall", "Fertilizer", "Pesticide", "Crop_Wheat", "State_Punjab", "Season_Rabi"]
+CROPS = ["Rice", "Wheat"]
+
+
+class LinearModel:
+    """Yield linear in rainfall and in the per-hectare rates, so interpolation is exact."""
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=float)
+        return X[:, 1] / 1000 + X[:, 2] / X[:, 0] / 100 + 10 * X[:, 3] / X[:, 0] + X[:, 4]
+
+
+def live(crop, **inputs):
+    encoder = YieldFeatureEncoder(COLUMNS)
+    row = dict(inputs, Crop=crop, State="Punjab", Season="Rabi")
+    return float(LinearModel().predict(encoder.encode(row))[0])
+
+
+def test_interpolation_matches_model_inside_grid():
+    table = CropYieldTable.build(LinearModel(), YieldFeatureEncoder(COLUMNS), CROPS, "Punjab", "Rabi")
+    assert table.error["p90_rel"] < 1e-5
+
+    inputs = dict(Area=250.0, Annual_Rainfall=1234.0, Fertilizer=250.0 * 131.0, Pesticide=250.0 * 0.2)
+    yields = table.lookup(inputs["Area"], inputs["Annual_Rainfall"], inputs["Fertilizer"], inputs["Pesticide"])
+    for crop in CROPS:
+        assert yields[crop] == pytest.approx(live(crop, **inputs), rel=1e-5)
+
+    # Fertilizer far outside the per-hectare range, tiny area, zero area: not served from the table
+    assert table.lookup(250.0, 1234.0, 10.0, 50.0) is None
+    assert table.lookup(1.0, 1234.0, 131.0, 0.2) is None
+    assert grid_coordinates(0.0, 1234.0, 0.0, 0.0) is None
+
+
+def test_store_versions_builds_and_files(tmp_path):
+    store = YieldTableStore(CROPS, maxsize=2)
+    model, encoder = LinearModel(), YieldFeatureEncoder(COLUMNS)
+    args = (1000.0, 900.0, 1000.0 * 150, 1000.0 * 0.3)
+
+    assert store.lookup("v1", "Punjab", "Rabi", *args) is None
+    assert store.claim_build("v1", "Punjab", "Rabi") is True
+    assert store.claim_build("v1", " Punjab ", "Rabi") is False  # already building
+    store.build("v1", model, encoder, "Punjab", "Rabi")
+    assert store.lookup("v1", "Punjab ", "Rabi", *args)["Wheat"] == pytest.approx(live("Wheat", Area=args[0], Annual_Rainfall=args[1], Fertilizer=args[2], Pesticide=args[3]), rel=1e-5)
+
+    path = str(tmp_path / "tables.npz")
+    store.save(path)
+    fresh = YieldTableStore(CROPS)
+    assert fresh.load(path, "v2") == 0
+    assert fresh.load(path, "v1") == 1 and fresh.lookup("v1", "Punjab", "Rabi", *args) is not None
+
+    # A new model version drops every table
+    assert store.lookup("v2", "Punjab", "Rabi", *args) is None
+    stats = store.stats()
+    assert (stats["version"], stats["tables"], stats["hits"], stats["builds"]) == ("v2", 0, 1, 1)
+
+    # A build finished after a swap is not stored under the new version
+    assert store.claim_build("v2", "Punjab", "Kharif")
+    store.lookup("v3", "Punjab", "Kharif", *args)
+    store.build("v2", model, encoder, "Punjab", "Kharif")
+    assert store.stats()["tables"] == 0
+
+
+def test_concurrent_builds_are_capped():
+    store = YieldTableStore(CROPS, max_builds=2)
+    assert store.claim_build("v1", "Punjab", "Rabi")
+    assert store.claim_build("v1", "Punjab", "Kharif")
+    assert store.claim_build("v1", "Haryana", "Rabi") is False
+    store.build("v1", LinearModel(), YieldFeatureEncoder(COLUMNS), "Punjab", "Rabi")
+    assert store.claim_build("v1", "Haryana", "Rabi")
+    assert store.stats()["builds_deferred"] == 1
+
+
+class SawtoothModel:
+    """Yield jumps every few mm of rainfall, far finer than the grid."""
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=float)
+        return 1.0 + (X[:, 1] % 97.0) / 97.0
+
+
+def test_inaccurate_tables_are_not_served_or_rebuilt(tmp_path):
+    args = (1000.0, 900.0, 1000.0 * 150, 1000.0 * 0.3)
+    encoder = YieldFeatureEncoder(COLUMNS)
+    store = YieldTableStore(CROPS, max_p90_rel=0.1)
+    assert store.claim_build("v1", "Punjab", "Rabi")
+    assert store.build("v1", SawtoothModel(), encoder, "Punjab", "Rabi").error["p90_rel"] > 0.1
+    assert store.lookup("v1", "Punjab", "Rabi", *args) is None
+    assert store.claim_build("v1", "Punjab", "Rabi") is False
+    assert store.stats()["rejected"] == 1
+
+    # Accurate tables pass; files are filtered the same way on load
+    assert store.claim_build("v1", "Punjab", "Kharif")
+    store.build("v1", LinearModel(), encoder, "Punjab", "Kharif")
+    unfiltered = YieldTableStore(CROPS)
+    unfiltered.claim_build("v1", "Punjab", "Rabi")
+    unfiltered.build("v1", SawtoothModel(), encoder, "Punjab", "Rabi")
+    path = unfiltered.save(str(tmp_path / "tables.npz"))
+    strict = YieldTableStore(CROPS, max_p90_rel=0.1)
+    assert strict.load(path, "v1") == 0
+    assert strict.stats()["rejected"] == 1 and strict.lookup("v1", "Punjab", "Rabi", *args) is None
+
+    # A new model version may be accurate, so rejections are forgotten
+    assert store.claim_build("v2", "Punjab", "Rabi")
+
+
+def test_recommend_crop_switches_to_the_table(monkeypatch):
+    import backend
+    from fastapi.testclient import TestClient
+    if backend.yield_slot.ensure() is None:
+        pytest.skip("yield_model.pkl not available")
+
+    # The shipped grid is coarse for the forest, so serve its tables whatever their error here
+    monkeypatch.setattr(backend, "yield_tables", YieldTableStore(backend.RECOMMENDATION_CROPS, max_p90_rel=None))
+    monkeypatch.setattr(backend, "YIELD_TABLE_PATH", os.path.join(ROOT, "no-prebuilt-tables.npz"))
+    monkeypatch.setattr(backend, "get_crop_market_prices",
+                        lambda crops, state: {c: backend.FALLBACK_PRICES.get(c) for c in crops})
+    backend.user_cache.put({"email": "grower@example.com", "name": "Grower", "role": "farmer"})
+    headers = {"Authorization": f"Bearer {backend.create_access_token('grower@example.com')}"}
+    payload = {"state": "Punjab", "season": "Kharif", "area": 1000.0, "rainfall": 700.0,
+               "fertilizer": 1000.0 * 150, "pesticide": 1000.0 * 0.25}
+
+    with TestClient(backend.app) as client:
+        first = client.post("/api/crop/recommend", json=payload, headers=headers)
+        assert first.status_code == 200, first.text
+        assert first.json()["yield_source"] == "model"
+
+        deadline = time.time() + 30
+        while backend.yield_tables.stats()["tables"] == 0 and time.time() < deadline:
+            time.sleep(0.05)
+        second = client.post("/api/crop/recommend", json=payload, headers=headers).json()
+        assert second["yield_source"] == "table"
+        assert second["model_version"] == first.json()["model_version"]
+        assert second["recommended_crop"] == first.json()["recommended_crop"]
+
+        # Off-grid inputs keep using the model
+        off_grid = client.post("/api/crop/recommend", json=dict(payload, fertilizer=5.0), headers=headers).json()
+        assert off_grid["yield_source"] == "model"
+
+        # Unknown states or seasons never claim a build
+        builds = backend.yield_tables.stats()["builds"]
+        for state in ("Atlantis", "Punjab-1"):
+            made_up = client.post("/api/crop/recommend", json=dict(payload, state=state), headers=headers).json()
+            assert made_up["yield_source"] == "model"
+        stats = backend.yield_tables.stats()
+        assert (stats["building"], stats["builds"]) == (0, builds)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))